@@ -1,61 +1,170 @@
-document.addEventListener("DOMContentLoaded", async function () {
-  try {
-    const response = await fetch("/stat"); // Fetch from the /stat route instead of directly from the JSON file
-    if (!response.ok) {
-      throw new Error("Network response was not ok: " + response.statusText);
-    }
-    const stats = await response.json();
+const statistics = {};
+let mapView = null; // set by loadData once the map is drawn
 
-    const topWindList = document.getElementById("top-wind");
-    stats.top_wind.forEach((location) => {
+function fillList(id, items) {
+  const list = document.getElementById(id);
+  list.replaceChildren(
+    ...items.map((text) => {
       const li = document.createElement("li");
-      li.textContent = `${location.name}: ${location.wind_speed} m/s`;
-      topWindList.appendChild(li);
-    });
+      li.textContent = text;
+      return li;
+    })
+  );
+}
 
-    const topSolarList = document.getElementById("top-solar");
-    stats.top_solar.forEach((location) => {
-      const li = document.createElement("li");
-      li.textContent = `${location.name}: ${location.clouds} W/m²`;
-      topSolarList.appendChild(li);
-    });
+// An average is null while no site has a recent observation
+function formatAverage(value, unit) {
+  return value === null ? "n/a" : `${value.toFixed(2)} ${unit}`;
+}
+
+// Renders the given statistics; a delta only carries the keys that changed
+function renderStatistics(changed) {
+  Object.assign(statistics, changed);
+  if (changed.top_wind) {
+    fillList("top-wind", changed.top_wind.map((location) => `${location.name}: ${location.wind_speed} m/s`));
+  }
+  if (changed.top_solar) {
+    fillList("top-solar", changed.top_solar.map((location) => `${location.name}: ${location.clouds} W/m²`));
+  }
+  if (changed.average_wind !== undefined) {
+    document.getElementById("average-wind").textContent = formatAverage(changed.average_wind, "m/s");
+  }
+  if (changed.average_solar !== undefined) {
+    document.getElementById("average-solar").textContent = formatAverage(changed.average_solar, "W/m²");
+  }
+}
+
+async function loadStatistics() {
+  const response = await fetch("/stat"); // Fetch from the /stat route instead of directly from the JSON file
+  if (!response.ok) {
+    throw new Error("Network response was not ok: " + response.statusText);
+  }
+  const stats = await response.json();
+  renderStatistics(stats);
+  return stats;
+}
+
+// Applies the server's deltas as the pipeline publishes new versions, instead of reloading everything
+function subscribe(version) {
+  const source = new EventSource(version === undefined ? "/updates" : `/updates?since=${version}`);
+  source.addEventListener("delta", (event) => {
+    const delta = JSON.parse(event.data);
+    renderStatistics(delta.statistics);
+    if (mapView) {
+      mapView.applyDelta(delta);
+    }
+  });
+  // Too far behind for deltas: load everything again
+  source.addEventListener("reset", async () => {
+    tileRequests.clear();
+    await loadStatistics();
+    if (mapView) {
+      mapView.draw();
+    }
+  });
+}
 
-    document.getElementById("average-wind").textContent =
-      stats.average_wind.toFixed(2) + " m/s";
-    document.getElementById("average-solar").textContent =
-      stats.average_solar.toFixed(2) + " W/m²";
+document.addEventListener("DOMContentLoaded", async function () {
+  try {
+    const stats = await loadStatistics();
+    subscribe(stats.version);
   } catch (error) {
     console.error("Error fetching statistics:", error);
   }
 });
 
+const TILE_SIZE = 256; // pixels a tile spans on screen, as in slippy maps
+const tileRequests = new Map();
+
+function mercator(lat, lon) {
+  const sin = Math.sin((Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI) / 180);
+  return {
+    x: (lon + 180) / 360,
+    y: 0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI),
+  };
+}
+
+// Zoom level at which the viewport is about as wide as the plot in tile pixels
+function zoomFor(bbox, width, maxZoom) {
+  const span = Math.max(bbox[2] - bbox[0], 1e-6);
+  const zoom = Math.floor(Math.log2((width * 360) / (span * TILE_SIZE)));
+  return Math.max(0, Math.min(maxZoom, zoom));
+}
+
+function tilesFor(bbox, zoom) {
+  const scale = 2 ** zoom;
+  const clamp = (v) => Math.max(0, Math.min(scale - 1, Math.floor(v * scale)));
+  const northWest = mercator(bbox[3], bbox[0]);
+  const southEast = mercator(bbox[1], bbox[2]);
+  const tiles = [];
+  for (let x = clamp(northWest.x); x <= clamp(southEast.x); x++) {
+    for (let y = clamp(northWest.y); y <= clamp(southEast.y); y++) {
+      tiles.push(`/tiles/${zoom}/${x}/${y}.json`);
+    }
+  }
+  return tiles;
+}
+
+function fetchTile(url) {
+  if (!tileRequests.has(url)) {
+    tileRequests.set(url, fetch(url).then((response) => response.json()));
+  }
+  return tileRequests.get(url);
+}
+
+async function loadCells(bbox, zoom) {
+  const tiles = await Promise.all(tilesFor(bbox, zoom).map(fetchTile));
+  const cells = { lat: [], lon: [], count: [], pagerank: [], name: [], community: [] };
+  tiles.forEach((tile) => {
+    Object.keys(cells).forEach((field) => cells[field].push(...tile.cells[field]));
+  });
+  return cells;
+}
+
+function cellText(cells, i) {
+  const site = `${cells.name[i]}: PR ${cells.pagerank[i].toFixed(3)} | Comm ${cells.community[i]}`;
+  return cells.count[i] > 1 ? `${cells.count[i]} sites, top ${site}` : site;
+}
+
+// Per-point arrays of the map trace for the given cells (copies, so Plotly never shares ours)
+function markerArrays(cells, indices) {
+  return {
+    lon: indices.map((i) => cells.lon[i]),
+    lat: indices.map((i) => cells.lat[i]),
+    text: indices.map((i) => cellText(cells, i)),
+    "marker.size": indices.map((i) => Math.max(4, cells.pagerank[i] * 100)), // Scale size by PageRank
+    "marker.color": indices.map((i) => cells.community[i]),
+  };
+}
+
+// Plotly.restyle and extendTraces take one array per trace they update
+function firstTrace(arrays) {
+  return Object.fromEntries(Object.entries(arrays).map(([key, values]) => [key, [values]]));
+}
+
+function inside(bbox, lat, lon) {
+  return lon >= bbox[0] && lat >= bbox[1] && lon <= bbox[2] && lat <= bbox[3];
+}
+
 async function loadData() {
-  const response = await fetch("/data");
-  const data = await response.json();
-
-  const traces = [
-    {
-      type: "scattergeo",
-      mode: "markers+text",
-      text: data.map(
-        (d) => `${d.name}: PR ${d.pagerank.toFixed(3)} | Comm ${d.community}`
-      ),
-      lon: data.map((d) => d.lon),
-      lat: data.map((d) => d.lat),
-      marker: {
-        size: data.map((d) => d.pagerank * 100), // Scale size by PageRank
-        color: data.map((d) => d.community),
-        colorscale: "Viridis",
-        line: { color: "black", width: 0.5 },
-      },
-    },
-  ];
+  const meta = await (await fetch("/tiles")).json();
+  if (!meta.bbox) {
+    return;
+  }
+  const container = document.getElementById("map");
+  const home = meta.bbox;
+  let bbox = home;
+  let zoom = 0;
+  let cells = null;
 
   const layout = {
     title: "Optimal Renewable Sites",
+    uirevision: "map", // keep the user's pan and zoom when the tiles change
     geo: {
       scope: "europe",
       projection: { type: "mercator" },
+      lonaxis: { range: [home[0] - 0.5, home[2] + 0.5] },
+      lataxis: { range: [home[1] - 0.5, home[3] + 0.5] },
       showland: true,
       landcolor: "rgb(217, 217, 217)",
       countrywidth: 1,
@@ -63,7 +172,110 @@ async function loadData() {
     },
   };
 
-  Plotly.newPlot("map", traces, layout);
+  async function draw() {
+    zoom = zoomFor(bbox, container.clientWidth || 800, meta.max_zoom);
+    cells = await loadCells(bbox, zoom);
+    const arrays = markerArrays(cells, cells.name.map((_, i) => i));
+    const traces = [
+      {
+        type: "scattergeo",
+        mode: zoom >= meta.max_zoom ? "markers+text" : "markers",
+        text: arrays.text,
+        lon: arrays.lon,
+        lat: arrays.lat,
+        marker: {
+          size: arrays["marker.size"],
+          color: arrays["marker.color"],
+          colorscale: "Viridis",
+          line: { color: "black", width: 0.5 },
+        },
+      },
+    ];
+    await Plotly.react("map", traces, layout);
+  }
+
+  // Single-site cells are updated in place and new sites appended; a change
+  // inside an aggregated cell refetches the visible tiles
+  // The tile cell a point falls in at ``level``; a cell's centroid falls in its own cell
+  function cellKey(lat, lon, level) {
+    const side = 2 ** level * meta.cells;
+    const point = mercator(lat, lon);
+    return `${Math.floor(point.x * side)}/${Math.floor(point.y * side)}`;
+  }
+
+  async function applyDelta(delta) {
+    tileRequests.clear(); // cached tiles belong to the previous version
+    if (!cells) {
+      return;
+    }
+    const nodes = delta.nodes;
+    const position = new Map(cells.name.map((name, i) => [name, i]));
+    const isNew = new Set(delta.added);
+    const occupied = new Set(cells.name.map((_, i) => cellKey(cells.lat[i], cells.lon[i], zoom)));
+    const added = [];
+    let changed = false;
+    let stale = delta.removed.length > 0;
+    nodes.name.forEach((name, k) => {
+      const i = position.get(name);
+      if (i !== undefined && cells.count[i] === 1) {
+        cells.lat[i] = nodes.lat[k];
+        cells.lon[i] = nodes.lon[k];
+        cells.pagerank[i] = nodes.pagerank[k];
+        cells.community[i] = nodes.community[k];
+        changed = true;
+      } else if (i !== undefined || inside(bbox, nodes.lat[k], nodes.lon[k])) {
+        // A site that is not a cell's label may be aggregated in one; only a
+        // new site alone in its cell can be appended as its own marker
+        const key = cellKey(nodes.lat[k], nodes.lon[k], zoom);
+        if (isNew.has(name) && zoom >= meta.max_zoom && !occupied.has(key)) {
+          occupied.add(key);
+          added.push(k);
+        } else {
+          stale = true;
+        }
+      }
+    });
+    if (stale) {
+      await draw();
+      return;
+    }
+    if (changed) {
+      const arrays = markerArrays(cells, cells.name.map((_, i) => i));
+      await Plotly.restyle(container, firstTrace(arrays), [0]);
+    }
+    if (added.length) {
+      const first = cells.name.length;
+      added.forEach((k) => {
+        cells.name.push(nodes.name[k]);
+        cells.lat.push(nodes.lat[k]);
+        cells.lon.push(nodes.lon[k]);
+        cells.count.push(1);
+        cells.pagerank.push(nodes.pagerank[k]);
+        cells.community.push(nodes.community[k]);
+      });
+      const arrays = markerArrays(cells, added.map((_, j) => first + j));
+      await Plotly.extendTraces(container, firstTrace(arrays), [0]);
+    }
+  }
+
+  await draw();
+  mapView = { draw, applyDelta };
+  container.on("plotly_relayout", (event) => {
+    const scale = event["geo.projection.scale"];
+    const lon = event["geo.center.lon"];
+    const lat = event["geo.center.lat"];
+    if (scale === undefined && lon === undefined) {
+      return;
+    }
+    const current = container.layout.geo;
+    const factor = scale ?? current.projection.scale ?? 1;
+    const centerLon = lon ?? current.center?.lon ?? (home[0] + home[2]) / 2;
+    const centerLat = lat ?? current.center?.lat ?? (home[1] + home[3]) / 2;
+    const halfLon = (home[2] - home[0]) / 2 / factor;
+    const halfLat = (home[3] - home[1]) / 2 / factor;
+    bbox = [centerLon - halfLon, centerLat - halfLat, centerLon + halfLon, centerLat + halfLat];
+    draw();
+  });
 }
 
 loadData();
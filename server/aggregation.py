@@ -0,0 +1,188 @@
+"""Yearly, monthly and seasonal rollups of the daily weather table.
+
+``WeatherAggregates`` keeps per-(location, year, month) sums and counts of
+the daily variables. Every rollup is derived from that table, memoised per
+data version, and new days are folded in with ``update`` without rescanning
+what was already seen. The caller's DataFrame is never modified.
+
+A long-lived table such as ``WeatherSnapshot``'s keeps one instance and
+``update``s it with each new version. ``cached_rollup`` is what one-off
+callers (the maps and the renderer) use: a rollup of a whole table is
+computed once per table content and kept in a ``RollupCache``, so callers
+within a process share it instead of grouping the daily table again.
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from metrics import timed
+from weather_store import local_day, table_version
+
+VARIABLES = ["wind_speed_10m_max", "sunshine_duration", "shortwave_radiation_sum"]
+SEASONS = {12: "DJF", 1: "DJF", 2: "DJF", 3: "MAM", 4: "MAM", 5: "MAM",
+           6: "JJA", 7: "JJA", 8: "JJA", 9: "SON", 10: "SON", 11: "SON"}
+PERIODS = ("year", "month", "season")
+
+
+def _plain_locations(frame):
+    """Turns a categorical location level into strings, so results sort and merge like string keys."""
+    level = frame.index.levels[0]
+    if isinstance(level, pd.CategoricalIndex):
+        frame.index = frame.index.set_levels(level.astype(str), level=0)
+        frame = frame.sort_index()
+    return frame
+
+
+class WeatherAggregates:
+    """Incrementally maintained rollups for one daily weather table."""
+
+    def __init__(self, data=None, variables=VARIABLES):
+        self.variables = list(variables)
+        self.version = 0
+        self._sums = None
+        self._counts = None
+        self._last_day = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        if data is not None:
+            self.update(data)
+
+    @property
+    def locations(self):
+        """Locations folded in so far."""
+        return set(self._last_day)
+
+    @timed("aggregation.update")
+    def update(self, data):
+        """Folds in days newer than the last one seen for each location; returns how many rows were used.
+
+        Rows at or before a location's last ingested day are ignored, so
+        passing the whole table again after appending a day only adds that day.
+        A ``day`` column, if present, is used instead of deriving it from ``date``.
+        """
+        day = data["day"] if "day" in data else local_day(data["date"])
+        with self._lock:
+            if self._last_day:
+                last = data["location"].map(self._last_day)
+                new = last.isna() | (day > last)
+            else:
+                new = pd.Series(True, index=data.index)
+            count = int(new.sum())
+            if count == 0:
+                return 0
+
+            # Old rows get a missing location key and are dropped by the groupby,
+            # so the caller's frame is grouped in place without a filtered copy
+            location = data["location"] if count == len(data) else data["location"].where(new)
+            keys = [location, day.dt.year.rename("year"), day.dt.month.rename("month")]
+            grouped = data.groupby(keys, sort=True, observed=True)[self.variables]
+            sums, counts = _plain_locations(grouped.sum().astype("float64")), _plain_locations(grouped.count())
+            if self._sums is None:
+                self._sums, self._counts = sums, counts
+            else:
+                self._sums = self._sums.add(sums, fill_value=0)
+                self._counts = self._counts.add(counts, fill_value=0)
+
+            latest = day[new].groupby(data["location"][new], observed=True).max()
+            for location, last_day in latest.items():
+                self._last_day[location] = max(last_day, self._last_day.get(location, last_day))
+            self.version += 1
+            self._cache.clear()
+            return count
+
+    def rollup(self, period="year"):
+        """Mean of each variable per location and ``period`` (year, month or season), rounded to 2 decimals."""
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        with self._lock:
+            key = (period, self.version)
+            if key not in self._cache:
+                self._cache[key] = self._compute(period)
+            return self._cache[key].copy()
+
+    def yearly(self):
+        return self.rollup("year")
+
+    def monthly(self):
+        return self.rollup("month")
+
+    def seasonal(self):
+        return self.rollup("season")
+
+    @timed("aggregation.rollup")
+    def _compute(self, period):
+        if self._sums is None:
+            keys = {"year": ["year"], "month": ["year", "month"], "season": ["year", "season"]}[period]
+            return pd.DataFrame(columns=["location"] + keys + self.variables)
+
+        sums, counts = self._sums, self._counts
+        if period == "year":
+            keys = ["location", "year"]
+        elif period == "month":
+            keys = ["location", "year", "month"]
+        else:
+            index = sums.index.to_frame(index=False)
+            # December counts towards the following year's winter
+            index["year"] = index["year"] + (index["month"] == 12)
+            index["season"] = index["month"].map(SEASONS)
+            sums = sums.set_axis(pd.MultiIndex.from_frame(index))
+            counts = counts.set_axis(pd.MultiIndex.from_frame(index))
+            keys = ["location", "year", "season"]
+
+        sums = sums.groupby(level=keys).sum()
+        counts = counts.groupby(level=keys).sum()
+        means = (sums / counts.where(counts > 0)).round(2)
+        return means.reset_index()
+
+
+class RollupCache:
+    """In-memory LRU of rollups keyed by table content, period and variables."""
+
+    def __init__(self, max_items=8):
+        self.max_items = max_items
+        self.stats = {"hits": 0, "misses": 0}
+        self._rollups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        # Held while computing, so concurrent callers of the same table group it once
+        with self._lock:
+            if key in self._rollups:
+                self._rollups.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._rollups[key]
+            self.stats["misses"] += 1
+            value = self._rollups[key] = compute()
+            while len(self._rollups) > self.max_items:
+                self._rollups.popitem(last=False)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._rollups.clear()
+
+
+default_rollups = RollupCache()
+
+
+def cached_rollup(data, period="year", variables=VARIABLES, version=None, cache=None):
+    """``WeatherAggregates(data, variables).rollup(period)``, computed once per table content.
+
+    ``version`` identifies the table's content; without it the table is
+    hashed with ``table_version``, which costs a fraction of the groupby.
+    Results are kept in ``cache`` (default: ``default_rollups``).
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    cache = default_rollups if cache is None else cache
+    version = table_version(data) if version is None else version
+    rollup = cache.get_or_compute((version, period, tuple(variables)),
+                                  lambda: WeatherAggregates(data, variables).rollup(period))
+    # The cache hands every caller the same frame
+    return rollup.copy()
+
+
+def calculate_yearly_averages(data, version=None):
+    """Calculates yearly averages for each location and each weather variable."""
+    return cached_rollup(data, "year", version=version)
@@ -1,9 +1,8 @@
-import pandas as pd
-import openmeteo_requests
-import requests_cache
-from retry_requests import retry
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from collections import defaultdict
+
+from fetcher import DAILY_VARIABLES, fetch_locations
+from metrics import timed
+from weather_store import WeatherStore
 
 # List of locations with their latitude and longitude
 locations = [
@@ -16,97 +15,60 @@ locations = [
     {"name": "Oradea", "lat": 47.0722, "lon": 21.9218}
 ]
 
-def fetch_weather_data():
-    """Fetches weather data from the API and returns a DataFrame with combined data for all locations."""
-    cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-    openmeteo = openmeteo_requests.Client(session=retry_session)
-
-    all_daily_data = []
-
-    for location in locations:
-        url = "https://archive-api.open-meteo.com/v1/archive"
-        params = {
-            "latitude": location["lat"],
-            "longitude": location["lon"],
-            "start_date": "2014-11-01",
-            "end_date": "2024-11-02",
-            "daily": ["sunshine_duration", "wind_speed_10m_max", "shortwave_radiation_sum"],
-            "timezone": "auto"
-        }
-        
-        responses = openmeteo.weather_api(url, params=params)
-        response = responses[0]
-        daily = response.Daily()
+START_DATE = "2014-11-01"
+END_DATE = "2024-11-02"
+STORE_PATH = ".weather_store"
 
-        daily_data = {
-            "location": location["name"],
-            "date": pd.date_range(
-                start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-                end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-                freq=pd.Timedelta(seconds=daily.Interval()),
-                inclusive="left"
-            ),
-            "sunshine_duration": daily.Variables(0).ValuesAsNumpy(),
-            "wind_speed_10m_max": daily.Variables(1).ValuesAsNumpy(),
-            "shortwave_radiation_sum": daily.Variables(2).ValuesAsNumpy()
-        }
+@timed("fetch_weather_data")
+def fetch_weather_data(names=None, columns=None, start_date=START_DATE, end_date=END_DATE,
+                       max_workers=1, batch_size=1, per_host_limit=4, store_path=STORE_PATH):
+    """Fetches weather data from the API and returns a DataFrame with combined data for all locations.
 
-        daily_dataframe = pd.DataFrame(data=daily_data)
-        all_daily_data.append(daily_dataframe)
+    Data is served from the local columnar store; only the (location, date
+    range) gaps the store does not hold yet are downloaded and merged in, so
+    moving ``end_date`` forward by a day fetches one day per site. ``names``
+    and ``columns`` restrict the result to some locations and variables
+    without reading the rest. Raise ``max_workers`` and ``batch_size`` to
+    fetch concurrently and several coordinates per request.
+    """
+    store = WeatherStore(store_path)
+    wanted = [location for location in locations if names is None or location["name"] in names]
+    variables = DAILY_VARIABLES if columns is None else [c for c in DAILY_VARIABLES if c in columns]
 
-    combined_daily_data = pd.concat(all_daily_data, ignore_index=True)
-    return combined_daily_data
+    # Group sites by identical gaps so they can still share batched requests
+    gaps = defaultdict(list)
+    for location in wanted:
+        for gap_start, gap_end in store.missing_ranges(location["name"], variables, start_date, end_date):
+            gaps[(gap_start, gap_end)].append(location)
 
-def plot_weather_data(data):
-    """Plots shortwave radiation and maximum wind speed for each location using Plotly."""
-    fig = make_subplots(
-        rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1,
-        subplot_titles=("Shortwave Radiation (kWh/m²)", "Maximum Wind Speed (m/s)")
-    )
-
-    color_palette = ["#636EFA", "#EF553B", "#00CC96", "#AB63FA", "#FFA15A", "#19D3F3", "#FF6692"]
-    
-    for i, location in enumerate(data['location'].unique()):
-        location_data = data[data['location'] == location]
-        
-        fig.add_trace(
-            go.Scatter(
-                x=location_data['date'], y=location_data['shortwave_radiation_sum'],
-                mode='lines', name=f'{location} Shortwave Radiation',
-                line=dict(color=color_palette[i % len(color_palette)], width=2)
-            ),
-            row=1, col=1
-        )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=location_data['date'], y=location_data['wind_speed_10m_max'],
-                mode='lines', name=f'{location} Max Wind Speed', line=dict(dash="dot", color=color_palette[i % len(color_palette)], width=2)
-            ),
-            row=2, col=1
+    for (gap_start, gap_end), missing in gaps.items():
+        fetched = fetch_locations(
+            missing,
+            start_date=gap_start,
+            end_date=gap_end,
+            variables=variables,
+            max_workers=max_workers,
+            batch_size=batch_size,
+            per_host_limit=per_host_limit,
         )
+        store.write(fetched, gap_start, gap_end)
 
-    fig.update_xaxes(
-        title_text="Date", tickformat="%Y-%m", ticks="outside", showgrid=True, tickangle=45, row=2, col=1
-    )
+    return store.read([location["name"] for location in wanted], columns=columns,
+                      start_date=start_date, end_date=end_date)
 
-    fig.update_layout(
-        title="Weather Data Visualization",
-        template="plotly_white",
-        legend=dict(
-            title="Locations",
-            orientation="h",
-            yanchor="top", y=1.1, xanchor="center", x=0.5
-        ),
-        hovermode="x unified"
-    )
+def plot_weather_data(data, points=None, method="lttb"):
+    """Plots shortwave radiation and maximum wind speed for each location using Plotly.
 
-    fig.update_yaxes(title_text="Radiation (kWh/m²)", row=1, col=1)
-    fig.update_yaxes(title_text="Wind Speed (m/s)", row=2, col=1)
+    ``points`` downsamples each trace to that many points (``method`` is
+    ``lttb`` or ``minmax``).
+    """
+    from figures import weather_figure
+    weather_figure(data, points=points, method=method).show()
 
-    fig.show()
+def main():
+    # Fetch and plot data
+    weather_data = fetch_weather_data()
+    plot_weather_data(weather_data, points=1000)
 
-# Fetch and plot data
-weather_data = fetch_weather_data()
-plot_weather_data(weather_data)
+if __name__ == "__main__":
+    main()
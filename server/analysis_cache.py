@@ -0,0 +1,188 @@
+"""Content-addressed cache of graph analysis results.
+
+A result is stored under a hash of the algorithm name, its parameters and
+the graph itself (nodes, edges and edge weights in a canonical order, so
+building the same graph in another order hits the same entry). Results are
+kept in an in-memory LRU and pickled under ``directory``; the directory is
+trimmed to ``disk_bytes`` by evicting the least recently used files, and a
+disk hit refreshes the file's mtime so hot entries survive.
+
+``memoize`` is what the analysis entry points call; it uses the shared
+``default_cache`` unless given another one.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from importlib import metadata
+
+import numpy as np
+
+CACHE_DIR = ".analysis_cache"
+# Bump when an algorithm's output changes so older cached results are ignored
+CACHE_FORMAT = 1
+# Libraries whose objects end up in pickled results (temporal stores a DataFrame)
+PICKLED_LIBRARIES = ("numpy", "pandas", "networkx", "scipy")
+
+
+def _library_versions():
+    """Installed versions of ``PICKLED_LIBRARIES``, read without importing them."""
+    versions = {}
+    for name in PICKLED_LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+# Part of every key, so a pickle is only read back by the library versions that wrote it
+LIBRARY_VERSIONS = _library_versions()
+
+
+def graph_key(G, weight='weight'):
+    """Hash of the nodes, edges and ``weight`` values of ``G``, independent of insertion order."""
+    nodes = sorted(G, key=repr)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = list(G.edges(data=weight, default=1.0))
+    u = np.fromiter((index[a] for a, _, _ in edges), dtype=np.int64, count=len(edges))
+    v = np.fromiter((index[b] for _, b, _ in edges), dtype=np.int64, count=len(edges))
+    w = np.fromiter((value for _, _, value in edges), dtype=np.float64, count=len(edges))
+    if not G.is_directed():
+        u, v = np.minimum(u, v), np.maximum(u, v)
+    order = np.lexsort((v, u))
+
+    digest = hashlib.sha1()
+    digest.update(b"directed" if G.is_directed() else b"undirected")
+    digest.update("\0".join(map(repr, nodes)).encode())
+    for array in (u[order], v[order], w[order]):
+        digest.update(b"\0")
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _copy(value):
+    # Results map nodes to numbers, so a shallow copy is enough
+    return dict(value) if isinstance(value, dict) else value
+
+
+class ResultCache:
+    """In-memory LRU over a size-bounded directory of pickled results."""
+
+    def __init__(self, directory=CACHE_DIR, memory_items=128, disk_bytes=256 * 2**20):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self):
+        return self.stats["memory_hits"] + self.stats["disk_hits"]
+
+    @property
+    def misses(self):
+        return self.stats["misses"]
+
+    @staticmethod
+    def key(algorithm, graph_hash, params):
+        payload = json.dumps([CACHE_FORMAT, LIBRARY_VERSIONS, algorithm, graph_hash, params], sort_keys=True,
+                             default=repr)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """Returns ``(found, value)``; a dict value is a copy the caller may modify."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return True, _copy(self._memory[key])
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                os.utime(path)
+            except Exception:  # unreadable, truncated or written by other libraries: a miss
+                pass
+            else:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, value)
+                return True, _copy(value)
+        with self._lock:
+            self.stats["misses"] += 1
+        return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, _copy(value))
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            self._trim()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _trim(self):
+        """Deletes the least recently used files until the directory fits ``disk_bytes``."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, algorithm, graph_hash, params, compute):
+        key = self.key(algorithm, graph_hash, params)
+        found, value = self.get(key)
+        if not found:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory is not None and os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pkl"):
+                    os.remove(entry.path)
+
+
+default_cache = ResultCache()
+
+
+def memoize(algorithm, G, compute, cache=None, graph_hash=None, weight='weight', **params):
+    """Returns ``compute()`` for ``G``, or the cached result of the same algorithm, parameters and graph.
+
+    Pass ``graph_hash`` when several analyses run on the same graph to hash it once.
+    """
+    cache = default_cache if cache is None else cache
+    if graph_hash is None:
+        graph_hash = graph_key(G, weight)
+    return cache.get_or_compute(algorithm, graph_hash, params, compute)
@@ -1,7 +1,15 @@
-from flask import Flask, render_template, jsonify
-import json
+import os
 
+from flask import Flask, render_template
+
+import analysis_cache
 from analysis import fetch_weather_data
+from http_cache import FileCache
+from metrics import cache_samples, instrument_app, registry
+from shared_table import SharedTable
+from tiles import TileCache, tiles_api
+from updates import DeltaFeed, updates_api
+from weather_api import WeatherSnapshot, weather_api
 
 
 app = Flask(
@@ -9,6 +17,43 @@ app = Flask(
     template_folder="../client",  # Set template folder to 'client'
     static_folder="../client"  # Set static folder to 'client'
 )
+app.register_blueprint(weather_api)
+app.register_blueprint(tiles_api)
+app.register_blueprint(updates_api)
+instrument_app(app)
+if os.environ.get("SHARED_TABLE"):
+    # Workers started by serve.py map the table the master published and
+    # only check every few seconds whether a newer one has been swapped in
+    shared_table = SharedTable(os.environ["SHARED_TABLE"])
+    weather_snapshot = WeatherSnapshot(shared_table.frame, refresh_interval=5, current_version=shared_table.current,
+                                       index_loader=shared_table.index).init_app(app)
+else:
+    weather_snapshot = WeatherSnapshot(fetch_weather_data).init_app(app)
+asset_cache = FileCache()
+delta_feed = DeltaFeed().init_app(app)
+
+
+def weather_averages():
+    """Feeds the map tiles the yearly averages of the weather snapshot once it has loaded."""
+    weather_snapshot.ensure_started()
+    return weather_snapshot.rollup("year")
+
+
+tile_cache = TileCache(averages=weather_averages).init_app(app)
+
+
+@registry.register
+def cache_metrics():
+    """Hit and miss counts of the server's caches, read at scrape time."""
+    result_cache = analysis_cache.default_cache
+    return [
+        *cache_samples("analysis", result_cache.hits, result_cache.misses),
+        *cache_samples("tiles", tile_cache.stats["hits"], tile_cache.stats["misses"]),
+        *cache_samples("weather", weather_snapshot.stats["hits"], weather_snapshot.stats["misses"]),
+        *cache_samples("assets", asset_cache.stats["lookups"] - asset_cache.stats["reloads"],
+                       asset_cache.stats["reloads"]),
+    ]
+
 
 @app.route('/')
 def index():
@@ -16,24 +61,11 @@ def index():
 
 @app.route('/data')
 def data():
-    with open('../assets/network_data.json') as f:
-        network_data = json.load(f)
-    return jsonify(network_data)
+    return asset_cache.get('../assets/network_data.json').response()
 
 @app.route('/stat')
 def stat():
-    with open('../assets/statistics.json') as f:
-        statistics = json.load(f)
-    return jsonify(statistics)
-
-@app.route('/weather', methods=['GET'])
-def weather_data():
-    daily_df = fetch_weather_data()
-    
-    # Convert to JSON format
-    daily_json = daily_df.to_dict(orient='records')
-
-    return jsonify(daily=daily_json)
+    return asset_cache.get('../assets/statistics.json').response()
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,106 @@
+"""Graph analyses with and without the content-addressed result cache.
+
+Runs ``analyze_network`` and ``calculate_centrality_measures`` on a
+synthetic site graph three times: cold, again in the same process (memory
+hit) and with a fresh cache on the same directory (disk hit, as in a new
+run). Checks that cached results equal computed ones, that the same graph
+built in another order hits the same entries, that changing one edge weight
+misses, and that the directory stays under its size limit.
+
+    python bench_analysis_cache.py --sites 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import networkx as nx
+
+import analysis_cache
+from analysis_cache import ResultCache, graph_key
+from community import calculate_centrality_measures
+from data_processing import analyze_network, create_network
+from synthetic import synthetic_sites
+
+ATTRIBUTES = ("pagerank", "community", "betweenness", "closeness")
+
+
+def analyse(G, backend, k):
+    started = time.perf_counter()
+    analyze_network(G, backend=backend)
+    calculate_centrality_measures(G, backend=backend, k=k)
+    return time.perf_counter() - started
+
+
+def attributes(G):
+    return {name: nx.get_node_attributes(G, name) for name in ATTRIBUTES}
+
+
+def shuffled(G, seed=0):
+    """The same graph with nodes and edges inserted in another order."""
+    nodes, edges = list(G.nodes), list(G.edges(data=True))
+    random.Random(seed).shuffle(nodes)
+    random.Random(seed).shuffle(edges)
+    H = nx.Graph()
+    H.add_nodes_from(nodes)
+    H.add_edges_from((v, u, data) for u, v, data in edges)
+    return H
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--radius", type=float, default=60, help="neighbour radius in km")
+    parser.add_argument("--backend", choices=["networkx", "sparse"], default="sparse")
+    parser.add_argument("--k", type=int, default=None, help="betweenness pivots (default: exact)")
+    args = parser.parse_args()
+
+    observations = synthetic_sites(args.sites)
+    G = create_network(observations, radius=args.radius, metric="haversine")
+    print(f"{G.number_of_nodes()} nodes, {G.number_of_edges()} edges, backend {args.backend}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        analysis_cache.default_cache = ResultCache(directory)
+        cold = analyse(G, args.backend, args.k)
+        expected = attributes(G)
+        started = time.perf_counter()
+        graph_key(G)
+        hashing = time.perf_counter() - started
+
+        warm = analyse(G, args.backend, args.k)
+        assert attributes(G) == expected
+        memory_stats = dict(analysis_cache.default_cache.stats)
+
+        analysis_cache.default_cache = ResultCache(directory)
+        H = shuffled(G)
+        disk = analyse(H, args.backend, args.k)
+        assert attributes(H) == expected, "results differ for the same graph built in another order"
+        disk_stats = dict(analysis_cache.default_cache.stats)
+
+        u, v = next(iter(G.edges))
+        G[u][v]["weight"] += 1.0
+        analyse(G, args.backend, args.k)
+        changed_stats = dict(analysis_cache.default_cache.stats)
+        assert changed_stats["misses"] > disk_stats["misses"], "a changed edge weight must miss"
+
+        print(f"{'run':<34}{'seconds':>9}")
+        print(f"{'cold (compute + store)':<34}{cold:>9.3f}")
+        print(f"{'same process (memory hits)':<34}{warm:>9.3f}")
+        print(f"{'new cache, shuffled (disk hits)':<34}{disk:>9.3f}")
+        print(f"{'graph hash alone':<34}{hashing:>9.3f}")
+        print(f"\nstats after warm run: {memory_stats}")
+        print(f"stats after disk run: {disk_stats}")
+        print(f"stats after one weight changed: {changed_stats}")
+
+        sizes = [entry.stat().st_size for entry in os.scandir(directory)]
+        limit = sum(sizes) // 2
+        small = ResultCache(directory, disk_bytes=limit)
+        small.put("extra", expected["pagerank"])
+        remaining = sum(entry.stat().st_size for entry in os.scandir(directory))
+        assert remaining <= limit, f"{remaining} bytes left over a {limit} byte limit"
+        print(f"\ndisk limit {limit} bytes: {small.stats['evictions']} files evicted, {remaining} bytes left")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Payload size and render time of the weather plots with and without downsampling.
+
+For ten years of daily data per site, compares the full ``/weather`` payload
+and the Plotly weather figure against LTTB and min/max downsampling to a
+point budget. Checks that LTTB keeps exactly the budget and that min/max
+keeps every series' extremes. Render time is the figure build plus its
+serialisation to JSON and standalone HTML, the part done server-side; the
+browser's drawing time scales with the same point count.
+
+    python bench_downsample.py --sites 7 --points 500 1000
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from figures import weather_figure
+from synthetic import synthetic_locations, synthetic_table
+from weather_api import query
+from weather_store import local_day
+
+
+def payload_sizes(frame, **params):
+    started = time.perf_counter()
+    payload = query(frame, **params)
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return payload, len(body), len(gzip.compress(body)), time.perf_counter() - started
+
+
+def check_payload(full, payload, points, method):
+    for location, variables in payload["series"].items():
+        for variable, series in variables.items():
+            values = np.array(full["series"][location][variable], dtype=np.float64)
+            kept = values[series["index"]]
+            assert np.allclose(np.array(series["values"], dtype=np.float64), kept, equal_nan=True)
+            if method == "lttb":
+                assert len(series["index"]) == points, f"{location} {variable}: {len(series['index'])} points"
+            else:
+                assert len(series["index"]) <= points
+                assert np.nanmax(kept) == np.nanmax(values) and np.nanmin(kept) == np.nanmin(values), \
+                    f"{location} {variable}: min/max lost an extreme"
+
+
+def render(data, points, method, out):
+    started = time.perf_counter()
+    fig = weather_figure(data, points=points, method=method)
+    size = len(fig.to_json())
+    fig.write_html(os.path.join(out, "weather.html"), include_plotlyjs="cdn", full_html=True)
+    return size, sum(len(trace.x) for trace in fig.data), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=7)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--points", type=int, nargs="+", default=[500, 1000])
+    args = parser.parse_args()
+
+    data = synthetic_table(synthetic_locations(args.sites), "2014-11-01", f"{2014 + args.years}-10-31")
+    frame = data.assign(day=local_day(data["date"]))
+    cases = [(None, None)] + [(points, method) for points in args.points for method in ("lttb", "minmax")]
+
+    print(f"/weather, {args.sites} sites x 3 variables x {args.years} years")
+    print(f"{'points':>7}{'method':>8}{'bytes':>10}{'gzip':>9}{'ratio':>7}{'query s':>9}")
+    full, full_size, _, _ = payload_sizes(frame)
+    for points, method in cases:
+        payload, size, compressed, elapsed = payload_sizes(frame, points=points, method=method or "lttb")
+        if points is not None:
+            check_payload(full, payload, points, method)
+        print(f"{points or 'all':>7}{method or '-':>8}{size:>10}{compressed:>9}{size / full_size:>7.2f}{elapsed:>9.3f}")
+
+    print(f"\nweather figure, {args.sites} sites x 2 traces")
+    print(f"{'points':>7}{'method':>8}{'drawn':>9}{'json bytes':>12}{'ratio':>7}{'render s':>10}")
+    with tempfile.TemporaryDirectory() as out:
+        full_size = None
+        for points, method in cases:
+            size, drawn, elapsed = render(data, points, method or "lttb", out)
+            full_size = full_size or size
+            print(f"{points or 'all':>7}{method or '-':>8}{drawn:>9}{size:>12}{size / full_size:>7.2f}{elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
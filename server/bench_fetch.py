@@ -0,0 +1,54 @@
+"""Benchmarks sequential vs concurrent archive fetches against the local stub server.
+
+    python bench_fetch.py --sites 200 --latency 0.05
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from fetcher import fetch_locations, make_session
+from stub_server import start_archive_server
+from synthetic import synthetic_locations
+
+
+def run(locations, url, **kwargs):
+    started = time.perf_counter()
+    frame = fetch_locations(locations, "2014-11-01", "2024-11-02", url=url,
+                            session=make_session(cache_name=None), **kwargs)
+    return frame, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated server latency per request (s)")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every n-th request with HTTP 503")
+    args = parser.parse_args()
+
+    server, url = start_archive_server(latency=args.latency, fail_every=args.fail_every)
+    locations = synthetic_locations(args.sites)
+
+    configs = [
+        ("sequential", dict(max_workers=1, batch_size=1)),
+        ("threads=8", dict(max_workers=8, per_host_limit=8, batch_size=1)),
+        ("threads=8 batch=10", dict(max_workers=8, per_host_limit=8, batch_size=10)),
+        ("threads=16 host-limit=4 batch=10", dict(max_workers=16, per_host_limit=4, batch_size=10)),
+    ]
+
+    baseline = None
+    print(f"{'mode':<36}{'seconds':>10}{'speedup':>10}{'peak conns':>12}")
+    for label, kwargs in configs:
+        server.peak_in_flight = 0
+        frame, elapsed = run(locations, url, backoff_factor=0.01, **kwargs)
+        if baseline is None:
+            baseline, baseline_time = frame, elapsed
+        else:
+            pd.testing.assert_frame_equal(frame, baseline)
+        print(f"{label:<36}{elapsed:>10.3f}{baseline_time / elapsed:>9.1f}x{server.peak_in_flight:>12}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
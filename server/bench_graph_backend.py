@@ -0,0 +1,81 @@
+"""Times the sparse graph backend against NetworkX.
+
+Reports how far PageRank, betweenness and closeness are from NetworkX and
+the modularity of Louvain's and greedy modularity's partitions next to the
+timings; ``tests/test_graph_backend.py`` checks them.
+
+    python bench_graph_backend.py --sites 200 500 2000
+"""
+import argparse
+import time
+
+import networkx as nx
+import numpy as np
+
+import graph_backend
+from data_processing import create_network
+from synthetic import synthetic_sites
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def max_difference(expected, nodes, values):
+    return max(abs(expected[node] - value) for node, value in zip(nodes, values))
+
+
+def run(n, radius, exact_limit):
+    G = create_network(synthetic_sites(n), radius=radius, metric="haversine")
+    nodes, A = graph_backend.to_csr(G)
+    rows = []
+
+    expected, nx_time = timed(nx.pagerank, G)
+    values, sparse_time = timed(graph_backend.pagerank, A)
+    error = max_difference(expected, nodes, values)
+    rows.append(("pagerank", nx_time, sparse_time, f"max |diff| {error:.1e}"))
+
+    communities, nx_time = timed(nx.algorithms.community.greedy_modularity_communities, G)
+    labels, sparse_time = timed(graph_backend.louvain, A, seed=0)
+    greedy_q = nx.algorithms.community.modularity(G, communities)
+    louvain_q = nx.algorithms.community.modularity(
+        G, [set(np.asarray(nodes, dtype=object)[labels == c]) for c in np.unique(labels)])
+    rows.append(("communities", nx_time, sparse_time, f"Q greedy {greedy_q:.4f} / louvain {louvain_q:.4f}"))
+
+    if n <= exact_limit:
+        expected, nx_time = timed(nx.betweenness_centrality, G)
+        values, sparse_time = timed(graph_backend.betweenness, A)
+        error = max_difference(expected, nodes, values)
+        rows.append(("betweenness (exact)", nx_time, sparse_time, f"max |diff| {error:.1e}"))
+
+        expected, nx_time = timed(nx.closeness_centrality, G)
+        values, sparse_time = timed(graph_backend.closeness, A)
+        error = max_difference(expected, nodes, values)
+        rows.append(("closeness", nx_time, sparse_time, f"max |diff| {error:.1e}"))
+
+    k = max(1, n // 10)
+    _, nx_time = timed(nx.betweenness_centrality, G, k=k, seed=0)
+    _, sparse_time = timed(graph_backend.betweenness, A, k=k, seed=0)
+    rows.append((f"betweenness (k={k})", nx_time, sparse_time, "sampled"))
+
+    print(f"\n{n} sites, {G.number_of_edges()} edges")
+    print(f"  {'algorithm':<22}{'networkx s':>12}{'sparse s':>12}{'speedup':>10}  result")
+    for name, nx_time, sparse_time, note in rows:
+        print(f"  {name:<22}{nx_time:>12.3f}{sparse_time:>12.3f}{nx_time / sparse_time:>9.1f}x  {note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--radius", type=float, default=60, help="neighbour radius in km")
+    parser.add_argument("--exact-limit", type=int, default=1000,
+                        help="largest graph on which exact betweenness and closeness are timed")
+    args = parser.parse_args()
+    for n in args.sites:
+        run(n, args.radius, args.exact_limit)
+
+
+if __name__ == "__main__":
+    main()
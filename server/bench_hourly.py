@@ -0,0 +1,127 @@
+"""Peak memory and time of hourly ingestion: chunked streaming vs one concatenated frame.
+
+Serves ten years of hourly data per site from the local stub archive and,
+for each site count, runs one child process per mode and reports its peak
+resident memory:
+
+- ``stream``: ``ingest_hourly`` into a temporary ``HourlyStore``;
+- ``concat``: every site's series as a DataFrame, concatenated into one
+  frame, as the daily path does.
+
+The streaming run's daily aggregates are checked against a groupby over
+the raw hourly file it wrote.
+
+    python bench_hourly.py --sites 25 100 400 --concat-max 100
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+START_DATE, END_DATE = "2014-11-01", "2024-10-31"
+
+
+def run_stream(url, sites, workers, batch_size):
+    from fetcher import make_session
+    from hourly import HOURLY_VARIABLES, HourlyStore, ingest_hourly
+    from synthetic import synthetic_locations
+
+    locations = synthetic_locations(sites)
+    with tempfile.TemporaryDirectory() as root:
+        store = HourlyStore(root)
+        ingest_hourly(locations, START_DATE, END_DATE, store, url=url, session=make_session(None),
+                      max_workers=workers, batch_size=batch_size)
+        # The aggregates of the last site must match a groupby over its raw series
+        name = locations[-1]["name"]
+        raw = store.read_hourly(name)
+        expected = raw.groupby(raw["date"].dt.tz_localize(None).dt.floor("D"))[HOURLY_VARIABLES].agg(["mean", "max"])
+        daily = store.read_daily(name).set_index("day")
+        for variable in HOURLY_VARIABLES:
+            np.testing.assert_allclose(daily[f"{variable}_mean"], expected[(variable, "mean")], rtol=1e-5)
+            np.testing.assert_array_equal(daily[f"{variable}_max"], expected[(variable, "max")])
+        # Every site has the same series length
+        return len(raw) * sites
+
+
+def run_concat(url, sites, workers, batch_size):
+    from fetcher import HostLimiter, fetch_batch, make_session
+    from hourly import HOURLY_VARIABLES
+    from synthetic import synthetic_locations
+
+    locations = synthetic_locations(sites)
+    session, limiter = make_session(None), HostLimiter(4)
+    params = {"start_date": START_DATE, "end_date": END_DATE, "hourly": ",".join(HOURLY_VARIABLES),
+              "timezone": "auto"}
+    frames = []
+    for i in range(0, sites, batch_size):
+        batch = locations[i:i + batch_size]
+        for location, response in zip(batch, fetch_batch(session, limiter, url, batch, params)):
+            hourly = response.Hourly()
+            dates = pd.date_range(pd.Timestamp(hourly.Time(), unit="s", tz="UTC"),
+                                  pd.Timestamp(hourly.TimeEnd(), unit="s", tz="UTC"),
+                                  freq=pd.Timedelta(seconds=hourly.Interval()), inclusive="left")
+            frame = pd.DataFrame({"date": dates})
+            for k, variable in enumerate(HOURLY_VARIABLES):
+                frame[variable] = hourly.Variables(k).ValuesAsNumpy()
+            frame["location"] = location["name"]
+            frames.append(frame)
+    return len(pd.concat(frames, ignore_index=True))
+
+
+def child(mode, url, sites, workers, batch_size):
+    started = time.perf_counter()
+    rows = (run_stream if mode == "stream" else run_concat)(url, sites, workers, batch_size)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({"rows": rows, "seconds": time.perf_counter() - started, "peak": peak}))
+
+
+def measure(mode, url, sites, workers, batch_size):
+    output = subprocess.run([sys.executable, __file__, "--child", mode, url, str(sites), str(workers),
+                             str(batch_size)], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def baseline_rss():
+    """Peak memory of a child that only imports what the ingestion imports."""
+    code = ("import resource, hourly, pyarrow.ipc, openmeteo_sdk.WeatherApiResponse; "
+            "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)")
+    return int(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        mode, url, sites, workers, batch_size = sys.argv[2:7]
+        child(mode, url, int(sites), int(workers), int(batch_size))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="+", default=[25, 100, 400])
+    parser.add_argument("--concat-max", type=int, default=100, help="largest site count for the concat mode")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=2)
+    args = parser.parse_args()
+
+    from stub_server import start_archive_server
+
+    server, url = start_archive_server()
+    imports = baseline_rss()
+    print(f"interpreter and imports alone: {imports / 2**20:.0f} MiB")
+    print(f"{'sites':>6}  {'mode':<8}{'hourly rows':>13}{'seconds':>9}{'peak MiB':>10}{'over imports':>14}")
+    for sites in args.sites:
+        for mode in ("stream", "concat"):
+            if mode == "concat" and sites > args.concat_max:
+                continue
+            result = measure(mode, url, sites, args.workers, args.batch_size)
+            print(f"{sites:>6}  {mode:<8}{result['rows']:>13}{result['seconds']:>9.2f}"
+                  f"{result['peak'] / 2**20:>10.0f}{(result['peak'] - imports) / 2**20:>14.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
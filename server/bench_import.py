@@ -0,0 +1,138 @@
+"""Import-time and startup check for the server modules.
+
+Imports every module in a fresh interpreter under ``python -X importtime``
+with outgoing connections blocked, and asserts that no import touches the
+network and that the web server's modules do not pull in the plotting and
+graph libraries. Then times a cold start of the Flask app up to its first
+response.
+
+    python bench_import.py --repeat 5
+"""
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY = ("plotly", "sklearn", "networkx", "matplotlib", "scipy")
+# Modules on the web server's import path; none of them may load HEAVY
+SERVER_MODULES = ("app", "analysis", "weather_api", "http_cache", "metrics", "tiles", "fetcher", "weather_store",
+                  "aggregation", "render", "shared_table", "updates")
+
+# Runs in the child: fail any connection attempt, import, report what was loaded
+PROBE = """
+import socket, sys
+connects = []
+def refuse(self, address, *args):
+    connects.append(address)
+    raise OSError("network access during import")
+socket.socket.connect = refuse
+socket.socket.connect_ex = refuse
+import {module}
+heavy = sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))
+print(repr((heavy, connects)))
+"""
+
+STARTUP = """
+import time
+started = time.perf_counter()
+import app
+client = app.app.test_client()
+response = client.get('/stat')
+print(repr((time.perf_counter() - started, response.status_code)))
+"""
+
+
+def server_modules():
+    names = [os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(HERE, "*.py"))]
+    return sorted(name for name in names if not name.startswith("bench_"))
+
+
+def run(code, *flags):
+    result = subprocess.run([sys.executable, *flags, "-c", code], cwd=HERE, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise AssertionError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return result.stdout, result.stderr
+
+
+def report(stdout):
+    """The ``repr`` the child printed last."""
+    return eval(stdout.strip().splitlines()[-1])
+
+
+def cumulative_import_us(importtime_log, module):
+    """Cumulative microseconds of the top-level import of ``module`` from an ``-X importtime`` log."""
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if name == module:
+            return int(cumulative)
+    return None
+
+
+def slowest_direct_imports(importtime_log, module, n):
+    """The ``n`` slowest imports made directly by ``module``, by cumulative time.
+
+    Children are logged before their parent, so the direct imports of a
+    top-level module are the depth-1 lines since the previous top-level line.
+    """
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # One space after the separator, plus two per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return sorted(rows, reverse=True)[:n]
+            rows = []
+        elif depth == 1:
+            rows.append((int(cumulative), name.strip()))
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts to time")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports of app to list")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<20}{'import s':>10}  heavy modules loaded")
+    for module in server_modules():
+        try:
+            stdout, log = run(PROBE.format(module=module, heavy=HEAVY), "-X", "importtime")
+        except AssertionError as e:
+            failures.append(f"{module}: {e}")
+            continue
+        heavy, connects = report(stdout)
+        cumulative = cumulative_import_us(log, module)
+        print(f"{module:<20}{(cumulative or 0) / 1e6:>10.3f}  {', '.join(heavy) or '-'}")
+        if connects:
+            failures.append(f"{module}: opened connections on import: {connects}")
+        if module in SERVER_MODULES and heavy:
+            failures.append(f"{module}: imports {', '.join(heavy)}")
+
+    _, log = run("import app", "-X", "importtime")
+    print("\nslowest imports made by app:")
+    for cumulative, name in slowest_direct_imports(log, "app", args.top):
+        print(f"  {name:<30}{cumulative / 1e6:>8.3f}s")
+
+    times = []
+    for _ in range(args.repeat):
+        elapsed, status = report(run(STARTUP)[0])
+        assert status == 200, f"/stat answered {status}"
+        times.append(elapsed)
+    print(f"\ncold start to first /stat response: median {statistics.median(times):.3f}s over {len(times)} runs")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
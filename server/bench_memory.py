@@ -0,0 +1,109 @@
+"""Memory per row of the daily weather table, before and after the compact layout.
+
+Decodes the same synthetic FlatBuffer responses three ways:
+
+- the original per-site DataFrames joined with ``pd.concat`` (string location);
+- the same with an ``object`` location column, which is what pandas < 3 builds;
+- ``daily_table.TableBuilder`` (categorical location, float32, one buffer).
+
+The tables must hold identical values. Bytes per row come from
+``memory_usage(deep=True)``; the peak is the largest traced allocation
+(numpy buffers only) while the table was built.
+
+    python bench_memory.py --sites 100 1000 --years 10
+"""
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from daily_table import TableBuilder
+from fetcher import DAILY_VARIABLES, add_response, decode_responses
+from stub_server import encode_weather_response, synthetic_series
+from synthetic import synthetic_locations
+
+
+def legacy_frame(name, response, variables=DAILY_VARIABLES):
+    """The original response_to_frame: one DataFrame per site with a repeated location string."""
+    daily = response.Daily()
+    daily_data = {
+        "location": name,
+        "date": pd.date_range(
+            start=pd.to_datetime(daily.Time(), unit="s", utc=True),
+            end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
+            freq=pd.Timedelta(seconds=daily.Interval()),
+            inclusive="left"
+        ),
+    }
+    for i, variable in enumerate(variables):
+        daily_data[variable] = daily.Variables(i).ValuesAsNumpy()
+    return pd.DataFrame(data=daily_data)
+
+
+def build_legacy(locations, responses):
+    return pd.concat([legacy_frame(loc["name"], response) for loc, response in zip(locations, responses)],
+                     ignore_index=True)
+
+
+def build_legacy_object(locations, responses):
+    frames = []
+    for loc, response in zip(locations, responses):
+        frame = legacy_frame(loc["name"], response)
+        frame["location"] = pd.Series(loc["name"], index=frame.index, dtype=object)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_compact(locations, responses):
+    builder = TableBuilder(DAILY_VARIABLES)
+    for loc, response in zip(locations, responses):
+        add_response(builder, loc["name"], response)
+    return builder.build()
+
+
+def measure(build, locations, responses):
+    tracemalloc.start()
+    started = time.perf_counter()
+    frame = build(locations, responses)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return frame, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    start_date = "2014-11-01"
+    end_date = (pd.Timestamp(start_date) + pd.DateOffset(years=args.years) - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    print(f"{'sites':>6}{'rows':>11}  {'layout':<26}{'bytes/row':>10}{'total MiB':>11}{'peak MiB':>10}{'build s':>9}")
+    for n in args.sites:
+        locations = synthetic_locations(n)
+        payload = b"".join(
+            encode_weather_response(loc["lat"], loc["lon"], start_date,
+                                    synthetic_series(loc["lat"], loc["lon"], start_date, end_date), location_id=i)
+            for i, loc in enumerate(locations)
+        )
+        responses = decode_responses(payload)
+
+        results = {}
+        for label, build in [("per-site concat (str)", build_legacy),
+                             ("per-site concat (object)", build_legacy_object),
+                             ("compact TableBuilder", build_compact)]:
+            frame, elapsed, peak = measure(build, locations, responses)
+            size = frame.memory_usage(deep=True).sum()
+            print(f"{n:>6}{len(frame):>11}  {label:<26}{size / len(frame):>10.1f}{size / 2**20:>11.1f}"
+                  f"{peak / 2**20:>10.1f}{elapsed:>9.3f}")
+            results[label] = frame
+
+        expected = results["per-site concat (str)"]
+        compact = results["compact TableBuilder"]
+        pd.testing.assert_frame_equal(expected, compact.astype({"location": expected["location"].dtype}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Cost of the stage timers and request metrics, and a check of the /metrics output.
+
+Times an empty block under ``stage``, an empty ``timed`` function and a
+``/weather`` request through an instrumented app, with recording enabled
+and disabled (as with ``METRICS=0``), then scrapes ``/metrics`` and checks
+that every line parses, that histogram buckets are cumulative and that the
+expected stages, endpoints and caches are reported.
+
+    python bench_metrics.py --sites 50 --requests 2000
+"""
+import argparse
+import math
+import re
+import time
+
+from flask import Flask
+
+from metrics import cache_samples, instrument_app, registry, stage, timed
+from synthetic import synthetic_locations, synthetic_table
+from weather_api import WeatherSnapshot, weather_api
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def build_app(frame):
+    app = Flask(__name__)
+    app.register_blueprint(weather_api)
+    instrument_app(app)
+    snapshot = WeatherSnapshot(lambda: frame).init_app(app)
+    snapshot.refresh()
+    registry.register(lambda: cache_samples("weather", snapshot.stats["hits"], snapshot.stats["misses"]))
+    return app
+
+
+def per_call(function, n):
+    started = time.perf_counter()
+    for _ in range(n):
+        function()
+    return (time.perf_counter() - started) / n
+
+
+def parse_exposition(text):
+    """Returns ``{name: type}`` and ``[(name, labels, value)]``; raises on a malformed line."""
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+        elif line.startswith("#") or not line:
+            continue
+        else:
+            match = SAMPLE.match(line)
+            if match is None:
+                raise ValueError(f"malformed sample: {line!r}")
+            name, labels, value = match.groups()
+            samples.append((name, dict(LABEL.findall(labels or "")), float(value)))
+    return types, samples
+
+
+def check_histograms(samples):
+    """Buckets must not decrease and ``+Inf`` must equal ``_count``."""
+    series = {}
+    for name, labels, value in samples:
+        if name.endswith("_bucket"):
+            key = (name[:-len("_bucket")], tuple(sorted((k, v) for k, v in labels.items() if k != "le")))
+            series.setdefault(key, []).append((math.inf if labels["le"] == "+Inf" else float(labels["le"]), value))
+    counts = {(name[:-len("_count")], tuple(sorted(labels.items()))): value
+              for name, labels, value in samples if name.endswith("_count")}
+    for key, buckets in series.items():
+        values = [value for _, value in sorted(buckets)]
+        assert values == sorted(values), f"{key} buckets are not cumulative"
+        assert values[-1] == counts[key], f"{key} +Inf bucket differs from its count"
+    return len(series)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=200000, help="calls per microbenchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    @timed("bench.noop")
+    def noop():
+        pass
+
+    def block():
+        with stage("bench.block"):
+            pass
+
+    print(f"{'per call':<34}{'enabled us':>12}{'disabled us':>13}")
+    for label, function in [("empty block under stage", block), ("empty timed function", noop)]:
+        timings = {}
+        for enabled in (True, False):
+            registry.enabled = enabled
+            timings[enabled] = per_call(function, args.calls)
+        print(f"{label:<34}{timings[True] * 1e6:>12.2f}{timings[False] * 1e6:>13.2f}")
+    registry.enabled = True
+
+    frame = synthetic_table(synthetic_locations(args.sites), "2014-11-01", "2024-11-01")
+    app = build_app(frame)
+    with app.test_client() as client:
+        names = list(frame["location"].cat.categories)
+        path = f"/weather?location={names[0]}&variable=wind_speed_10m_max&resolution=month"
+        assert client.get(path).status_code == 200
+        timings = {}
+        for enabled in (True, False, True):
+            registry.enabled = enabled
+            timings[enabled] = per_call(lambda: client.get(path, headers={"Accept-Encoding": "gzip"}), args.requests)
+        registry.enabled = True
+        print(f"{'cached /weather request':<34}{timings[True] * 1e6:>12.2f}{timings[False] * 1e6:>13.2f}")
+        print(f"request overhead {(timings[True] / timings[False] - 1) * 100:+.1f}%")
+
+        client.get("/weather")
+        response = client.get("/metrics")
+        assert response.status_code == 200 and response.mimetype == "text/plain"
+        text = response.get_data(as_text=True)
+
+    types, samples = parse_exposition(text)
+    histograms = check_histograms(samples)
+    stages = {labels["stage"] for name, labels, _ in samples if name == "stage_seconds_count"}
+    endpoints = {labels["endpoint"] for name, labels, _ in samples if name == "http_request_seconds_count"}
+    for expected in ("bench.noop", "bench.block", "weather.load", "weather.query", "weather.serialise"):
+        assert expected in stages, f"stage {expected} missing"
+    assert "weather_api.weather_data" in endpoints, endpoints
+    assert any(name == "cache_hit_ratio" and labels == {"cache": "weather"} for name, labels, _ in samples)
+    assert types["payload_bytes"] == "histogram" and types["cache_hits_total"] == "counter"
+    print(f"\n/metrics: {len(text)} bytes, {len(samples)} samples in {len(types)} families, "
+          f"{histograms} histograms")
+    print(f"stages: {', '.join(sorted(stages))}")
+    print(f"endpoints: {', '.join(sorted(endpoints))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Times incremental pipeline ticks against a full rebuild.
+
+Starts from a full set of synthetic observations, then on every tick changes
+the wind speed of a fraction of the sites and times the tick and a rebuild
+from scratch on the same observations. ``tests/test_graph_backend.py``
+checks that both give the same graph and scores.
+
+    python bench_pipeline.py --sites 2000 --ticks 5 --changed 0.02
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from data_processing import analyze_network, build_statistics, create_network
+from pipeline import NetworkPipeline
+from synthetic import synthetic_sites
+
+
+def full_rebuild(observations, radius, metric, backend):
+    G = create_network(observations, radius=radius, metric=metric)
+    analyze_network(G, backend=backend)
+    build_statistics(observations)
+    return G
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--radius", type=float, default=60, help="neighbour radius in km")
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--changed", type=float, default=0.02, help="fraction of sites whose wind changes per tick")
+    parser.add_argument("--backend", choices=["networkx", "sparse"], default="sparse")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    observations = synthetic_sites(args.sites)
+    sites = observations[["name", "lat", "lon"]].to_dict(orient="records")
+
+    with tempfile.TemporaryDirectory() as assets:
+        pipeline = NetworkPipeline(sites, assets_dir=assets, radius=args.radius, metric="haversine",
+                                   backend=args.backend)
+        started = time.perf_counter()
+        metrics = pipeline.tick(observations)
+        print(f"initial tick: {metrics['nodes']} nodes, {metrics['edges']} edges "
+              f"in {time.perf_counter() - started:.3f}s")
+
+        print(f"\n{'tick':>4}{'changed':>9}{'+edges':>8}{'-edges':>8}{'graph s':>10}{'pagerank s':>12}{'louvain s':>11}"
+              f"{'write s':>10}{'tick s':>9}{'rebuild s':>11}")
+        for tick in range(1, args.ticks + 1):
+            changed = rng.choice(args.sites, size=max(1, int(args.sites * args.changed)), replace=False)
+            observations.loc[changed, "wind_speed"] = rng.uniform(0, 10, len(changed))
+
+            started = time.perf_counter()
+            metrics = pipeline.tick(observations)
+            tick_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            full_rebuild(observations, args.radius, "haversine", args.backend)
+            rebuild_time = time.perf_counter() - started
+
+            timings = metrics["timings"]
+            print(f"{tick:>4}{metrics['sites_changed']:>9}{metrics['edges_added']:>8}{metrics['edges_removed']:>8}"
+                  f"{timings['graph']:>10.3f}{timings['pagerank']:>12.3f}{timings['communities']:>11.3f}{timings['write']:>10.3f}"
+                  f"{tick_time:>9.3f}{rebuild_time:>11.3f}")
+
+        metrics = pipeline.tick(observations)
+        print(f"\nunchanged tick: no rescoring or write, {sum(metrics['timings'].values()):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
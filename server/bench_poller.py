@@ -0,0 +1,106 @@
+"""Checks and times the current-conditions poller against the local OpenWeatherMap stub.
+
+Compares the original sequential ``requests.get`` loop with the pooled,
+concurrent poller, then asserts that failed and incomplete sites are skipped
+and reported, that stalled requests time out, that the rate limit holds and
+that a poll of a large site list stops within its time budget.
+
+    python bench_poller.py --sites 15 500 --latency 0.05
+"""
+import argparse
+import time
+
+import requests
+
+from poller import poll_locations
+from stub_server import current_conditions, start_current_server
+from synthetic import synthetic_locations
+
+
+def legacy_poll(locations, url):
+    """The original build_dataframe loop: one bare ``requests.get`` per site, no timeout."""
+    rows = []
+    for loc in locations:
+        data = requests.get(f"{url}?lat={loc['lat']}&lon={loc['lon']}&appid=key").json()
+        rows.append((data.get('wind', {}).get('speed'), data.get('clouds').get('all')))
+    return rows
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def check_values(frame, locations):
+    expected = {loc["name"]: current_conditions(loc["lat"], loc["lon"]) for loc in locations}
+    for row in frame.itertuples():
+        assert (row.wind_speed, row.clouds) == expected[row.name], f"wrong values for {row.name}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="+", default=[15, 500])
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated server latency per request (s)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--legacy-limit", type=int, default=100, help="largest site list timed with the legacy loop")
+    args = parser.parse_args()
+
+    server, url = start_current_server(latency=args.latency)
+    print(f"{'sites':>6}  {'mode':<28}{'seconds':>9}{'speedup':>9}")
+    for n in args.sites:
+        locations = synthetic_locations(n)
+        (frame, failures), poll_time = timed(poll_locations, locations, url=url, max_workers=args.workers)
+        assert not failures and len(frame) == n, failures
+        check_values(frame, locations)
+        if n <= args.legacy_limit:
+            _, legacy_time = timed(legacy_poll, locations, url)
+            print(f"{n:>6}  {'sequential requests.get':<28}{legacy_time:>9.3f}{1:>8.1f}x")
+        else:
+            legacy_time = n * args.latency
+            print(f"{n:>6}  {'sequential (estimated)':<28}{legacy_time:>9.3f}{1:>8.1f}x")
+        print(f"{n:>6}  {f'poller workers={args.workers}':<28}{poll_time:>9.3f}{legacy_time / poll_time:>8.1f}x")
+    server.shutdown()
+
+    locations = synthetic_locations(60)
+
+    # Partial failures: 503s and responses without clouds are skipped, the rest still arrive
+    server, url = start_current_server(fail_every=7, drop_clouds_every=11)
+    frame, failures = poll_locations(locations, url=url, max_workers=8)
+    assert len(frame) + len(failures) == len(locations)
+    assert any(reason == "HTTP 503" for reason in failures.values())
+    assert any(reason == "response has no cloud cover" for reason in failures.values())
+    check_values(frame, locations)
+    print(f"\npartial failures: {len(frame)} polled, {len(failures)} skipped")
+    server.shutdown()
+
+    # Stalled requests time out instead of hanging the poll
+    server, url = start_current_server(stall_every=10, stall=3.0)
+    (frame, failures), elapsed = timed(poll_locations, locations, url=url, max_workers=8, timeout=0.5)
+    assert failures and all(reason.startswith("timed out") for reason in failures.values()), failures
+    assert elapsed < 3.0, f"stalled requests held the poll for {elapsed:.2f}s"
+    print(f"timeouts: {len(failures)} stalled sites skipped, poll took {elapsed:.2f}s")
+    server.shutdown()
+
+    # Rate limit: 40 requests at 100/s take at least (40 - burst) / 100 seconds
+    server, url = start_current_server()
+    (frame, failures), elapsed = timed(poll_locations, locations[:40], url=url, max_workers=8, rate=100)
+    assert not failures and elapsed >= (40 - 8) / 100, f"40 requests at 100/s took {elapsed:.2f}s"
+    print(f"rate limit: 40 requests at 100/s took {elapsed:.2f}s")
+    server.shutdown()
+
+    # Time budget: a list too large for the budget is cut off close to it, with the rest reported
+    server, url = start_current_server(latency=args.latency)
+    locations = synthetic_locations(2000)
+    budget = 1.0
+    (frame, failures), elapsed = timed(poll_locations, locations, url=url, max_workers=args.workers, budget=budget)
+    assert elapsed < budget + 0.5, f"poll took {elapsed:.2f}s on a {budget}s budget"
+    assert len(frame) > 0 and len(frame) + len(failures) == len(locations)
+    assert all(reason == "time budget exhausted" for reason in failures.values())
+    check_values(frame, locations)
+    print(f"budget: {len(frame)} of {len(locations)} sites polled within {budget}s (took {elapsed:.2f}s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
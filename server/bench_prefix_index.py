@@ -0,0 +1,105 @@
+"""Date-range site statistics: prefix-sum index vs a groupby over the daily table.
+
+Builds a synthetic daily table of ``--sites`` sites over ten years, then
+times the same queries (a whole range, one season, March-September of
+five years, and the top sites of each) on a ``PrefixIndex`` and as a
+filter-and-groupby over the table. Also times the cached and uncached
+``/weather/stats`` route. ``tests/test_prefix_index.py`` checks that both
+give the same statistics.
+
+    python bench_prefix_index.py --sites 2000
+"""
+import argparse
+import time
+
+import pandas as pd
+from flask import Flask
+
+from prefix_index import PrefixIndex, parse_months
+from synthetic import synthetic_locations, synthetic_table
+from weather_api import VARIABLES, WeatherSnapshot, weather_api
+from weather_store import local_day
+
+START_DATE, END_DATE = "2014-11-01", "2024-10-31"
+QUERIES = [
+    ("whole range", {}),
+    ("summer 2021", {"start": "2021-06-01", "end": "2021-08-31"}),
+    ("Mar-Sep 2019-2023", {"start": "2019-01-01", "end": "2023-12-31", "months": "3-9"}),
+    ("Nov-Feb, all years", {"months": "11-2"}),
+]
+
+
+def groupby_stats(frame, variable, start=None, end=None, months=None):
+    """The same statistics the slow way: filter the rows, then group by site."""
+    mask = pd.Series(True, index=frame.index)
+    if start:
+        mask &= frame["day"] >= pd.Timestamp(start)
+    if end:
+        mask &= frame["day"] <= pd.Timestamp(end)
+    if months:
+        first, last = parse_months(months)
+        month = frame["day"].dt.month
+        mask &= (month >= first) & (month <= last) if first <= last else (month >= first) | (month <= last)
+    # float64 like the index: pandas keeps float32 sums in float32
+    values = frame.loc[mask, variable].astype("float64")
+    grouped = values.groupby(frame.loc[mask, "location"], observed=False)
+    return grouped.count(), grouped.mean(), grouped.var()
+
+
+def timed(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frame = synthetic_table(synthetic_locations(args.sites), START_DATE, END_DATE)
+    frame = frame.assign(day=local_day(frame["date"]))
+    started = time.perf_counter()
+    index = PrefixIndex(frame, VARIABLES)
+    print(f"{args.sites} sites, {len(frame)} rows: index built in {time.perf_counter() - started:.2f}s, "
+          f"{index.nbytes / 2**20:.0f} MiB ({index.nbytes / len(frame) / len(VARIABLES):.1f} bytes per value)")
+
+    variable = "wind_speed_10m_max"
+    print(f"\n{'query':<22}{'windows':>8}{'groupby ms':>12}{'index ms':>10}{'top-k ms':>10}{'speed-up':>10}")
+    for label, params in QUERIES:
+        windows = index.windows(**params)
+        slow, _ = timed(lambda: groupby_stats(frame, variable, **params), 1)
+        fast, _ = timed(lambda: index.stats(variable, windows), args.repeat)
+        top, _ = timed(lambda: index.top(variable, args.top, windows), args.repeat)
+        print(f"{label:<22}{len(windows):>8}{slow * 1000:>12.1f}{fast * 1000:>10.3f}{top * 1000:>10.3f}"
+              f"{slow / fast:>9.0f}x")
+
+    app = Flask(__name__)
+    app.register_blueprint(weather_api)
+    snapshot = WeatherSnapshot(lambda: frame.drop(columns="day")).init_app(app)
+    snapshot.refresh()
+    path = f"/weather/stats?variable={variable}&start=2019-01-01&end=2023-12-31&months=3-9&top={args.top}"
+    with app.test_client() as client:
+        started = time.perf_counter()
+        response = client.get(path)
+        first = time.perf_counter() - started
+        assert response.status_code == 200, response.get_data(as_text=True)
+        payload = response.get_json()
+        uncached = []
+        for k in range(args.repeat):
+            started = time.perf_counter()
+            client.get(path.replace(f"top={args.top}", f"top={args.top + k + 1}"))
+            uncached.append(time.perf_counter() - started)
+        cached, _ = timed(lambda: client.get(path), args.repeat)
+    print(f"\n/weather/stats top {args.top}, Mar-Sep 2019-2023: first request (builds the index) "
+          f"{first * 1000:.0f} ms, new query {min(uncached) * 1000:.1f} ms, cached {cached * 1000:.1f} ms")
+    print(f"best site: {payload['locations'][0]} with mean {payload['mean'][0]} over {payload['count'][0]} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Memory per worker and throughput of the pre-fork server: per-worker copies vs the shared table.
+
+Writes a synthetic daily table of ``--sites`` sites over ten years to a
+temporary store and publishes it with ``SharedTable``, then for each
+worker count starts the workers of ``serve.py`` twice:
+
+- ``copy``: each worker loads the table from the store and builds its own
+  prefix-sum index, as ``app.py`` does in every process it runs in;
+- ``shared``: each worker maps the published table and index read-only.
+
+Clients send random ``/weather`` and ``/weather/stats`` queries (so most
+miss the response caches), and each worker's resident memory is then read
+from ``/proc/<pid>/smaps_rollup``: RSS counts shared pages in full in every
+process, PSS splits them between the processes that map them, and
+private is what no other process shares. Finally a new version is
+published while the shared workers serve, and the time until every
+response comes from it is measured.
+
+    python bench_serving.py --sites 400 --workers 1 2 4
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+from serve import listen, start_workers, stop_workers
+from shared_table import SHARED_ROOT, SharedTable
+from synthetic import synthetic_locations, synthetic_table
+from weather_api import VARIABLES, WeatherSnapshot, weather_api
+from weather_store import WeatherStore
+
+START_DATE, END_DATE = "2014-11-01", "2024-10-31"
+
+
+def build_app(mode, store, names, shared, refresh_interval):
+    app = Flask(__name__)
+    app.register_blueprint(weather_api)
+    if mode == "copy":
+        WeatherSnapshot(lambda: store.read(names), refresh_interval=refresh_interval).init_app(app)
+    else:
+        WeatherSnapshot(shared.frame, refresh_interval=refresh_interval, current_version=shared.current,
+                        index_loader=shared.index).init_app(app)
+    return app
+
+
+def random_path(rng, names):
+    first = (rng.randrange(2015, 2024), rng.randrange(1, 13))
+    start = f"{first[0]}-{first[1]:02d}-01"
+    end = max(start, f"{first[0] + rng.randrange(0, 2)}-{rng.randrange(1, 13):02d}-28")
+    if rng.random() < 0.5:
+        sites = ",".join(rng.sample(names, rng.randrange(1, 6)))
+        resolution = rng.choice(["day", "week", "month"])
+        return f"/weather?location={sites}&start={start}&end={end}&resolution={resolution}"
+    return (f"/weather/stats?variable={rng.choice(VARIABLES)}&start={start}&end={end}"
+            f"&months={rng.randrange(1, 13)}-{rng.randrange(1, 13)}&top=10")
+
+
+def fetch(url):
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def load(base, names, requests, clients, seed=0):
+    """Requests per second of ``requests`` random queries from ``clients`` threads."""
+    rng = random.Random(seed)
+    paths = [random_path(rng, names) for _ in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for payload in executor.map(lambda path: fetch(base + path), paths):
+            assert "version" in payload
+    return requests / (time.perf_counter() - started)
+
+
+def memory(pid):
+    """``(rss, pss, private)`` bytes of one process."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[key] = int(value.split()[0]) * 1024
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def swap_seconds(base, shared, timeout=30):
+    """Publishes a changed table and waits until every response in a row of 50 comes from it."""
+    frame = SharedTable(shared.root).frame()
+    version = shared.publish(frame.assign(sunshine_duration=frame["sunshine_duration"] + 1), VARIABLES)
+    started = time.perf_counter()
+    streak = 0
+    while streak < 50:
+        assert time.perf_counter() - started < timeout, "workers did not pick up the new version"
+        streak = streak + 1 if fetch(base + "/weather/stats?variable=sunshine_duration")["version"] == version else 0
+    return time.perf_counter() - started
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    locations = synthetic_locations(args.sites)
+    names = [location["name"] for location in locations]
+    frame = synthetic_table(locations, START_DATE, END_DATE)
+    store = WeatherStore(tempfile.mkdtemp(prefix="weather-store-"))
+    store.write(frame, START_DATE, END_DATE)
+    shared = SharedTable(tempfile.mkdtemp(prefix="bench-", dir=os.path.dirname(SHARED_ROOT)))
+    version = shared.publish(frame, VARIABLES)
+    print(f"{args.sites} sites, {len(frame)} rows; published "
+          f"{directory_size(os.path.join(shared.root, version)) / 2**20:.0f} MiB under {shared.root}")
+    # Workers would otherwise inherit the table's pages from this process
+    del frame
+
+    try:
+        print(f"\n{'mode':<8}{'workers':>8}{'req/s':>9}{'RSS MiB':>10}{'PSS MiB':>10}{'private MiB':>13}"
+              f"{'total PSS MiB':>15}")
+        for workers in args.workers:
+            for mode in ("copy", "shared"):
+                app = build_app(mode, store, names, shared, refresh_interval=3600 if mode == "copy" else 0.2)
+                sock = listen("127.0.0.1", 0)
+                base = f"http://127.0.0.1:{sock.getsockname()[1]}"
+                pids = start_workers(app, sock, workers)
+                try:
+                    load(base, names, args.clients * 2, args.clients, seed=1)
+                    rate = load(base, names, args.requests, args.clients)
+                    rss, pss, private = (sum(values) / workers for values in zip(*(memory(pid) for pid in pids)))
+                    print(f"{mode:<8}{workers:>8}{rate:>9.0f}{rss / 2**20:>10.0f}{pss / 2**20:>10.0f}"
+                          f"{private / 2**20:>13.0f}{pss * workers / 2**20:>15.0f}")
+                    if mode == "shared" and workers == max(args.workers):
+                        swapped = swap_seconds(base, shared)
+                finally:
+                    stop_workers(pids)
+                    sock.close()
+    finally:
+        shutil.rmtree(shared.root, ignore_errors=True)
+        shutil.rmtree(store.root, ignore_errors=True)
+
+    print(f"\nnew version served by all {max(args.workers)} shared workers {swapped:.2f}s after publishing")
+    print("RSS and PSS are averages per worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Times the vectorised site-similarity network against a pairwise build.
+
+The reference pivots the daily table with ``pivot_table``, correlates the
+sites with ``DataFrame.corr`` and adds one edge per matrix cell, which is
+what the original ``create_similarity_network`` did (over columns instead
+of sites). The vectorised build is also timed block-wise under a small
+memory limit, with the matrix in a file, and with top-k selection.
+``tests/test_similarity.py`` checks that all of them give the same graph.
+
+    python bench_similarity.py --sites 200 1000 --years 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from community import create_similarity_network
+from fetcher import DAILY_VARIABLES
+from synthetic import synthetic_locations, synthetic_table
+from weather_store import local_day
+
+
+def pairwise_network(data, variables=DAILY_VARIABLES):
+    """Site correlations from a pandas pivot, loaded into the graph one edge at a time."""
+    frame = data.assign(location=data["location"].astype(str), day=local_day(data["date"]))
+    columns = []
+    for variable in variables:
+        values = frame[variable].astype(np.float64)
+        columns.append(frame.assign(**{variable: (values - values.mean()) / values.std(ddof=0)})
+                       .pivot_table(index="location", columns="day", values=variable, dropna=False))
+    pivot = pd.concat(columns, axis=1)
+    pivot = pivot.T.fillna(pivot.mean(axis=1)).T
+    correlation = pivot.T.corr()
+
+    G = nx.Graph()
+    G.add_nodes_from(correlation.index)
+    for loc1 in correlation.index:
+        for loc2 in correlation.columns:
+            if loc1 != loc2:
+                weight = correlation.loc[loc1, loc2]
+                if weight > 0:
+                    G.add_edge(loc1, loc2, weight=weight)
+    return G
+
+
+def timed(build, *args, **kwargs):
+    started = time.perf_counter()
+    result = build(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--k", type=int, default=10, help="neighbours kept per site in the top-k build")
+    parser.add_argument("--skip-reference", type=int, default=2000,
+                        help="only time the vectorised builds above this many sites")
+    args = parser.parse_args()
+
+    start_date = "2019-01-01"
+    end_date = (pd.Timestamp(start_date) + pd.DateOffset(years=args.years) - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    print(f"{'sites':>6}{'edges':>10}{'pairwise s':>12}{'dense s':>9}{'blocked s':>11}{'top-k s':>9}{'top-k edges':>13}")
+    for n in args.sites:
+        data = synthetic_table(synthetic_locations(n), start_date, end_date)
+        dense, dense_time = timed(create_similarity_network, data, variables=DAILY_VARIABLES)
+        # A quarter of the matrix: chunks of an eighth of the days, and the rest for blocks of rows
+        days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+        with tempfile.TemporaryDirectory() as directory:
+            _, blocked_time = timed(create_similarity_network, data, variables=DAILY_VARIABLES,
+                                    memory_limit=8 * n * len(DAILY_VARIABLES) * days // 4,
+                                    matrix_path=os.path.join(directory, "matrix.npy"))
+        nearest, nearest_time = timed(create_similarity_network, data, variables=DAILY_VARIABLES, k=args.k)
+
+        if n <= args.skip_reference:
+            _, reference_time = timed(pairwise_network, data)
+            reference_column = f"{reference_time:>12.3f}"
+        else:
+            reference_column = f"{'-':>12}"
+
+        print(f"{n:>6}{dense.number_of_edges():>10}{reference_column}{dense_time:>9.3f}{blocked_time:>11.3f}"
+              f"{nearest_time:>9.3f}{nearest.number_of_edges():>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Offline benchmark suite for the data and graph pipeline, with a result history.
+
+Every case runs on synthetic, deterministic inputs of ``sites x days``, so
+runs are comparable across machines and commits and need no network:
+
+- ``parse``: decode recorded Open-Meteo FlatBuffer responses into the daily table
+  (the parsing half of ``fetch_weather_data``);
+- ``store_read``: read the same table back from a ``WeatherStore``;
+- ``yearly_averages``: ``calculate_yearly_averages`` with the rollup cache disabled
+  (hashing the table, then the groupby);
+- ``create_network``: the wind/distance site graph (about 20 neighbours per site);
+- ``similarity_network``: ``create_similarity_network`` with top-10 neighbours;
+- ``analyze_network``: PageRank and communities on the site graph;
+- ``centrality``: betweenness (``--pivots`` sampled sources) and closeness.
+
+Graph analyses and rollups run with the result cache disabled. Each case is repeated
+and its minimum and median are appended as JSON lines to the history file
+together with the commit and library versions. ``--compare`` flags cases
+slower than the last recorded run of the same case, scale and machine, by
+more than both a ratio and an absolute noise floor, and exits non-zero.
+
+    python bench_suite.py --scales 100x365 1000x1825 --repeat 5 --compare
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+HISTORY_PATH = "../benchmarks/history.jsonl"
+START_DATE = "2014-11-01"
+NEIGHBOURS = 20
+# Area of the synthetic sites' bounding box (43.6-48.2 N, 20.3-29.7 E) in km²
+AREA_KM2 = 511 * 730
+
+
+def parse_scale(text):
+    sites, days = text.lower().split("x")
+    return int(sites), int(days)
+
+
+def recorded_responses(locations, days):
+    """The FlatBuffer payload the archive API would send for ``locations`` over ``days`` days."""
+    from stub_server import encode_weather_response, synthetic_series
+
+    end_date = (pd.Timestamp(START_DATE) + pd.Timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    return b"".join(
+        encode_weather_response(loc["lat"], loc["lon"], START_DATE,
+                                synthetic_series(loc["lat"], loc["lon"], START_DATE, end_date), location_id=i)
+        for i, loc in enumerate(locations)
+    ), end_date
+
+
+def parse(payload, locations):
+    from daily_table import TableBuilder
+    from fetcher import DAILY_VARIABLES, add_response, decode_responses
+
+    builder = TableBuilder(DAILY_VARIABLES)
+    for loc, response in zip(locations, decode_responses(payload)):
+        add_response(builder, loc["name"], response)
+    return builder.build()
+
+
+def neighbour_radius(sites, neighbours=NEIGHBOURS):
+    """Radius in km giving about ``neighbours`` linked sites; three in four pairs pass the wind filter."""
+    return float(np.sqrt(neighbours * AREA_KM2 / (np.pi * sites * 0.75)))
+
+
+def build_cases(sites, days, pivots, workdir):
+    """Returns ``[(case, function, sizes)]``; inputs are prepared here, outside the timings."""
+    import aggregation
+    import analysis_cache
+    from aggregation import calculate_yearly_averages
+    from community import calculate_centrality_measures, create_similarity_network
+    from data_processing import analyze_network, create_network
+    from synthetic import synthetic_locations, synthetic_sites
+    from weather_store import WeatherStore
+
+    analysis_cache.default_cache = analysis_cache.ResultCache(directory=None, memory_items=0)
+    aggregation.default_rollups = aggregation.RollupCache(max_items=0)
+
+    locations = synthetic_locations(sites)
+    payload, end_date = recorded_responses(locations, days)
+    data = parse(payload, locations)
+    store = WeatherStore(os.path.join(workdir, f"store-{sites}x{days}"))
+    store.write(data, START_DATE, end_date)
+    names = [loc["name"] for loc in locations]
+
+    observations = synthetic_sites(sites)
+    radius = neighbour_radius(sites)
+    G = create_network(observations, radius=radius, metric="haversine")
+
+    rows = {"rows": len(data)}
+    graph = {"nodes": G.number_of_nodes(), "edges": G.number_of_edges()}
+    return [
+        ("parse", lambda: parse(payload, locations), {**rows, "bytes": len(payload)}),
+        ("store_read", lambda: store.read(names, start_date=START_DATE, end_date=end_date), rows),
+        ("yearly_averages", lambda: calculate_yearly_averages(data), rows),
+        ("create_network", lambda: create_network(observations, radius=radius, metric="haversine"), graph),
+        ("similarity_network", lambda: create_similarity_network(data, k=10), rows),
+        ("analyze_network", lambda: analyze_network(G.copy(), backend="sparse"), graph),
+        ("centrality", lambda: calculate_centrality_measures(G.copy(), backend="sparse", k=min(pivots, sites)),
+         {**graph, "pivots": min(pivots, sites)}),
+    ]
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import networkx
+    import scipy
+
+    return {
+        "commit": commit,
+        "machine": f"{platform.system()} {platform.machine()} {os.cpu_count()} cpus",
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "networkx": networkx.__version__,
+    }
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, records):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def previous_runs(history, machine):
+    """Latest record of every ``(case, scale)`` measured on ``machine``."""
+    latest = {}
+    for record in history:
+        if record["machine"] == machine:
+            latest[(record["case"], record["scale"])] = record
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", default=["100x365", "1000x1825"], help="SITESxDAYS")
+    parser.add_argument("--cases", nargs="*", help="cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pivots", type=int, default=128, help="sampled sources for betweenness")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON lines file the results are appended to")
+    parser.add_argument("--no-record", action="store_true", help="do not append to the history")
+    parser.add_argument("--compare", action="store_true", help="compare with the last run on this machine")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.01,
+                        help="slowdowns of fewer seconds than this are timer noise, never regressions")
+    args = parser.parse_args()
+
+    env = environment()
+    baseline = previous_runs(read_history(args.history), env["machine"]) if args.compare else {}
+    recorded = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    records, regressions = [], []
+
+    print(f"{'scale':>11}  {'case':<20}{'min s':>9}{'median s':>10}{'previous':>10}{'ratio':>7}  sizes")
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            sites, days = parse_scale(scale)
+            for case, function, sizes in build_cases(sites, days, args.pivots, workdir):
+                if args.cases and case not in args.cases:
+                    continue
+                best, median = measure(function, args.repeat)
+                record = {**env, "recorded": recorded, "case": case, "scale": scale, "sites": sites, "days": days,
+                          "repeat": args.repeat, "min": round(best, 6), "median": round(median, 6), "sizes": sizes}
+                records.append(record)
+
+                previous = baseline.get((case, scale))
+                ratio = best / previous["min"] if previous else None
+                if ratio is not None and ratio > args.threshold and best - previous["min"] > args.min_delta:
+                    regressions.append((case, scale, ratio))
+                print(f"{scale:>11}  {case:<20}{best:>9.4f}{median:>10.4f}"
+                      f"{previous['min'] if previous else float('nan'):>10.4f}"
+                      f"{ratio if ratio is not None else float('nan'):>7.2f}  "
+                      + ", ".join(f"{key}={value}" for key, value in sizes.items()))
+
+    if not args.no_record:
+        append_history(args.history, records)
+        print(f"\nappended {len(records)} results to {args.history}")
+    for case, scale, ratio in regressions:
+        print(f"REGRESSION {case} at {scale}: {ratio:.2f}x slower than the last run")
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""All (year, metric) betweenness snapshots: the temporal engine vs one NetworkX graph per snapshot.
+
+Builds yearly averages for synthetic sites, then computes betweenness for
+every year and metric both the old way (a complete ``nx.Graph`` per
+snapshot and ``nx.betweenness_centrality``) and with
+``temporal_betweenness``. Averages are first mapped to distinct whole
+numbers, so that path-length ties are exact in floating point and both
+must agree. The rounded averages as they come are then compared too;
+there NetworkX breaks ties by float rounding and, for sites with equal
+averages, can count paths twice.
+
+    python bench_temporal.py --sites 40 --years 10
+"""
+import argparse
+import time
+
+import networkx as nx
+
+import analysis_cache
+from aggregation import calculate_yearly_averages
+from synthetic import synthetic_locations, synthetic_table
+from temporal import METRICS, snapshot, temporal_betweenness
+
+
+def networkx_snapshots(yearly_avg, years, metrics):
+    """``{(year, metric): {location: betweenness}}`` built as ``figures.betweenness_map_figure`` used to."""
+    result = {}
+    for year in years:
+        year_data = yearly_avg[yearly_avg['year'] == year]
+        names = year_data['location'].tolist()
+        for metric in metrics:
+            values = year_data[metric].tolist()
+            G = nx.Graph()
+            for i, loc1 in enumerate(names):
+                for j, loc2 in enumerate(names):
+                    if i != j:
+                        G.add_edge(loc1, loc2, weight=abs(values[i] - values[j]))
+            result[year, metric] = nx.betweenness_centrality(G, weight='weight')
+    return result
+
+
+def largest_difference(table, reference):
+    return max(abs(snapshot(table, year, metric)[name] - value)
+               for (year, metric), values in reference.items() for name, value in values.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=40)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    analysis_cache.default_cache = analysis_cache.ResultCache(directory=None)
+    end_date = f"{2014 + args.years}-10-31"
+    yearly_avg = calculate_yearly_averages(synthetic_table(synthetic_locations(args.sites), "2014-11-01", end_date))
+    years = sorted(yearly_avg["year"].unique().tolist())
+    site = yearly_avg["location"].astype("category").cat.codes
+    exact = yearly_avg.assign(**{metric: (yearly_avg[metric] * 100).round() * args.sites + site
+                                 for metric in METRICS})
+    print(f"{args.sites} sites, {len(years)} years x {len(METRICS)} metrics = {len(years) * len(METRICS)} snapshots")
+
+    started = time.perf_counter()
+    reference = networkx_snapshots(exact, years, METRICS)
+    baseline = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table = temporal_betweenness(exact, workers=args.workers)
+    engine = time.perf_counter() - started
+    difference = largest_difference(table, reference)
+    assert difference < 1e-9, f"distinct whole-number averages differ from NetworkX by {difference}"
+
+    started = time.perf_counter()
+    temporal_betweenness(exact, workers=args.workers)
+    cached = time.perf_counter() - started
+    assert analysis_cache.default_cache.stats["memory_hits"] == 1
+
+    rounded = largest_difference(temporal_betweenness(yearly_avg, workers=args.workers),
+                                 networkx_snapshots(yearly_avg, years, METRICS))
+
+    print(f"{'networkx, graph per snapshot':<34}{baseline:>9.3f}s")
+    print(f"{'temporal engine':<34}{engine:>9.3f}s  ({baseline / engine:.1f}x)")
+    print(f"{'same averages again (cached)':<34}{cached:>9.4f}s")
+    print(f"\n{len(table)} rows; distinct whole-number averages match NetworkX to {difference:.1e}")
+    print(f"rounded averages: largest difference {rounded:.3f} from NetworkX's tie-breaking")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Map tiles vs the full site list: bytes and points per viewport, build and serving times.
+
+Writes a synthetic network file of dense candidate sites, serves it through
+``tiles_api`` and, for a range of zoom levels, fetches the tiles covering a
+viewport of fixed pixel width, as ``client/script.js`` does. Checks that
+every level keeps all sites and all PageRank, and that restarting loads the
+saved pyramid instead of rebuilding it.
+
+    python bench_tiles.py --sites 50000
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from flask import Flask
+
+from synthetic import synthetic_sites
+from tiles import CELL_BITS, MAX_ZOOM, TileCache, tile_range, tiles_api
+
+VIEWPORT_WIDTH = 800
+
+
+def write_network(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    sites = synthetic_sites(n, seed)
+    nodes = [
+        {"name": name, "lat": lat, "lon": lon, "pagerank": pagerank, "community": int(community)}
+        for name, lat, lon, pagerank, community in zip(sites["name"], sites["lat"], sites["lon"],
+                                                       rng.dirichlet(np.ones(n)), rng.integers(0, 30, n))
+    ]
+    with open(path, "w") as f:
+        json.dump({"version": 1, "updated": None, "nodes": nodes}, f)
+    return sites
+
+
+def build_app(cache):
+    app = Flask(__name__)
+    app.register_blueprint(tiles_api)
+    cache.init_app(app)
+    return app
+
+
+def viewport(center, zoom):
+    """Bounding box ``VIEWPORT_WIDTH`` tile pixels wide around ``center`` at ``zoom`` (square in degrees)."""
+    half = VIEWPORT_WIDTH * 360 / (256 * 2 ** zoom) / 2
+    return center[0] - half, center[1] - half / 2, center[0] + half, center[1] + half / 2
+
+
+def fetch_viewport(client, bbox, zoom):
+    """Returns ``(tiles, cells, bytes, seconds)`` for all tiles of ``bbox``."""
+    x0, x1, y0, y1 = tile_range(bbox, zoom)
+    started = time.perf_counter()
+    tiles = cells = size = 0
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            response = client.get(f"/tiles/{zoom}/{x}/{y}.json", headers={"Accept-Encoding": "gzip"})
+            assert response.status_code == 200, response.status_code
+            size += len(response.data)
+            tiles += 1
+    elapsed = time.perf_counter() - started
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            cells += len(client.get(f"/tiles/{zoom}/{x}/{y}.json").get_json()["cells"]["lat"])
+    return tiles, cells, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=50000)
+    parser.add_argument("--zooms", type=int, nargs="+", default=[5, 6, 7, 8, 10, 12])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        network_path = os.path.join(workdir, "network_data.json")
+        tiles_dir = os.path.join(workdir, "tiles")
+        sites = write_network(network_path, args.sites)
+        with open(network_path, "rb") as f:
+            full = f.read()
+        print(f"{args.sites} sites: full site list {len(full) / 2**20:.1f} MiB, "
+              f"{len(gzip.compress(full)) / 2**20:.1f} MiB gzipped")
+
+        cache = TileCache(network_path, tiles_dir)
+        started = time.perf_counter()
+        cache.refresh()
+        print(f"pyramid built in {time.perf_counter() - started:.2f}s "
+              f"(zoom 0-{MAX_ZOOM}, {2 ** CELL_BITS}x{2 ** CELL_BITS} cells per tile), "
+              f"{sum(os.path.getsize(os.path.join(tiles_dir, f)) for f in os.listdir(tiles_dir)) / 2**20:.1f} MiB on disk")
+        for zoom, level in cache.levels.items():
+            assert level["count"].sum() == args.sites, f"zoom {zoom} lost sites"
+            assert abs(level["pagerank"].sum() - 1) < 1e-9, f"zoom {zoom} lost PageRank"
+
+        restarted = TileCache(network_path, tiles_dir)
+        started = time.perf_counter()
+        restarted.refresh()
+        assert restarted.stats["loaded"] == 1 and restarted.stats["built"] == 0
+        print(f"restart loaded the saved pyramid in {time.perf_counter() - started:.2f}s")
+
+        app = build_app(cache)
+        center = (float(sites["lon"].mean()), float(sites["lat"].mean()))
+        print(f"\n{'zoom':>4}{'tiles':>7}{'points':>9}{'gzip bytes':>12}{'cold ms':>9}{'cached ms':>11}")
+        with app.test_client() as client:
+            for zoom in args.zooms:
+                bbox = viewport(center, zoom)
+                tiles, cells, size, cold = fetch_viewport(client, bbox, zoom)
+                _, _, _, warm = fetch_viewport(client, bbox, zoom)
+                assert cells <= tiles * 4 ** CELL_BITS
+                print(f"{zoom:>4}{tiles:>7}{cells:>9}{size:>12}{cold * 1000:>9.1f}{warm * 1000:>11.1f}")
+        print(f"\ntile cache: {cache.stats}")
+
+
+if __name__ == "__main__":
+    main()
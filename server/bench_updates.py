@@ -0,0 +1,90 @@
+"""Bytes per dashboard update: ``/updates`` deltas vs reloading ``/data`` and ``/stat``.
+
+Writes synthetic network and statistics files for ``--sites`` sites, then
+publishes new versions in which a given number of sites changed PageRank
+or community. For each version it reports the size of the full documents,
+the size of the delta event and the time the feed took to diff them.
+``tests/test_updates.py`` checks the deltas and the catch-up rules.
+
+    python bench_updates.py --sites 100 1000 10000 --changed 1 10 100
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from pipeline import _write_json
+from synthetic import synthetic_locations
+from updates import DeltaFeed
+
+
+def network_document(sites, pagerank, community, version):
+    nodes = [{"name": site["name"], "lat": site["lat"], "lon": site["lon"], "pagerank": float(p),
+              "community": int(c)} for site, p, c in zip(sites, pagerank, community)]
+    return {"version": version, "updated": None, "nodes": nodes}
+
+
+def statistics_document(sites, wind, version):
+    order = np.argsort(-wind)[:5]
+    return {"version": version, "updated": None,
+            "top_wind": [{"name": sites[i]["name"], "wind_speed": round(float(wind[i]), 2)} for i in order],
+            "top_solar": [], "average_wind": float(wind.mean()), "average_solar": 0.0}
+
+
+class Network:
+    """Synthetic site graph whose versions change ``changed`` sites at a time."""
+
+    def __init__(self, directory, sites, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.sites = synthetic_locations(sites)
+        self.pagerank = self.rng.random(sites)
+        self.pagerank /= self.pagerank.sum()
+        self.community = self.rng.integers(0, 8, sites)
+        self.wind = self.rng.random(sites) * 10
+        self.version = 0
+        self.network_path = os.path.join(directory, "network_data.json")
+        self.statistics_path = os.path.join(directory, "statistics.json")
+
+    def publish(self, changed=0):
+        """Writes the next version with ``changed`` random sites changed; returns the full documents' size."""
+        chosen = self.rng.choice(len(self.sites), changed, replace=False)
+        self.pagerank[chosen] *= self.rng.choice([0.8, 1.25], changed)
+        self.community[chosen[::2]] = self.rng.integers(0, 8, len(chosen[::2]))
+        self.wind[chosen] = self.rng.random(changed) * 10
+        self.version += 1
+        network = network_document(self.sites, self.pagerank, self.community, self.version)
+        statistics = statistics_document(self.sites, self.wind, self.version)
+        _write_json(self.network_path, network)
+        _write_json(self.statistics_path, statistics)
+        # The server re-encodes both compactly (see FileCache)
+        return sum(len(json.dumps(document, separators=(",", ":"))) for document in (network, statistics))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--changed", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'sites':>7}{'changed':>9}{'full KiB':>10}{'delta KiB':>11}{'ratio':>8}{'diff ms':>9}")
+        for sites in args.sites:
+            network = Network(directory, sites)
+            network.publish()
+            feed = DeltaFeed(network.network_path, network.statistics_path)
+            feed.check()
+            for changed in (c for c in args.changed if c <= sites):
+                full = network.publish(changed)
+                started = time.perf_counter()
+                feed.check()
+                seconds = time.perf_counter() - started
+                _, [event] = feed.since(str(network.version - 1))
+                print(f"{sites:>7}{changed:>9}{full / 1024:>10.1f}{len(event) / 1024:>11.2f}"
+                      f"{full / len(event):>7.0f}x{seconds * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Load test for ``/weather``: the old fetch-per-request handler vs the snapshot endpoint.
+
+Both handlers read the same store, filled from the local stub archive server.
+
+    python bench_weather_endpoint.py --sites 7 --requests 50
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, jsonify
+
+from fetcher import fetch_locations, make_session
+from stub_server import start_archive_server
+from synthetic import synthetic_locations
+from weather_api import WeatherSnapshot, weather_api
+from weather_store import WeatherStore
+
+
+def build_app(loader):
+    app = Flask(__name__)
+    app.register_blueprint(weather_api)
+    WeatherSnapshot(loader).init_app(app)
+
+    @app.route("/weather-legacy")
+    def legacy_weather_data():
+        daily_df = loader()
+        daily_json = daily_df.to_dict(orient="records")
+        return jsonify(daily=daily_json)
+
+    return app
+
+
+def load_test(app, path, n_requests, clients, headers=None):
+    """Returns ``(requests per second, bytes of the last response)``."""
+    def hit(_):
+        with app.test_client() as client:
+            response = client.get(path, headers=headers or {})
+            assert response.status_code in (200, 304), response.status_code
+            return len(response.data)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        sizes = list(executor.map(hit, range(n_requests)))
+    return n_requests / (time.perf_counter() - started), sizes[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=7)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=4)
+    args = parser.parse_args()
+
+    server, url = start_archive_server()
+    locations = synthetic_locations(args.sites)
+    names = [location["name"] for location in locations]
+    store = WeatherStore(tempfile.mkdtemp(prefix="weather-store-"))
+    store.write(fetch_locations(locations, "2014-11-01", "2024-11-02", url=url,
+                                session=make_session(cache_name=None), batch_size=10),
+                "2014-11-01", "2024-11-02")
+    server.shutdown()
+
+    app = build_app(lambda: store.read(names))
+    snapshot = app.extensions["weather_snapshot"]
+    snapshot.ensure_started()
+    snapshot.wait_ready()
+
+    gzip = {"Accept-Encoding": "gzip"}
+    with app.test_client() as client:
+        etag = client.get("/weather", headers=gzip).headers["ETag"]
+
+    scenarios = [
+        ("legacy: fetch + to_dict + jsonify", "/weather-legacy", None),
+        ("snapshot: full table", "/weather", None),
+        ("snapshot: full table, gzip", "/weather", gzip),
+        ("snapshot: full table, If-None-Match", "/weather", {**gzip, "If-None-Match": etag}),
+        ("snapshot: 1 site, 1 var, monthly", f"/weather?location={names[0]}&variable=wind_speed_10m_max"
+                                             "&resolution=month", gzip),
+    ]
+    n = args.requests
+    print(f"{'scenario':<40}{'req/s':>10}{'bytes':>12}")
+    for label, path, headers in scenarios:
+        rps, size = load_test(app, path, n if "legacy" not in label else max(3, n // 10), args.clients, headers)
+        print(f"{label:<40}{rps:>10.1f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,71 @@
-import pandas as pd
 import numpy as np
 import networkx as nx
-import plotly.express as px
-from sklearn.metrics.pairwise import euclidean_distances
 
 from analysis import fetch_weather_data
-from map import calculate_yearly_averages
+from metrics import timed
+
+@timed("graph.similarity")
+def create_similarity_network(data, variables=None, metric='pearson', k=None, threshold=None,
+                              memory_limit=256 * 2**20, matrix_path=None):
+    """Builds a graph of locations linked by how similar their daily weather series are.
+
+    The daily table is pivoted to a (sites x days) matrix and all pairwise
+    similarities come out of one matrix product, computed in blocks that
+    fit ``memory_limit`` bytes; ``matrix_path`` keeps the (sites x days)
+    matrix in that file instead of RAM. ``metric`` is ``'pearson'`` (correlation)
+    or ``'euclidean'`` (``1 / (1 + distance)``); ``k`` keeps each site's
+    ``k`` most similar sites and ``threshold`` drops weaker pairs.
+    ``variables`` defaults to every numeric column.
+    """
+    from similarity import similarity_edges, site_matrix
+
+    if variables is None:
+        variables = data.select_dtypes(include=[np.number]).columns.tolist()
+    names, X = site_matrix(data, variables, path=matrix_path)
+    i, j, weights = similarity_edges(X, metric=metric, k=k, threshold=threshold, memory_limit=memory_limit)
 
-def create_similarity_network(yearly_avg):
-    # Filter the DataFrame to only include numeric columns
-    numeric_df = yearly_avg.select_dtypes(include=[np.number])
-    correlation_matrix = numeric_df.corr()  # Compute correlation matrix
     G = nx.Graph()
-
-    for loc1 in correlation_matrix.index:
-        for loc2 in correlation_matrix.columns:
-            if loc1 != loc2:
-                weight = correlation_matrix.loc[loc1, loc2]
-                if weight != 0:  # Only add edges with non-zero weight
-                    G.add_edge(loc1, loc2, weight=weight)
-
+    G.add_nodes_from(names)
+    names = np.array(names, dtype=object)
+    G.add_weighted_edges_from(zip(names[i].tolist(), names[j].tolist(), weights.tolist()))
     return G
 
 
-def community_detection(G):
-    """Detects communities in the network using Louvain method."""
+def community_detection(G, seed=0):
+    """Detects communities in the network using Louvain method, seeded so the cached partition is reproducible."""
     import community as community_louvain
-    partition = community_louvain.best_partition(G)
+    from analysis_cache import memoize
+    partition = memoize('best_partition', G, lambda: community_louvain.best_partition(G, random_state=seed),
+                        seed=seed)
     nx.set_node_attributes(G, partition, 'community')
     return partition
 
-def calculate_centrality_measures(G):
-    """Calculates centrality measures for the graph."""
-    betweenness = nx.betweenness_centrality(G)
-    closeness = nx.closeness_centrality(G)
+@timed("graph.centrality")
+def calculate_centrality_measures(G, backend='networkx', k=None):
+    """Calculates centrality measures for the graph.
+
+    ``backend='sparse'`` computes both on a CSR matrix; with ``k`` set,
+    betweenness is approximated from ``k`` sampled pivots. Results are
+    memoised by ``analysis_cache`` on the graph's content.
+    """
+    from analysis_cache import graph_key, memoize
+
+    graph_hash = graph_key(G)
+    if backend == 'sparse':
+        import graph_backend
+
+        def sparse(algorithm, **kwargs):
+            nodes, A = graph_backend.to_csr(G)
+            return graph_backend.as_node_dict(nodes, algorithm(A, **kwargs))
+
+        betweenness = memoize('betweenness', G, lambda: sparse(graph_backend.betweenness, k=k, seed=0),
+                              graph_hash=graph_hash, backend=backend, k=k, seed=0)
+        closeness = memoize('closeness', G, lambda: sparse(graph_backend.closeness),
+                            graph_hash=graph_hash, backend=backend)
+    else:
+        betweenness = memoize('betweenness', G, lambda: nx.betweenness_centrality(G, k=k, seed=0 if k else None),
+                              graph_hash=graph_hash, backend=backend, k=k)
+        closeness = memoize('closeness', G, lambda: nx.closeness_centrality(G), graph_hash=graph_hash, backend=backend)
     
     # Store centrality as node attributes
     nx.set_node_attributes(G, betweenness, 'betweenness')
@@ -41,77 +73,24 @@ def calculate_centrality_measures(G):
 
 def visualize_network(G):
     """Visualizes the network using Plotly."""
-    pos = nx.spring_layout(G)  # Spring layout for plotting
-
-    # Extract data for plotting
-    edge_x = []
-    edge_y = []
-    for edge in G.edges():
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_x += [x0, x1, None]
-        edge_y += [y0, y1, None]
-
-    edge_trace = go.Scatter(
-        x=edge_x, y=edge_y,
-        line=dict(width=0.5, color='#888'),
-        hoverinfo='none',
-        mode='lines')
-
-    # Create node trace
-    node_x = []
-    node_y = []
-    node_text = []
-    for node in G.nodes():
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-        node_text.append(f"{node} - Betweenness: {G.nodes[node]['betweenness']:.2f}, "
-                         f"Closeness: {G.nodes[node]['closeness']:.2f}")
-    
-    node_trace = go.Scatter(
-        x=node_x, y=node_y,
-        mode='markers+text',
-        text=node_text,
-        textposition="bottom center",
-        hoverinfo='text',
-        marker=dict(
-            showscale=True,
-            colorscale='YlGnBu',
-            size=10,
-            color=[G.nodes[node]['community'] for node in G.nodes()],  # Color by community
-            colorbar=dict(
-                thickness=15,
-                title='Community',
-                xanchor='left',
-                titleside='right'
-            ),
-        )
-    )
-
-    fig = go.Figure(data=[edge_trace, node_trace],
-                    layout=go.Layout(
-                        title='Weather Similarity Network',
-                        showlegend=False,
-                        hovermode='closest',
-                        margin=dict(b=0, l=0, r=0, t=40),
-                        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
-                    ))
-    fig.show()
-
-# Fetch weather data and calculate yearly averages
-data = fetch_weather_data()
-yearly_avg = calculate_yearly_averages(data)
-
-# Create the similarity network
-G = create_similarity_network(yearly_avg)
-
-# Detect communities
-community_detection(G)
-
-# Calculate centrality measures
-calculate_centrality_measures(G)
-
-# Visualize the network
-visualize_network(G)
+    from figures import network_figure
+    network_figure(G).show()
+
+def main():
+    # Fetch the daily weather data
+    data = fetch_weather_data()
+
+    # Create the similarity network
+    G = create_similarity_network(data, k=10)
+
+    # Detect communities
+    community_detection(G)
+
+    # Calculate centrality measures
+    calculate_centrality_measures(G)
+
+    # Visualize the network
+    visualize_network(G)
+
+if __name__ == "__main__":
+    main()
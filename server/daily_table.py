@@ -0,0 +1,91 @@
+"""Compact in-memory layout of the combined daily weather table.
+
+``location`` is categorical (small integer codes over the site names),
+``date`` is ``datetime64[s, UTC]`` and every weather variable is float32.
+``TableBuilder`` collects each site's arrays, allocates one buffer per
+column for the total row count and copies the arrays into their slices, so
+no per-site DataFrame is built and nothing is concatenated.
+"""
+import numpy as np
+import pandas as pd
+from pandas.arrays import DatetimeArray
+
+DATE_DTYPE = pd.DatetimeTZDtype("s", "UTC")
+
+
+def utc_dates(seconds):
+    """``datetime64[s, UTC]`` array over a ``datetime64[s]`` array, without copying it when pandas allows.
+
+    pandas has no public way to wrap existing storage as a tz-aware array
+    (``tz_localize`` copies the column), so this uses the private
+    ``DatetimeArray._simple_new``, checked against pandas 3.0. If
+    a release changes it, the column is copied instead.
+    """
+    try:
+        dates = DatetimeArray._simple_new(seconds, dtype=DATE_DTYPE)
+        if dates.dtype == DATE_DTYPE and len(dates) == len(seconds):
+            return dates
+    except (AttributeError, TypeError, ValueError):
+        pass
+    return pd.DatetimeIndex(seconds).tz_localize("UTC").array
+
+
+class TableBuilder:
+    """Assembles the daily table from per-site arrays with one allocation per column."""
+
+    def __init__(self, variables=None):
+        self.variables = None if variables is None else list(variables)
+        self._parts = []
+
+    def add(self, name, dates, values):
+        """Queues one block of rows for ``name``.
+
+        ``dates`` is a datetime64 array or a ``(start, interval, count)``
+        tuple in epoch seconds; ``values`` maps variable names to arrays of
+        the same length. Variables missing from a block are NaN.
+        """
+        self._parts.append((name, dates, values))
+
+    def __len__(self):
+        return sum(self._count(dates) for _, dates, _ in self._parts)
+
+    @staticmethod
+    def _count(dates):
+        return dates[2] if isinstance(dates, tuple) else len(dates)
+
+    def build(self):
+        variables = self.variables
+        if variables is None:
+            variables = []
+            for _, _, values in self._parts:
+                variables.extend(v for v in values if v not in variables)
+
+        total = len(self)
+        categories = list(dict.fromkeys(name for name, _, _ in self._parts))
+        code_of = {name: code for code, name in enumerate(categories)}
+        codes = np.empty(total, dtype=np.min_scalar_type(-max(len(categories), 1)))
+        # Filled as epoch seconds through an int64 view and wrapped as UTC dates at the end
+        dates = np.empty(total, dtype="datetime64[s]")
+        seconds = dates.view(np.int64)
+        # One buffer for all variables; each of its rows becomes a column without a copy
+        block = np.full((len(variables), total), np.nan, dtype=np.float32)
+        row_of = {variable: i for i, variable in enumerate(variables)}
+
+        offset = 0
+        for name, part_dates, values in self._parts:
+            n = self._count(part_dates)
+            rows = slice(offset, offset + n)
+            codes[rows] = code_of[name]
+            if isinstance(part_dates, tuple):
+                start, interval, _ = part_dates
+                seconds[rows] = np.arange(start, start + n * interval, interval, dtype=np.int64)
+            else:
+                seconds[rows] = np.asarray(part_dates).astype("datetime64[s]").view(np.int64)
+            for variable, array in values.items():
+                if variable in row_of:
+                    block[row_of[variable], rows] = array
+            offset += n
+
+        columns = {"location": pd.Categorical.from_codes(codes, categories=categories), "date": utc_dates(dates)}
+        columns.update(zip(variables, block))
+        return pd.DataFrame(columns, copy=False)
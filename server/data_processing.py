@@ -1,7 +1,12 @@
 import networkx as nx
-import pandas as pd
-import requests
+import numpy as np
 import json
+import logging
+import os
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
 
 locations = [
     {"name": "Bucharest", "lat": 44.4268, "lon": 26.1025},
@@ -21,51 +26,135 @@ locations = [
     {"name": "Resita", "lat": 45.3075, "lon": 21.8924},
 ]
 
-def fetch_weather_data(location):
-    api_key = "YOUR_API_KEY"
-    url = f"http://api.openweathermap.org/data/2.5/weather?lat={location['lat']}&lon={location['lon']}&appid={api_key}&exclude=minutely,hourly,alerts"
-    response = requests.get(url)
-    data = response.json()
-    wind_speed = data.get('wind', {}).get('speed')
-    clouds = data.get('clouds').get('all')
-
-    return wind_speed, clouds
-
-def build_dataframe(locations):
-    data = []
-    for loc in locations:
-        wind_speed, clouds = fetch_weather_data(loc)
-        if wind_speed is not None and clouds is not None:
-            data.append({
-                "name": loc["name"],
-                "lat": loc["lat"],
-                "lon": loc["lon"],
-                "wind_speed": wind_speed,
-                "clouds": clouds,
-            })
-    return pd.DataFrame(data)
-
-def create_network(df):
+def fetch_weather_data(location, session=None, timeout=10):
+    """Returns ``(wind_speed, clouds)`` for one location; a value missing from the response is None."""
+    from poller import fetch_current, make_session
+    if session is None:
+        with make_session(pool_size=1) as session:
+            return fetch_current(session, location, timeout=timeout)
+    return fetch_current(session, location, timeout=timeout)
+
+def build_dataframe(locations, **poll_options):
+    """Polls the current wind speed and cloud cover of every location concurrently.
+
+    Sites that fail, time out or lack a value are skipped and logged rather
+    than aborting the build. ``poll_options`` are passed to
+    ``poller.poll_locations`` (``max_workers``, ``rate``, ``timeout``, ``budget``, ...).
+    """
+    from poller import poll_locations
+    df, failures = poll_locations(locations, **poll_options)
+    for name, reason in failures.items():
+        logger.warning("skipped %s: %s", name, reason)
+    return df
+
+EARTH_RADIUS_KM = 6371.0088
+
+def neighbour_pairs(lat, lon, radius, metric='euclidean'):
+    """Finds all site pairs closer than ``radius`` with a spatial index.
+
+    ``metric='euclidean'`` measures in raw lat/lon degrees (the original
+    behaviour); ``metric='haversine'`` measures great-circle distance in km
+    with a ball tree. Returns ``(i, j, distance)`` arrays with ``i < j``,
+    sorted in nested-loop order.
+    """
+    from sklearn.neighbors import BallTree, KDTree
+
+    if metric == 'haversine':
+        tree = BallTree(np.radians(np.column_stack([lat, lon])), metric='haversine')
+        neighbours, distances = tree.query_radius(tree.data, r=radius / EARTH_RADIUS_KM, return_distance=True)
+        distances = [d * EARTH_RADIUS_KM for d in distances]
+    elif metric == 'euclidean':
+        tree = KDTree(np.column_stack([lat, lon]))
+        neighbours, distances = tree.query_radius(tree.data, r=radius, return_distance=True)
+    else:
+        raise ValueError(f"unknown metric {metric!r}, expected 'euclidean' or 'haversine'")
+
+    counts = np.fromiter((len(n) for n in neighbours), dtype=np.intp, count=len(neighbours))
+    i = np.repeat(np.arange(len(neighbours)), counts)
+    j = np.concatenate(neighbours) if len(neighbours) else np.empty(0, dtype=np.intp)
+    distance = np.concatenate(distances) if len(distances) else np.empty(0)
+
+    keep = (i < j) & (distance < radius)
+    i, j, distance = i[keep], j[keep], distance[keep]
+    order = np.lexsort((j, i))
+    return i[order], j[order], distance[order]
+
+def weighted_pairs(lat, lon, radius, metric='euclidean'):
+    """Returns ``(i, j, weight)`` for every site pair closer than ``radius``; the weight falls with distance.
+
+    Weights only depend on the site positions, so they can be computed once
+    and reused while the wind speeds that decide which pairs are linked change.
+    """
+    i, j, distance = neighbour_pairs(lat, lon, radius, metric)
+    if metric == 'euclidean':
+        # Recomputed with scalar arithmetic so weights match the original
+        # nested loop bit for bit; vectorised sums can be one ulp off
+        weights = np.array([
+            1 / ((dlat ** 2 + dlon ** 2) ** 0.5 + 1)  # Adding 1 to avoid division by zero
+            for dlat, dlon in zip((lat[i] - lat[j]).tolist(), (lon[i] - lon[j]).tolist())
+        ], dtype=float)
+    else:
+        weights = 1 / (distance + 1)
+    return i, j, weights
+
+@timed("graph.build")
+def create_network(df, radius=10, metric='euclidean', max_wind_diff=5):
+    """Builds the site graph, linking sites closer than ``radius`` whose wind speeds differ by less than ``max_wind_diff``.
+
+    Candidate pairs come from a spatial index, so sparse networks build in
+    roughly linear time. The default metric keeps the original distance in
+    degrees; pass ``metric='haversine'`` with ``radius`` in km for
+    geographically correct distances.
+    """
     G = nx.Graph()
-    for _, row in df.iterrows():
-        G.add_node(row['name'], pos=(row['lat'], row['lon']), wind_speed=row['wind_speed'], clouds=row['clouds'])
-
-    for i in range(len(df)):
-        for j in range(i + 1, len(df)):
-            node_a = df.iloc[i]
-            node_b = df.iloc[j]
-            distance = ((node_a['lat'] - node_b['lat']) ** 2 + (node_a['lon'] - node_b['lon']) ** 2) ** 0.5
-            wind_diff = abs(node_a['wind_speed'] - node_b['wind_speed'])
-            
-            if distance < 10 and wind_diff < 5:  # Consider more nodes based on distance and wind difference
-                G.add_edge(node_a['name'], node_b['name'], weight=1 / (distance + 1))  # Adding 1 to avoid division by zero
+    names = df['name'].to_numpy()
+    G.add_nodes_from(
+        (name, {'pos': (lat, lon), 'wind_speed': wind_speed, 'clouds': clouds})
+        for name, lat, lon, wind_speed, clouds in zip(
+            names.tolist(), df['lat'].tolist(), df['lon'].tolist(), df['wind_speed'].tolist(), df['clouds'].tolist()
+        )
+    )
+    if len(df) < 2:
+        return G
+
+    wind = df['wind_speed'].to_numpy(dtype=float)
+    i, j, weights = weighted_pairs(df['lat'].to_numpy(dtype=float), df['lon'].to_numpy(dtype=float), radius, metric)
+    keep = np.abs(wind[i] - wind[j]) < max_wind_diff
+    G.add_weighted_edges_from(zip(names[i[keep]].tolist(), names[j[keep]].tolist(), weights[keep].tolist()))
     return G
 
 
-def analyze_network(G):
-    pagerank_scores = nx.pagerank(G)
+def _greedy_communities(G):
     communities = nx.algorithms.community.greedy_modularity_communities(G)
-    community_dict = {node: i for i, comm in enumerate(communities) for node in comm}
+    return {node: i for i, comm in enumerate(communities) for node in comm}
+
+
+@timed("graph.analyze")
+def analyze_network(G, backend='networkx'):
+    """Adds PageRank and community attributes to every node.
+
+    ``backend='sparse'`` converts the graph once to a CSR matrix and uses
+    vectorised PageRank and Louvain from ``graph_backend``, which scales to
+    much larger graphs than NetworkX's greedy modularity. Results are
+    memoised by ``analysis_cache`` on the graph's content.
+    """
+    from analysis_cache import graph_key, memoize
+
+    graph_hash = graph_key(G)
+    if backend == 'sparse':
+        import graph_backend
+
+        def sparse(algorithm, **kwargs):
+            nodes, A = graph_backend.to_csr(G)
+            return graph_backend.as_node_dict(nodes, algorithm(A, **kwargs))
+
+        pagerank_scores = memoize('pagerank', G, lambda: sparse(graph_backend.pagerank),
+                                  graph_hash=graph_hash, backend=backend)
+        community_dict = memoize('louvain', G, lambda: sparse(graph_backend.louvain, seed=0),
+                                 graph_hash=graph_hash, backend=backend, seed=0)
+    else:
+        pagerank_scores = memoize('pagerank', G, lambda: nx.pagerank(G), graph_hash=graph_hash, backend=backend)
+        community_dict = memoize('greedy_modularity', G, lambda: _greedy_communities(G), graph_hash=graph_hash)
     nx.set_node_attributes(G, pagerank_scores, 'pagerank')
     nx.set_node_attributes(G, community_dict, 'community')
     return G
@@ -79,23 +168,27 @@ def calculate_statistics(df):
 
     return top_wind, top_solar, average_wind, average_solar
 
-def save_statistics_to_json(statistics, filename='../assets/statistics.json'):
-    with open(filename, 'w') as f:
-        json.dump(statistics, f)
-
-def main():
-    df = build_dataframe(locations)
-    G = create_network(df)
-    G = analyze_network(G)
+def build_statistics(df):
+    """The ``statistics.json`` document for the current observations."""
     top_wind, top_solar, avg_wind, avg_solar = calculate_statistics(df)
-
-    statistics = {
+    return {
         "top_wind": top_wind.to_dict(orient='records'),
         "top_solar": top_solar.to_dict(orient='records'),
         "average_wind": avg_wind,
         "average_solar": avg_solar,
     }
-    save_statistics_to_json(statistics)
+
+def save_statistics_to_json(statistics, filename='../assets/statistics.json'):
+    # Written next to the target and renamed so /stat never serves a partial file
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(statistics, f)
+    os.replace(tmp, filename)
+
+def main():
+    """Runs one pipeline tick: polls every site and rewrites both asset files."""
+    from pipeline import NetworkPipeline
+    NetworkPipeline(locations).tick()
 
 if __name__ == "__main__":
     main()
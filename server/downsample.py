@@ -0,0 +1,108 @@
+"""Point-budget downsampling of long time series for plotting.
+
+Both selectors return indices into the original series, so the kept points
+are real observations, and both take ``y`` as one series or as a
+``(series, points)`` array sharing the same ``x``:
+
+- ``lttb`` (Largest-Triangle-Three-Buckets) keeps the point of each bucket
+  that spans the largest triangle with its neighbours, which preserves the
+  visual shape of the line with exactly ``points`` points;
+- ``minmax`` keeps the smallest and the largest value of each bucket plus
+  both ends, so no peak is lost. With one bucket per pixel column
+  (``points = 2 * width``) the line draws the same as the full series.
+
+NaN values are only kept when a whole bucket is NaN.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+MIN_POINTS = 4
+
+
+def _check(y, points):
+    if points < MIN_POINTS:
+        raise ValueError(f"points must be at least {MIN_POINTS}")
+    y = np.asarray(y, dtype=np.float64)
+    return y.ndim == 1, np.atleast_2d(y)
+
+
+def _everything(single, y):
+    indices = np.broadcast_to(np.arange(y.shape[1]), y.shape).copy()
+    return indices[0] if single else indices
+
+
+def lttb_indices(x, y, points):
+    """Indices of the ``points`` points Largest-Triangle-Three-Buckets keeps, shape ``(points,)`` or ``(series, points)``.
+
+    Buckets are walked in order since each choice depends on the previous
+    one; every bucket is handled for all series at once.
+    """
+    single, y = _check(y, points)
+    series, n = y.shape
+    if n <= points:
+        return _everything(single, y)
+    x = np.asarray(x, dtype=np.float64)
+
+    # The first and last points are always kept; the rest is split into points - 2 buckets
+    edges = (np.arange(points - 1) * ((n - 2) / (points - 2))).astype(np.intp) + 1
+    edges[-1] = n - 1
+    # Third corner of each bucket's triangles: the average of the next bucket (the last
+    # point for the last one), which does not depend on the choices so far
+    present = ~np.isnan(y)
+    starts = np.append(edges[1:-1], n - 1)
+    count = np.add.reduceat(present, starts, axis=1, dtype=np.intp)
+    total = np.add.reduceat(np.where(present, y, 0.0), starts, axis=1)
+    with np.errstate(invalid="ignore"):
+        y_next = total / count
+    x_next = np.add.reduceat(x, starts) / np.diff(np.append(starts, n))
+
+    rows = np.arange(series)
+    selected = np.empty((series, points), dtype=np.intp)
+    selected[:, 0] = 0
+    selected[:, -1] = n - 1
+    previous = np.zeros(series, dtype=np.intp)
+    for b in range(points - 2):
+        start, stop = edges[b], edges[b + 1]
+        x_a, y_a = x[previous], y[rows, previous]
+        area = np.abs((x_a - x_next[b])[:, None] * (y[:, start:stop] - y_a[:, None])
+                      - (x_a[:, None] - x[start:stop]) * (y_next[:, b] - y_a)[:, None])
+        previous = start + np.where(np.isnan(area), -1.0, area).argmax(axis=1)
+        selected[:, b + 1] = previous
+    return selected[0] if single else selected
+
+
+def minmax_indices(y, points):
+    """Indices of each bucket's minimum and maximum plus both ends, at most ``points`` per series, sorted.
+
+    Fully vectorised: the series are padded to equal-width buckets and
+    reduced along the last axis.
+    """
+    single, y = _check(y, points)
+    series, n = y.shape
+    if n <= points:
+        return _everything(single, y)
+
+    width = -(-n // ((points - 2) // 2))
+    buckets = -(-n // width)
+    padded = np.full((series, buckets * width), np.nan)
+    padded[:, :n] = y
+    padded = padded.reshape(series, buckets, width)
+    missing = np.isnan(padded)
+    offsets = np.arange(buckets) * width
+    low = np.where(missing, np.inf, padded).argmin(axis=2) + offsets
+    high = np.where(missing, -np.inf, padded).argmax(axis=2) + offsets
+
+    ends = np.broadcast_to([0, n - 1], (series, 2))
+    selected = np.minimum(np.concatenate([ends, low, high], axis=1), n - 1)
+    selected.sort(axis=1)
+    return selected[0] if single else selected
+
+
+def downsample_indices(x, y, points, method="lttb"):
+    """Dispatches to ``lttb_indices`` or ``minmax_indices``; rows may repeat an index with ``minmax``."""
+    if method == "lttb":
+        return lttb_indices(x, y, points)
+    if method == "minmax":
+        return minmax_indices(y, points)
+    raise ValueError(f"unknown method {method!r}, expected one of {', '.join(METHODS)}")
+
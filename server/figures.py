@@ -0,0 +1,262 @@
+"""Plotly figure builders shared by the scripts and the batch renderer.
+
+Every function returns a ``go.Figure`` and never shows it, so the same code
+serves interactive scripts (``fig.show()``) and headless rendering
+(``fig.write_html`` / ``fig.to_json``).
+"""
+import itertools
+
+import networkx as nx
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from analysis import locations
+
+LOCATION_COORDS = {location["name"]: (location["lat"], location["lon"]) for location in locations}
+BETWEENNESS_METRICS = {
+    "shortwave_radiation_sum": "UV",
+    "wind_speed_10m_max": "Wind 10m",
+    "sunshine_duration": "Sunshine",
+}
+
+
+def weather_figure(data, points=None, method="lttb"):
+    """Shortwave radiation and maximum wind speed for each location.
+
+    With ``points`` each trace is downsampled to that many points (see
+    ``downsample``), which keeps the figure light in the browser.
+    """
+    fig = make_subplots(
+        rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1,
+        subplot_titles=("Shortwave Radiation (kWh/m²)", "Maximum Wind Speed (m/s)")
+    )
+
+    color_palette = ["#636EFA", "#EF553B", "#00CC96", "#AB63FA", "#FFA15A", "#19D3F3", "#FF6692"]
+
+    for i, location in enumerate(data['location'].unique()):
+        location_data = data[data['location'] == location]
+        radiation, wind = _downsampled(location_data, ['shortwave_radiation_sum', 'wind_speed_10m_max'],
+                                       points, method)
+
+        fig.add_trace(
+            go.Scatter(
+                x=radiation['date'], y=radiation['shortwave_radiation_sum'],
+                mode='lines', name=f'{location} Shortwave Radiation',
+                line=dict(color=color_palette[i % len(color_palette)], width=2)
+            ),
+            row=1, col=1
+        )
+
+        fig.add_trace(
+            go.Scatter(
+                x=wind['date'], y=wind['wind_speed_10m_max'],
+                mode='lines', name=f'{location} Max Wind Speed', line=dict(dash="dot", color=color_palette[i % len(color_palette)], width=2)
+            ),
+            row=2, col=1
+        )
+
+    fig.update_xaxes(
+        title_text="Date", tickformat="%Y-%m", ticks="outside", showgrid=True, tickangle=45, row=2, col=1
+    )
+
+    fig.update_layout(
+        title="Weather Data Visualization",
+        template="plotly_white",
+        legend=dict(
+            title="Locations",
+            orientation="h",
+            yanchor="top", y=1.1, xanchor="center", x=0.5
+        ),
+        hovermode="x unified"
+    )
+
+    fig.update_yaxes(title_text="Radiation (kWh/m²)", row=1, col=1)
+    fig.update_yaxes(title_text="Wind Speed (m/s)", row=2, col=1)
+
+    return fig
+
+
+def _downsampled(location_data, columns, points, method):
+    """The rows of ``location_data`` to draw for each column, reduced to ``points`` points if set."""
+    if points is None or len(location_data) <= points:
+        return [location_data] * len(columns)
+    from downsample import downsample_indices
+    kept = downsample_indices(location_data['date'].array.asi8,
+                              location_data[columns].to_numpy(dtype='float64').T, points, method)
+    return [location_data.iloc[np.unique(index)] for index in kept]
+
+
+def yearly_map_figure(yearly_avg, year, coords=LOCATION_COORDS):
+    """Yearly averages of one year on a map."""
+    year_data = yearly_avg[yearly_avg['year'] == year].assign(
+        latitude=lambda d: d['location'].map(lambda x: coords[x][0]),
+        longitude=lambda d: d['location'].map(lambda x: coords[x][1]),
+    )
+
+    # plotly >= 5.24 renders tiles with MapLibre (scatter_map); older releases only have scatter_mapbox
+    if hasattr(px, "scatter_map"):
+        scatter_map, style_key = px.scatter_map, "map_style"
+    else:
+        scatter_map, style_key = px.scatter_mapbox, "mapbox_style"
+    fig = scatter_map(
+        year_data,
+        lat="latitude",
+        lon="longitude",
+        size="shortwave_radiation_sum",
+        color="wind_speed_10m_max",
+        hover_name="location",
+        hover_data={
+            "shortwave_radiation_sum": True,  # Solar Radiation (kWh/m²)
+            "wind_speed_10m_max": True,  # Max Wind Speed (m/s)
+            "sunshine_duration": True,  # Sunshine Duration (hours)
+            "year": False,
+            "latitude": False,
+            "longitude": False
+        },
+        color_continuous_scale="Viridis",
+        size_max=15,
+        zoom=5,
+        title=f"Yearly Weather Averages for {year}"
+    )
+
+    # Update labels for readability
+    fig.update_traces(
+        hovertemplate="<b>%{hovertext}</b><br><br>" +
+                      "Solar Radiation: %{customdata[0]} kWh/m²<br>" +
+                      "Max Wind Speed: %{customdata[1]} m/s<br>" +
+                      "Sunshine Duration: %{customdata[2]} hours"
+    )
+
+    # Customize map layout
+    fig.update_layout(
+        {style_key: "carto-positron"},
+        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+        title={
+            'text': f"Average Yearly Weather Data for {year}",
+            'x': 0.5,
+            'xanchor': 'center'
+        }
+    )
+
+    return fig
+
+
+def betweenness_map_figure(yearly_avg, year, metric, coords=LOCATION_COORDS, betweenness=None):
+    """Map of one year with node sizes from betweenness on the |difference| of ``metric`` between sites.
+
+    ``betweenness`` is ``{location: value}`` from a precomputed ``temporal``
+    table; without it the single snapshot is computed here.
+    """
+    year_data = yearly_avg[(yearly_avg['year'] == year) & yearly_avg[metric].notna()]
+    names = year_data['location'].tolist()
+    if betweenness is None:
+        from temporal import snapshot, temporal_betweenness
+        betweenness = snapshot(temporal_betweenness(year_data, [year], [metric]), year, metric)
+
+    # Every pair of sites is linked in the weather similarity graph
+    edges = itertools.combinations(names, 2)
+    return betweenness_figure(names, betweenness, edges, year, BETWEENNESS_METRICS.get(metric, metric), coords)
+
+
+def betweenness_figure(names, betweenness, edges, year, label, coords=LOCATION_COORDS):
+    """Draws sites sized by betweenness, with ``edges`` as lines."""
+    edge_lat = []
+    edge_lon = []
+    for a, b in edges:
+        edge_lat += [coords[a][0], coords[b][0], None]  # None to break the line
+        edge_lon += [coords[a][1], coords[b][1], None]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scattergeo(
+        mode='lines',
+        lon=edge_lon,
+        lat=edge_lat,
+        line=dict(width=1, color='blue'),
+        hoverinfo='none'
+    ))
+
+    # Node size based on betweenness centrality, scaled for visibility
+    fig.add_trace(go.Scattergeo(
+        mode='markers+text',
+        lon=[coords[name][1] for name in names],
+        lat=[coords[name][0] for name in names],
+        text=list(names),
+        textposition="bottom center",
+        marker=dict(size=[betweenness[name] * 1000 for name in names], color='red'),
+        hoverinfo='text'
+    ))
+
+    fig.update_layout(
+        title=f"Average Yearly Weather Data for {year} with Betweenness Centrality - {label}",
+        showlegend=False,
+        geo=dict(
+            scope='europe',
+            showland=True,
+            landcolor="lightgray",
+            subunitcolor="blue",
+            countrycolor="black",
+        )
+    )
+
+    return fig
+
+
+def network_figure(G, seed=None):
+    """Similarity network in a spring layout, coloured by community."""
+    pos = nx.spring_layout(G, seed=seed)
+
+    edge_x = []
+    edge_y = []
+    for edge in G.edges():
+        x0, y0 = pos[edge[0]]
+        x1, y1 = pos[edge[1]]
+        edge_x += [x0, x1, None]
+        edge_y += [y0, y1, None]
+
+    edge_trace = go.Scatter(
+        x=edge_x, y=edge_y,
+        line=dict(width=0.5, color='#888'),
+        hoverinfo='none',
+        mode='lines')
+
+    node_x = []
+    node_y = []
+    node_text = []
+    for node in G.nodes():
+        x, y = pos[node]
+        node_x.append(x)
+        node_y.append(y)
+        node_text.append(f"{node} - Betweenness: {G.nodes[node]['betweenness']:.2f}, "
+                         f"Closeness: {G.nodes[node]['closeness']:.2f}")
+
+    node_trace = go.Scatter(
+        x=node_x, y=node_y,
+        mode='markers+text',
+        text=node_text,
+        textposition="bottom center",
+        hoverinfo='text',
+        marker=dict(
+            showscale=True,
+            colorscale='YlGnBu',
+            size=10,
+            color=[G.nodes[node]['community'] for node in G.nodes()],  # Color by community
+            colorbar=dict(
+                thickness=15,
+                title=dict(text='Community', side='right'),
+                xanchor='left',
+            ),
+        )
+    )
+
+    return go.Figure(data=[edge_trace, node_trace],
+                     layout=go.Layout(
+                         title='Weather Similarity Network',
+                         showlegend=False,
+                         hovermode='closest',
+                         margin=dict(b=0, l=0, r=0, t=40),
+                         xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                         yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
+                     ))
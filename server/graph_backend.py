@@ -0,0 +1,188 @@
+"""Array-backed graph analytics on a SciPy CSR adjacency matrix.
+
+The NetworkX graph is converted once with ``to_csr`` and every algorithm
+below works on the sparse matrix, so the per-node Python overhead of
+NetworkX only appears in the final ``set_node_attributes`` call.
+"""
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import shortest_path
+
+
+def to_csr(G, weight='weight'):
+    """Returns ``(nodes, adjacency)`` for ``G`` with rows in ``list(G)`` order."""
+    nodes = list(G)
+    return nodes, nx.to_scipy_sparse_array(G, nodelist=nodes, weight=weight, dtype=float, format='csr')
+
+
+def pagerank(A, alpha=0.85, max_iter=100, tol=1.0e-6, nstart=None):
+    """Vectorised power iteration with the same update and stopping rule as ``nx.pagerank``.
+
+    ``nstart`` warm-starts the iteration from a previous score vector.
+    """
+    N = A.shape[0]
+    if N == 0:
+        return np.empty(0)
+    out_weight = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse = np.zeros(N)
+    inverse[~dangling] = 1.0 / out_weight[~dangling]
+    Q = sp.diags_array(inverse) @ A
+
+    x = np.full(N, 1.0 / N) if nstart is None else np.asarray(nstart, dtype=float) / np.sum(nstart)
+    p = np.full(N, 1.0 / N)
+    for _ in range(max_iter):
+        xlast = x
+        x = alpha * (x @ Q + x[dangling].sum() * p) + (1 - alpha) * p
+        if np.abs(x - xlast).sum() < N * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
+def _local_moving(A, resolution, rng, initial=None):
+    """One Louvain phase: greedily move nodes to the neighbouring community with the best modularity gain.
+
+    Nodes start in their own community, or in ``initial`` when given.
+    """
+    n = A.shape[0]
+    indptr, indices, data = A.indptr, A.indices, A.data
+    degree = np.asarray(A.sum(axis=1)).ravel()
+    m2 = degree.sum()
+    if initial is None:
+        community = np.arange(n)
+        total = degree.copy()
+    else:
+        _, community = np.unique(initial, return_inverse=True)
+        total = np.bincount(community, weights=degree, minlength=n)
+
+    improved = False
+    moved = True
+    while moved:
+        moved = False
+        for u in rng.permutation(n):
+            start, end = indptr[u], indptr[u + 1]
+            neighbours, weights = indices[start:end], data[start:end]
+            not_self = neighbours != u
+            neighbour_communities = community[neighbours[not_self]]
+
+            current = community[u]
+            total[current] -= degree[u]
+            candidates, position = np.unique(neighbour_communities, return_inverse=True)
+            links = np.bincount(position, weights=weights[not_self], minlength=len(candidates))
+            gains = links - resolution * total[candidates] * degree[u] / m2
+            stay = links[candidates == current].sum() - resolution * total[current] * degree[u] / m2
+            best = current
+            if len(candidates) and gains.max() > stay + 1e-12:
+                best = candidates[np.argmax(gains)]
+            total[best] += degree[u]
+            if best != current:
+                community[u] = best
+                moved = True
+                improved = True
+
+    _, community = np.unique(community, return_inverse=True)
+    return community, improved
+
+
+def louvain(A, resolution=1.0, seed=None, initial=None):
+    """Louvain community detection on a symmetric weighted CSR matrix.
+
+    Returns one community label per row, numbered by decreasing community
+    size like ``greedy_modularity_communities``. ``initial`` warm-starts the
+    first phase from a previous labelling (any integers, one per row), so
+    after a small change to the graph only the affected nodes move.
+    """
+    n = A.shape[0]
+    if n == 0 or A.sum() == 0:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    membership = np.arange(n)
+    level = A.tocsr()
+    while True:
+        community, improved = _local_moving(level, resolution, rng, initial)
+        # A warm start still aggregates its communities even if no node moved
+        if not improved and initial is None:
+            break
+        initial = None
+        membership = community[membership]
+        P = sp.csr_array((np.ones(level.shape[0]), (np.arange(level.shape[0]), community)))
+        level = (P.T @ level @ P).tocsr()
+
+    sizes = np.bincount(membership)
+    rank = np.empty_like(sizes)
+    rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+    return rank[membership]
+
+
+def betweenness(A, k=None, seed=None, batch_size=64):
+    """Unweighted betweenness centrality by batched algebraic Brandes.
+
+    Breadth-first searches from a batch of sources run as sparse
+    matrix products. With ``k`` only ``k`` random pivots are used and the
+    result is scaled like ``nx.betweenness_centrality(G, k=k)``.
+    """
+    n = A.shape[0]
+    if n == 0:
+        return np.empty(0)
+    adjacency = A.astype(bool).astype(float)
+    adjacency = (adjacency - sp.diags_array(adjacency.diagonal())).tocsr()
+    adjacency.eliminate_zeros()
+    if k is None or k >= n:
+        sources = np.arange(n)
+    else:
+        sources = np.random.default_rng(seed).choice(n, size=k, replace=False)
+
+    centrality = np.zeros(n)
+    for batch_start in range(0, len(sources), batch_size):
+        batch = sources[batch_start:batch_start + batch_size]
+        b = len(batch)
+        sigma = np.zeros((n, b))
+        depth = np.full((n, b), -1)
+        sigma[batch, np.arange(b)] = 1
+        depth[batch, np.arange(b)] = 0
+
+        frontier = sigma.copy()
+        d = 0
+        while frontier.any():
+            reached = adjacency @ frontier
+            new = (reached > 0) & (depth == -1)
+            d += 1
+            depth[new] = d
+            sigma[new] = reached[new]
+            frontier = np.where(new, sigma, 0.0)
+
+        delta = np.zeros((n, b))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for level in range(d, 0, -1):
+                share = np.where(depth == level, (1 + delta) / sigma, 0.0)
+                delta += np.where(depth == level - 1, sigma * (adjacency @ share), 0.0)
+        delta[batch, np.arange(b)] = 0
+        centrality += delta.sum(axis=1)
+
+    scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 1.0
+    if k is not None and k < n:
+        scale *= n / k
+    return centrality * scale
+
+
+def closeness(A, batch_size=256):
+    """Unweighted closeness centrality with the Wasserman-Faust correction, as in ``nx.closeness_centrality``."""
+    n = A.shape[0]
+    result = np.zeros(n)
+    for start in range(0, n, batch_size):
+        rows = np.arange(start, min(start + batch_size, n))
+        distances = shortest_path(A, unweighted=True, directed=False, indices=rows)
+        reachable = np.isfinite(distances)
+        total = np.where(reachable, distances, 0).sum(axis=1)
+        count = reachable.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = np.where(total > 0, (count - 1) / total, 0.0)
+        if n > 1:
+            value *= (count - 1) / (n - 1)
+        result[rows] = value
+    return result
+
+
+def as_node_dict(nodes, values):
+    return dict(zip(nodes, values.tolist()))
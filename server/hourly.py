@@ -0,0 +1,321 @@
+"""Streaming ingestion of hourly archive data with memory independent of the site count.
+
+Hourly series are 24 times the daily table, so they are never combined
+into one frame. Batches of sites are fetched with at most ``max_workers``
+responses in flight, and every site's series is walked in fixed-size
+chunks of ``chunk_hours``. Each chunk:
+
+- is appended to the site's raw Arrow IPC file;
+- is folded into per-day count, sum, minimum and maximum;
+- is counted into a fixed-edge histogram per variable.
+
+When a site's series ends, its daily aggregates are written next to the
+raw file and reduced to monthly rows. Only the monthly rows and the
+histogram counts are kept in memory across sites. The layout is::
+
+    <root>/<location>/hourly.arrow   # raw series, one record batch per chunk
+    <root>/<location>/daily.arrow    # <variable>_hours/_mean/_min/_max per local day
+    <root>/monthly.arrow             # the same per location and month
+    <root>/histograms.npz            # <variable>_edges and <variable>_counts (site x bin)
+
+Days are local days from the response's UTC offset. Values outside a
+histogram's edges are counted in its first or last bin.
+
+    python hourly.py --root .hourly_store --workers 4
+"""
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from fetcher import ARCHIVE_URL, HostLimiter, fetch_batch, make_session
+from metrics import stage
+
+HOURLY_VARIABLES = ["wind_speed_100m", "shortwave_radiation"]
+HISTOGRAM_EDGES = {
+    "wind_speed_100m": np.arange(0.0, 40.5, 0.5),  # m/s
+    "shortwave_radiation": np.arange(0.0, 1225.0, 25.0),  # W/m²
+}
+DEFAULT_EDGES = np.linspace(0.0, 100.0, 101)
+CHUNK_HOURS = 24 * 365
+HOURLY_STORE = ".hourly_store"
+DAY = 86400
+
+
+def _pyarrow():
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401 - registers pa.ipc
+    return pa
+
+
+class SiteAggregator:
+    """Daily count, sum, minimum and maximum of one site's hourly series, fed chunk by chunk."""
+
+    def __init__(self, start, interval, count, utc_offset, variables):
+        self.variables = list(variables)
+        self.start = start
+        self.interval = interval
+        self.local_start = start + utc_offset
+        self.first_day = self.local_start // DAY
+        days = (self.local_start + max(count - 1, 0) * interval) // DAY - self.first_day + 1
+        self.counts = {v: np.zeros(days, dtype=np.int32) for v in self.variables}
+        self.sums = {v: np.zeros(days) for v in self.variables}
+        self.minimum = {v: np.full(days, np.nan, dtype=np.float32) for v in self.variables}
+        self.maximum = {v: np.full(days, np.nan, dtype=np.float32) for v in self.variables}
+
+    def add(self, first, values):
+        """Folds in hours ``first`` to ``first + len`` of every variable in ``values``."""
+        n = len(next(iter(values.values())))
+        day = (self.local_start + (first + np.arange(n, dtype=np.int64)) * self.interval) // DAY - self.first_day
+        # Hours are in time order, so each day is one contiguous segment of the chunk
+        starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+        days = day[starts]
+        for variable, chunk in values.items():
+            present = ~np.isnan(chunk)
+            self.counts[variable][days] += np.add.reduceat(present, starts, dtype=np.int32)
+            self.sums[variable][days] += np.add.reduceat(np.where(present, chunk, 0.0), starts, dtype=np.float64)
+            self.minimum[variable][days] = np.fmin(self.minimum[variable][days], np.fmin.reduceat(chunk, starts))
+            self.maximum[variable][days] = np.fmax(self.maximum[variable][days], np.fmax.reduceat(chunk, starts))
+
+    def _days(self):
+        days = len(self.counts[self.variables[0]])
+        return (self.first_day + np.arange(days)).astype("datetime64[D]")
+
+    def daily(self):
+        """Per-day aggregates as a frame; ``day`` is the local calendar day."""
+        columns = {"day": self._days().astype("datetime64[s]")}
+        for variable in self.variables:
+            counts = self.counts[variable]
+            columns[f"{variable}_hours"] = counts
+            with np.errstate(invalid="ignore", divide="ignore"):
+                columns[f"{variable}_mean"] = (self.sums[variable] / counts).astype(np.float32)
+            columns[f"{variable}_min"] = self.minimum[variable]
+            columns[f"{variable}_max"] = self.maximum[variable]
+        return pd.DataFrame(columns)
+
+    def monthly(self):
+        """Per-month aggregates as ``{column: array}``, the mean weighted by the hours present on each day."""
+        months = self._days().astype("datetime64[M]")
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        columns = {"month": months[starts].astype("datetime64[s]")}
+        for variable in self.variables:
+            hours = np.add.reduceat(self.counts[variable], starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.add.reduceat(self.sums[variable], starts) / hours
+            columns[f"{variable}_hours"] = hours
+            columns[f"{variable}_mean"] = mean.astype(np.float32)
+            columns[f"{variable}_min"] = np.fmin.reduceat(self.minimum[variable], starts)
+            columns[f"{variable}_max"] = np.fmax.reduceat(self.maximum[variable], starts)
+        return columns
+
+
+class HourlyStore:
+    """Per-site raw hourly files and daily aggregates, plus the monthly table and histograms."""
+
+    def __init__(self, root=HOURLY_STORE):
+        self.root = root
+
+    def site_dir(self, name):
+        return os.path.join(self.root, quote(name, safe=""))
+
+    def _read(self, path, columns=None):
+        pa = _pyarrow()
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table.to_pandas()
+
+    def write_frame(self, path, frame):
+        """Writes ``frame`` to ``path`` as an Arrow IPC file, replacing it atomically."""
+        pa = _pyarrow()
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        tmp = path + ".tmp"
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+
+    def read_hourly(self, name, columns=None):
+        """The raw series of one site; the file is memory-mapped and only ``columns`` (plus ``date``) are read."""
+        return self._read(os.path.join(self.site_dir(name), "hourly.arrow"),
+                          None if columns is None else ["date"] + list(columns))
+
+    def read_daily(self, name, columns=None):
+        return self._read(os.path.join(self.site_dir(name), "daily.arrow"),
+                          None if columns is None else ["day"] + list(columns))
+
+    def read_monthly(self):
+        return self._read(os.path.join(self.root, "monthly.arrow"))
+
+    def read_histograms(self):
+        """``(locations, {variable: (edges, counts)})`` with ``counts[site, bin]`` in the order of ``locations``."""
+        with np.load(os.path.join(self.root, "histograms.npz")) as f:
+            locations = json.loads(str(f["locations"]))
+            variables = [key[:-len("_edges")] for key in f.files if key.endswith("_edges")]
+            return locations, {v: (f[f"{v}_edges"], f[f"{v}_counts"]) for v in variables}
+
+
+class _RawWriter:
+    """Appends chunks of one site's series to ``hourly.arrow`` as record batches."""
+
+    def __init__(self, path, variables):
+        pa = _pyarrow()
+        self.pa = pa
+        self.path = path
+        self.variables = variables
+        self.schema = pa.schema([("date", pa.timestamp("s", tz="UTC"))] + [(v, pa.float32()) for v in variables])
+        self._sink = pa.OSFile(path + ".tmp", "wb")
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, seconds, values):
+        pa = self.pa
+        arrays = [pa.array(seconds, type=pa.timestamp("s", tz="UTC"))]
+        arrays += [pa.array(np.asarray(values[v], dtype=np.float32)) for v in self.variables]
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+
+    def close(self, publish=True):
+        """Finishes the file and swaps it in for the previous one, or with ``publish=False`` deletes it."""
+        tmp = self.path + ".tmp"
+        try:
+            self._writer.close()
+            self._sink.close()
+        finally:
+            if not publish and os.path.exists(tmp):
+                os.remove(tmp)
+        if publish:
+            os.replace(tmp, self.path)
+
+
+def _stream(run, batches, max_workers):
+    """Yields ``(batch, run(batch))`` in order with at most ``max_workers`` batches in flight."""
+    if max_workers <= 1:
+        for batch in batches:
+            yield batch, run(batch)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for batch in batches:
+            if len(pending) == max_workers:
+                done, future = pending.popleft()
+                yield done, future.result()
+            pending.append((batch, executor.submit(run, batch)))
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+
+
+def ingest_site(store, name, response, variables, edges, chunk_hours=CHUNK_HOURS):
+    """Streams one decoded response through the aggregates and the raw file.
+
+    Returns the site's monthly ``{column: array}`` and ``{variable: histogram counts}``.
+    """
+    hourly = response.Hourly()
+    start, interval = hourly.Time(), hourly.Interval()
+    count = (hourly.TimeEnd() - start) // interval
+    # Views on the response body; chunks are slices of them
+    series = {v: hourly.Variables(i).ValuesAsNumpy() for i, v in enumerate(variables)}
+    aggregator = SiteAggregator(start, interval, count, response.UtcOffsetSeconds(), variables)
+    histograms = {v: np.zeros(len(edges[v]) - 1, dtype=np.int64) for v in variables}
+
+    directory = store.site_dir(name)
+    os.makedirs(directory, exist_ok=True)
+    raw = _RawWriter(os.path.join(directory, "hourly.arrow"), variables)
+    try:
+        for first in range(0, count, chunk_hours):
+            stop = min(first + chunk_hours, count)
+            chunk = {v: series[v][first:stop] for v in variables}
+            with stage("hourly.aggregate"):
+                aggregator.add(first, chunk)
+                for v in variables:
+                    values = chunk[v][~np.isnan(chunk[v])]
+                    bins = np.clip(np.searchsorted(edges[v], values, side="right") - 1, 0, len(edges[v]) - 2)
+                    histograms[v] += np.bincount(bins, minlength=len(edges[v]) - 1)
+            with stage("hourly.spill"):
+                raw.write(start + np.arange(first, stop, dtype=np.int64) * interval, chunk)
+    except BaseException:
+        # The site keeps its previous series rather than a partial one
+        raw.close(publish=False)
+        raise
+    raw.close()
+
+    with stage("hourly.spill"):
+        store.write_frame(os.path.join(directory, "daily.arrow"), aggregator.daily())
+    return aggregator.monthly(), histograms
+
+
+def ingest_hourly(locations, start_date, end_date, store=None, url=ARCHIVE_URL, session=None,
+                  variables=HOURLY_VARIABLES, edges=None, chunk_hours=CHUNK_HOURS, max_workers=1, per_host_limit=4,
+                  batch_size=1, retries=5, backoff_factor=0.2):
+    """Fetches hourly data for every location into ``store`` and returns ``(monthly, histograms)``.
+
+    ``histograms`` is ``{variable: (edges, counts)}`` with one row of counts
+    per location. Peak memory is set by ``max_workers``, ``batch_size`` and
+    the length of one site's series, not by the number of locations.
+    """
+    store = store or HourlyStore()
+    session = session or make_session()
+    limiter = HostLimiter(per_host_limit)
+    edges = {v: np.asarray((edges or {}).get(v, HISTOGRAM_EDGES.get(v, DEFAULT_EDGES)), dtype=np.float64)
+             for v in variables}
+    params = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "hourly": ",".join(variables),
+        "timezone": "auto"
+    }
+    batches = [locations[i:i + batch_size] for i in range(0, len(locations), batch_size)]
+
+    def run(batch):
+        with stage("hourly.download"):
+            return fetch_batch(session, limiter, url, batch, params, retries=retries, backoff_factor=backoff_factor)
+
+    names, months = [], []
+    counts = {v: np.zeros((len(locations), len(edges[v]) - 1), dtype=np.int64) for v in variables}
+    row = 0
+    for batch, responses in _stream(run, batches, max_workers):
+        for location, response in zip(batch, responses):
+            site_months, site_counts = ingest_site(store, location["name"], response, variables, edges, chunk_hours)
+            names.append((location["name"], len(site_months["month"])))
+            months.append(site_months)
+            for v in variables:
+                counts[v][row] = site_counts[v]
+            row += 1
+
+    monthly = pd.DataFrame({
+        "location": pd.Categorical.from_codes(np.repeat(np.arange(len(names)), [n for _, n in names]),
+                                              [name for name, _ in names]),
+        **{column: np.concatenate([site[column] for site in months]) for column in (months[0] if months else {})},
+    })
+    histograms = {v: (edges[v], counts[v]) for v in variables}
+
+    os.makedirs(store.root, exist_ok=True)
+    store.write_frame(os.path.join(store.root, "monthly.arrow"), monthly)
+    np.savez(os.path.join(store.root, "histograms.npz"),
+             locations=json.dumps([location["name"] for location in locations]),
+             **{f"{v}_edges": edges[v] for v in variables}, **{f"{v}_counts": counts[v] for v in variables})
+    return monthly, histograms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=HOURLY_STORE, help="output directory")
+    parser.add_argument("--start", default="2014-11-01")
+    parser.add_argument("--end", default="2024-11-02")
+    parser.add_argument("--workers", type=int, default=1, help="batches fetched concurrently")
+    parser.add_argument("--batch-size", type=int, default=1, help="locations per request")
+    args = parser.parse_args()
+
+    from analysis import locations
+
+    monthly, histograms = ingest_hourly(locations, args.start, args.end, HourlyStore(args.root),
+                                        max_workers=args.workers, batch_size=args.batch_size)
+    print(monthly.groupby("location", observed=True)[[f"{v}_mean" for v in HOURLY_VARIABLES]].mean().round(2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Pre-encoded response bodies with ETag and content negotiation.
+
+A ``CachedBody`` is serialised once and compressed lazily, at most once per
+encoding, so serving it again is a dictionary lookup and a memory copy.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import Response, request
+
+from metrics import stage
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:20]
+
+
+def choose_encoding(accept_encoding):
+    accepted = {token.split(";")[0].strip() for token in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class CachedBody:
+    """A serialised payload plus its compressed variants."""
+
+    def __init__(self, body, mimetype="application/json", etag=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag or make_etag(body)
+        self._encoded = {None: body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        if encoding not in self._encoded:
+            with self._lock, stage(f"http.compress.{encoding}"):
+                if encoding not in self._encoded:
+                    if encoding == "br":
+                        self._encoded[encoding] = brotli.compress(self.body, quality=5)
+                    else:
+                        self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+        return self._encoded[encoding]
+
+    def response(self, cache_control="no-cache"):
+        """Builds the response for the current request, answering 304 when the client copy is current."""
+        headers = {"ETag": f'"{self.etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if request.if_none_match.contains(self.etag):
+            return Response(status=304, headers=headers)
+
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(self.encoded(encoding), mimetype=self.mimetype, headers=headers)
+
+
+class FileCache:
+    """Serves JSON files from memory, reloading one only when it changes on disk.
+
+    A file is re-checked at most every ``check_interval`` seconds with a
+    ``stat``; if its mtime or size moved, the content hash decides whether the
+    cached body is really stale.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.stats = {"lookups": 0, "reloads": 0}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        now = time.monotonic()
+        self.stats["lookups"] += 1
+        entry = self._entries.get(path)
+        if entry is not None and now - entry["checked"] < self.check_interval:
+            return entry["body"]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if entry is None or entry["signature"] != signature:
+                with open(path, "rb") as f:
+                    raw = f.read()
+                digest = make_etag(raw)
+                if entry is None or entry["body"].etag != digest:
+                    body = json.dumps(json.loads(raw), separators=(",", ":")).encode()
+                    entry = {"body": CachedBody(body, etag=digest)}
+                    self.stats["reloads"] += 1
+                entry["signature"] = signature
+            entry["checked"] = now
+            self._entries[path] = entry
+            return entry["body"]
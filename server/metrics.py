@@ -0,0 +1,231 @@
+"""Stage timings, counters and the Prometheus ``/metrics`` endpoint.
+
+``stage(name)`` is a context manager and ``timed(name)`` a decorator; both
+record the elapsed time into the ``stage_seconds`` histogram with a
+``stage`` label. ``observe`` feeds any other histogram (payload sizes) and
+``inc`` a counter. Cache statistics are not pushed on the hot path: a
+collector registered with ``register`` reads them when ``/metrics`` is
+scraped.
+
+Set ``METRICS=0`` to disable recording; ``stage`` then returns a shared
+no-op context manager and ``timed`` a single flag check, so instrumented
+code costs about a function call.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from functools import wraps
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            yield ("+Inf" if bound == math.inf else repr(bound)), cumulative
+        yield "sum", total
+        yield "count", count
+
+
+class _Stage:
+    __slots__ = ("registry", "labels", "started")
+
+    def __init__(self, registry, labels):
+        self.registry = registry
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.histogram("stage_seconds", self.labels, LATENCY_BUCKETS).observe(
+            time.perf_counter() - self.started)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Registry:
+    """Named histograms and counters keyed by their label values, plus scrape-time collectors."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.help = {"stage_seconds": "Time spent in an instrumented stage"}
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name, labels, buckets):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, (("stage", name),))
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if self.enabled:
+            self.histogram(name, tuple(sorted(labels.items())), buckets).observe(value)
+
+    def inc(self, name, value=1, **labels):
+        if self.enabled:
+            key = (name, tuple(sorted(labels.items())))
+            with self._lock:
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def register(self, collector):
+        """Adds ``collector()``, returning ``(name, type, labels, value)`` tuples, to every scrape."""
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        """The registry in the Prometheus text exposition format."""
+        families = {}
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            lines = families.setdefault(name, ("histogram", []))[1]
+            for suffix, value in histogram.samples():
+                if suffix in ("sum", "count"):
+                    lines.append(f"{name}_{suffix}{_labels(labels)} {_number(value)}")
+                else:
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', suffix),))} {_number(value)}")
+        with self._lock:
+            counters = sorted(self._counters.items())
+        for (name, labels), value in counters:
+            families.setdefault(name, ("counter", []))[1].append(f"{name}{_labels(labels)} {_number(value)}")
+        for collector in self._collectors:
+            for name, kind, labels, value in collector():
+                families.setdefault(name, (kind, []))[1].append(
+                    f"{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}")
+
+        out = []
+        for name, (kind, lines) in families.items():
+            if name in self.help:
+                out.append(f"# HELP {name} {self.help[name]}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry(enabled=os.environ.get("METRICS", "1") != "0")
+registry.help.update({
+    "http_request_seconds": "Latency of HTTP requests by endpoint",
+    "http_response_bytes": "Size of HTTP response bodies by endpoint",
+    "payload_bytes": "Size of serialised payloads by kind",
+    "cache_hits_total": "Cache lookups answered from the cache",
+    "cache_misses_total": "Cache lookups that had to compute or load",
+    "cache_hit_ratio": "Share of cache lookups answered from the cache",
+})
+
+
+def stage(name):
+    """Context manager timing its block as ``stage_seconds{stage=name}``."""
+    return registry.stage(name)
+
+
+def timed(name):
+    """Decorator timing every call as ``stage_seconds{stage=name}``."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return function(*args, **kwargs)
+            with registry.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe_size(kind, size):
+    registry.observe("payload_bytes", size, SIZE_BUCKETS, kind=kind)
+
+
+def cache_samples(name, hits, misses):
+    """Collector tuples for one cache's hit and miss counts and its hit ratio."""
+    labels = {"cache": name}
+    total = hits + misses
+    return [
+        ("cache_hits_total", "counter", labels, hits),
+        ("cache_misses_total", "counter", labels, misses),
+        ("cache_hit_ratio", "gauge", labels, hits / total if total else math.nan),
+    ]
+
+
+def instrument_app(app):
+    """Records the latency and response size of every request by endpoint and serves ``/metrics``."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record(response):
+        started = g.pop("metrics_started", None)
+        if started is not None and registry.enabled:
+            endpoint = request.endpoint or "unmatched"
+            registry.observe("http_request_seconds", time.perf_counter() - started,
+                             endpoint=endpoint, status=str(response.status_code))
+            if response.content_length is not None:
+                registry.observe("http_response_bytes", response.content_length, SIZE_BUCKETS, endpoint=endpoint)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Prometheus text exposition of every stage, request, payload and cache metric."""
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
@@ -0,0 +1,273 @@
+"""Long-running pipeline that keeps the site network and the dashboard assets up to date.
+
+Each tick polls the current conditions, folds the new observations into the
+site graph and rewrites ``network_data.json`` and ``statistics.json``. Work
+is proportional to what changed: candidate site pairs and their weights only
+depend on positions and are computed once, so a tick re-checks only the
+pairs touching a site whose wind speed changed. PageRank (and Louvain on the
+sparse backend) resumes from the previous tick's result, and nothing is
+recomputed or written when no observation changed. A site that has not
+been polled successfully for ``max_age`` seconds is dropped from the graph
+and the statistics until it answers again, so a long outage does not leave
+its last values in the published files. Every tick returns per-stage
+timings and work counts.
+
+    python pipeline.py --interval 600
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from data_processing import build_statistics, locations, weighted_pairs
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = "../assets"
+NETWORK_FILE = "network_data.json"
+STATISTICS_FILE = "statistics.json"
+MAX_AGE = 6 * 3600
+
+
+def _write_json(path, document):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(document, f)
+    os.replace(tmp, path)
+
+
+def _read_version(path):
+    try:
+        with open(path) as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return document.get("version", 0) if isinstance(document, dict) else 0
+
+
+class NetworkPipeline:
+    """Incrementally maintained site graph, scores and asset files for a fixed list of sites."""
+
+    def __init__(self, sites=locations, assets_dir=ASSETS_DIR, radius=10, metric='euclidean', max_wind_diff=5,
+                 backend='networkx', poll_options=None, max_age=MAX_AGE):
+        self.sites = {site["name"]: site for site in sites}
+        self.assets_dir = assets_dir
+        self.max_wind_diff = max_wind_diff
+        self.backend = backend
+        self.poll_options = poll_options or {}
+        self.max_age = max_age
+        self.graph = nx.Graph()
+        self.observations = {}
+        self.last_seen = {}
+        self.pagerank = {}
+        self.community = {}
+        self.updated = None
+        self.version = max(_read_version(os.path.join(assets_dir, NETWORK_FILE)),
+                           _read_version(os.path.join(assets_dir, STATISTICS_FILE)))
+
+        # Which pairs can be linked and with what weight never changes
+        names = list(self.sites)
+        lat = np.array([self.sites[name]["lat"] for name in names], dtype=float)
+        lon = np.array([self.sites[name]["lon"] for name in names], dtype=float)
+        self.candidates = {name: [] for name in names}
+        for i, j, weight in zip(*(a.tolist() for a in weighted_pairs(lat, lon, radius, metric))):
+            self.candidates[names[i]].append((names[j], weight))
+            self.candidates[names[j]].append((names[i], weight))
+
+    def ingest(self, observations):
+        """Stores the rows of ``observations`` that differ from the last ones seen.
+
+        Returns ``(changed, wind_changed)``: the sites with any new value and
+        the subset whose wind speed, which decides the graph edges, changed.
+        """
+        changed, wind_changed = [], []
+        now = time.monotonic()
+        for row in observations.to_dict(orient="records"):
+            name = row["name"]
+            if name not in self.sites:
+                continue
+            self.last_seen[name] = now
+            values = {"wind_speed": row["wind_speed"], "clouds": row["clouds"]}
+            previous = self.observations.get(name)
+            if previous == values:
+                continue
+            self.observations[name] = values
+            changed.append(name)
+            if previous is None:
+                site = self.sites[name]
+                self.graph.add_node(name, pos=(site["lat"], site["lon"]), **values)
+                wind_changed.append(name)
+            else:
+                self.graph.nodes[name].update(values)
+                if previous["wind_speed"] != values["wind_speed"]:
+                    wind_changed.append(name)
+        return changed, wind_changed
+
+    def expire(self, now=None):
+        """Drops the sites last polled more than ``max_age`` seconds ago; returns ``(expired, edges removed)``.
+
+        An expired site leaves the graph, its edges and the statistics. It is
+        added back as a new site the next time it is polled.
+        """
+        now = time.monotonic() if now is None else now
+        expired = [name for name in self.observations if now - self.last_seen[name] > self.max_age]
+        removed = 0
+        for name in expired:
+            removed += self.graph.degree(name)
+            self.graph.remove_node(name)
+            del self.observations[name]
+            self.pagerank.pop(name, None)
+            self.community.pop(name, None)
+            logger.warning("dropped %s: not polled for %.0f s", name, now - self.last_seen[name])
+        return expired, removed
+
+    def update_edges(self, sites):
+        """Re-checks only the candidate pairs touching ``sites``; returns ``(added, removed)``."""
+        added = removed = 0
+        G = self.graph
+        for name in sites:
+            wind = self.observations[name]["wind_speed"]
+            for other, weight in self.candidates[name]:
+                if other not in self.observations:
+                    continue
+                linked = abs(wind - self.observations[other]["wind_speed"]) < self.max_wind_diff
+                if linked and not G.has_edge(name, other):
+                    G.add_edge(name, other, weight=weight)
+                    added += 1
+                elif not linked and G.has_edge(name, other):
+                    G.remove_edge(name, other)
+                    removed += 1
+        return added, removed
+
+    def score(self, timings):
+        """PageRank and communities as node attributes, both warm-started from the previous tick.
+
+        Greedy modularity (the ``networkx`` backend) cannot resume, so only
+        the ``sparse`` backend's Louvain reuses the previous communities.
+        """
+        G = self.graph
+        nodes = list(G)
+        # New sites start from the uniform score; the vector is renormalised by the solvers
+        start = [self.pagerank.get(node, 1.0 / len(nodes)) for node in nodes]
+
+        started = time.perf_counter()
+        if self.backend == 'sparse':
+            import graph_backend
+            _, A = graph_backend.to_csr(G)
+            pagerank = graph_backend.as_node_dict(nodes, graph_backend.pagerank(A, nstart=start))
+        else:
+            pagerank = nx.pagerank(G, nstart=dict(zip(nodes, start)))
+        timings["pagerank"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if self.backend == 'sparse':
+            # Louvain resumes from the previous communities; new sites start on their own
+            initial = [self.community.get(node, -1 - i) for i, node in enumerate(nodes)]
+            community = graph_backend.as_node_dict(nodes, graph_backend.louvain(A, seed=0, initial=initial))
+        else:
+            communities = nx.algorithms.community.greedy_modularity_communities(G)
+            community = {node: i for i, comm in enumerate(communities) for node in comm}
+        timings["communities"] = time.perf_counter() - started
+
+        nx.set_node_attributes(G, pagerank, 'pagerank')
+        nx.set_node_attributes(G, community, 'community')
+        self.pagerank = pagerank
+        self.community = community
+
+    def network_document(self):
+        G = self.graph
+        nodes = [
+            {"name": name, "lat": self.sites[name]["lat"], "lon": self.sites[name]["lon"],
+             "pagerank": G.nodes[name]["pagerank"], "community": G.nodes[name]["community"]}
+            for name in self.sites if name in G
+        ]
+        return {"version": self.version, "updated": self.updated, "nodes": nodes}
+
+    def statistics_document(self):
+        if not self.observations:  # every site has expired
+            statistics = {"top_wind": [], "top_solar": [], "average_wind": None, "average_solar": None}
+        else:
+            statistics = build_statistics(
+                pd.DataFrame([{"name": name, **values} for name, values in self.observations.items()]))
+        return {"version": self.version, "updated": self.updated, **statistics}
+
+    def tick(self, observations=None):
+        """Runs one update and returns its metrics; ``observations`` replaces the poll (for replays and tests)."""
+        timings = {}
+        metrics = {"version": self.version, "rescored": False, "timings": timings}
+
+        started = time.perf_counter()
+        if observations is None:
+            from poller import poll_locations
+            observations, failures = poll_locations(list(self.sites.values()), **self.poll_options)
+            for name, reason in failures.items():
+                logger.warning("skipped %s: %s", name, reason)
+            metrics["sites_failed"] = len(failures)
+        metrics["sites_polled"] = len(observations)
+        timings["ingest"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        changed, wind_changed = self.ingest(observations)
+        expired, dropped = self.expire()
+        added, removed = self.update_edges(wind_changed)
+        timings["graph"] = time.perf_counter() - started
+        metrics.update(sites_changed=len(changed), sites_expired=len(expired), edges_added=added,
+                       edges_removed=removed + dropped, nodes=self.graph.number_of_nodes(),
+                       edges=self.graph.number_of_edges())
+
+        if not changed and not expired:
+            return metrics
+
+        if (wind_changed or expired or not self.pagerank) and self.graph:
+            self.score(timings)
+            metrics["rescored"] = True
+
+        started = time.perf_counter()
+        self.version += 1
+        self.updated = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        os.makedirs(self.assets_dir, exist_ok=True)
+        _write_json(os.path.join(self.assets_dir, NETWORK_FILE), self.network_document())
+        _write_json(os.path.join(self.assets_dir, STATISTICS_FILE), self.statistics_document())
+        timings["write"] = time.perf_counter() - started
+        metrics["version"] = self.version
+        return metrics
+
+    def run(self, interval, ticks=None):
+        """Ticks every ``interval`` seconds, ``ticks`` times or forever, logging each tick's metrics."""
+        count = 0
+        while ticks is None or count < ticks:
+            started = time.monotonic()
+            metrics = self.tick()
+            logger.info("tick %s", json.dumps(metrics, sort_keys=True))
+            count += 1
+            if ticks is None or count < ticks:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interval", type=float, default=600, help="seconds between ticks")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many ticks (default: run forever)")
+    parser.add_argument("--assets", default=ASSETS_DIR, help="directory of the served asset files")
+    parser.add_argument("--backend", choices=["networkx", "sparse"], default="networkx")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent poll requests")
+    parser.add_argument("--budget", type=float, default=None, help="time budget of each poll in seconds")
+    parser.add_argument("--max-age", type=float, default=MAX_AGE,
+                        help="seconds without a successful poll after which a site is dropped")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    pipeline = NetworkPipeline(assets_dir=args.assets, backend=args.backend,
+                               poll_options={"max_workers": args.workers, "budget": args.budget},
+                               max_age=args.max_age)
+    pipeline.run(args.interval, args.ticks)
+
+
+if __name__ == "__main__":
+    main()
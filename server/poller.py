@@ -0,0 +1,140 @@
+"""Concurrent current-conditions poller for the OpenWeatherMap API.
+
+Every site is requested on a bounded thread pool through one pooled
+session, with a per-request timeout and a shared rate limit. A site whose
+request fails, times out or returns incomplete data is skipped and reported
+instead of aborting the poll, and an optional time budget caps the whole
+poll: sites not answered when it runs out are reported as skipped too.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+CURRENT_URL = "http://api.openweathermap.org/data/2.5/weather"
+API_KEY = os.environ.get("OPENWEATHER_API_KEY", "YOUR_API_KEY")
+COLUMNS = ["name", "lat", "lon", "wind_speed", "clouds"]
+
+
+class PollError(Exception):
+    """Raised for a site that cannot be polled; the message is the reported reason."""
+
+
+class RateLimiter:
+    """Token bucket shared by all workers: ``rate`` requests per second, bursts of up to ``burst``."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Waits for a token; returns False instead if none is free before ``deadline`` (a ``time.monotonic`` value)."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_for = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait_for > deadline:
+                return False
+            time.sleep(wait_for)
+
+
+def make_session(pool_size=16):
+    """Returns a session keeping up to ``pool_size`` connections alive per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def parse_current(data):
+    """Returns ``(wind_speed, clouds)`` from a current-weather response; a missing value is None."""
+    wind_speed = (data.get("wind") or {}).get("speed")
+    clouds = (data.get("clouds") or {}).get("all")
+    return wind_speed, clouds
+
+
+def fetch_current(session, location, api_key=API_KEY, url=CURRENT_URL, timeout=10):
+    """Requests the current conditions for one location and returns ``(wind_speed, clouds)``."""
+    params = {"lat": location["lat"], "lon": location["lon"], "appid": api_key}
+    try:
+        response = session.get(url, params=params, timeout=timeout)
+    except requests.Timeout:
+        raise PollError(f"timed out after {timeout:.1f}s")
+    except requests.RequestException as e:
+        raise PollError(f"request failed: {e}")
+    if response.status_code != 200:
+        raise PollError(f"HTTP {response.status_code}")
+    try:
+        return parse_current(response.json())
+    except ValueError:
+        raise PollError("response is not JSON")
+
+
+def poll_locations(locations, api_key=API_KEY, url=CURRENT_URL, session=None, max_workers=8,
+                   rate=None, timeout=10, budget=None):
+    """Polls every location and returns ``(frame, failures)``.
+
+    ``frame`` has one row per site that answered with both wind speed and
+    cloud cover, in input order; ``failures`` maps every other site name to
+    the reason it was skipped. ``rate`` caps requests per second across all
+    workers and ``budget`` is the time in seconds the whole poll may take.
+    """
+    session = session or make_session(max_workers)
+    limiter = RateLimiter(rate, burst=max_workers) if rate else None
+    deadline = time.monotonic() + budget if budget is not None else None
+
+    def poll(location):
+        request_timeout = timeout
+        if deadline is not None:
+            if limiter is not None and not limiter.acquire(deadline):
+                raise PollError("time budget exhausted")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PollError("time budget exhausted")
+            request_timeout = min(timeout, remaining)
+        elif limiter is not None:
+            limiter.acquire()
+        try:
+            wind_speed, clouds = fetch_current(session, location, api_key, url, request_timeout)
+        except PollError:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise PollError("time budget exhausted")
+            raise
+        if wind_speed is None or clouds is None:
+            missing = "wind speed" if wind_speed is None else "cloud cover"
+            raise PollError(f"response has no {missing}")
+        return {"name": location["name"], "lat": location["lat"], "lon": location["lon"],
+                "wind_speed": wind_speed, "clouds": clouds}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(poll, location) for location in locations]
+    # Requests in flight at the deadline time out by then, so this returns close to the budget
+    wait(futures, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()) + 0.05)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    rows = []
+    failures = {}
+    for location, future in zip(locations, futures):
+        if future.cancelled() or not future.done():
+            failures[location["name"]] = "time budget exhausted"
+            continue
+        try:
+            rows.append(future.result())
+        except PollError as e:
+            failures[location["name"]] = str(e)
+        except Exception as e:
+            failures[location["name"]] = f"{type(e).__name__}: {e}"
+    return pd.DataFrame(rows, columns=COLUMNS), failures
@@ -0,0 +1,204 @@
+"""Per-site prefix sums of the daily weather table for date-range statistics.
+
+``PrefixIndex`` lays each daily variable out as a ``(day, site)`` grid and
+keeps running totals of the values, their squares and the number of
+non-missing days down the day axis. The count, mean and variance of any
+site over any window of days then come from two rows of each grid,
+whatever the window's length. A query is O(windows x sites), and a
+"March to September of 2019-2023" query is five windows.
+
+Values are shifted by each site's overall mean before they are summed, so
+the variance does not lose precision to the size of the totals. Top-k
+selection uses ``np.argpartition`` and only sorts the ``k`` it keeps.
+"""
+import numpy as np
+import pandas as pd
+
+from weather_store import local_day
+
+STATISTICS = ("mean", "variance", "count")
+
+
+def parse_months(months):
+    """``"3-9"`` or ``(3, 9)`` to a ``(first, last)`` month pair; ``"11-2"`` wraps over the new year."""
+    if isinstance(months, str):
+        first, _, last = months.partition("-")
+        months = (int(first), int(last or first))
+    first, last = months
+    if not (1 <= first <= 12 and 1 <= last <= 12):
+        raise ValueError("months must be between 1 and 12")
+    return first, last
+
+
+def _calendar_day(value):
+    """``value`` as a naive timestamp; days are local calendar days, so a timezone is a ValueError."""
+    day = pd.Timestamp(value)
+    if day.tz is not None:
+        raise ValueError(f"{value} is not a calendar date: it has a timezone")
+    return day
+
+
+class PrefixIndex:
+    """Running sums, sums of squares and counts of each variable by day and site."""
+
+    def __init__(self, frame, variables):
+        self.variables = list(variables)
+        days = frame["day"] if "day" in frame else local_day(frame["date"])
+        location = frame["location"]
+        if not isinstance(location.dtype, pd.CategoricalDtype):
+            location = location.astype("category")
+        location = location.cat.remove_unused_categories()
+        self.locations = np.asarray(location.cat.categories.astype(str), dtype=object)
+
+        self.first_day = days.min()
+        day = ((days - self.first_day) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+        code = location.cat.codes.to_numpy(dtype=np.int64)
+        self.days = int(day.max()) + 1 if len(day) else 0
+        sites = len(self.locations)
+        # Row d + 1 of every grid holds the totals of days 0..d; row 0 is zero
+        cell = (day + 1) * sites + code
+        size = (self.days + 1) * sites
+        count_dtype = np.uint16 if self.days < 2**16 else np.uint32
+
+        self.shift, self.sums, self.squares, self.counts = {}, {}, {}, {}
+        for variable in self.variables:
+            values = frame[variable].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            counts = np.bincount(code[present], minlength=sites)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                shift = np.bincount(code[present], weights=values[present], minlength=sites) / counts
+            shift = np.nan_to_num(shift)
+            centred = values[present] - shift[code[present]]
+
+            self.shift[variable] = shift
+            self.sums[variable] = sums = np.bincount(cell[present], weights=centred, minlength=size).reshape(-1, sites)
+            np.cumsum(sums, axis=0, out=sums)
+            self.squares[variable] = squares = np.bincount(cell[present], weights=centred * centred,
+                                                           minlength=size).reshape(-1, sites)
+            np.cumsum(squares, axis=0, out=squares)
+            self.counts[variable] = np.cumsum(
+                np.bincount(cell[present], minlength=size).reshape(-1, sites), axis=0, dtype=count_dtype)
+
+    GRIDS = ("shift", "sums", "squares", "counts")
+
+    @staticmethod
+    def array_names(variables):
+        return [f"{grid}.{variable}" for variable in variables for grid in PrefixIndex.GRIDS]
+
+    def arrays(self):
+        """``{"<grid>.<variable>": array}`` of every array the index holds, for ``from_arrays``."""
+        return {f"{grid}.{variable}": getattr(self, grid)[variable]
+                for variable in self.variables for grid in self.GRIDS}
+
+    @classmethod
+    def from_arrays(cls, variables, locations, first_day, days, arrays):
+        """An index over existing ``arrays`` (as returned by ``arrays()``), which are used without copying."""
+        index = cls.__new__(cls)
+        index.variables = list(variables)
+        index.locations = np.asarray(locations, dtype=object)
+        index.first_day = pd.Timestamp(first_day)
+        index.days = int(days)
+        for grid in cls.GRIDS:
+            setattr(index, grid, {variable: arrays[f"{grid}.{variable}"] for variable in index.variables})
+        return index
+
+    @property
+    def nbytes(self):
+        return sum(grid.nbytes for grids in (self.sums, self.squares, self.counts) for grid in grids.values())
+
+    def windows(self, start=None, end=None, months=None):
+        """``[(first, stop)]`` day-row ranges of ``start``..``end`` (inclusive), restricted to ``months``."""
+        last_day = self.first_day + pd.Timedelta(days=max(self.days - 1, 0))
+        start = self.first_day if start is None else max(_calendar_day(start), self.first_day)
+        end = last_day if end is None else min(_calendar_day(end), last_day)
+        if months is None:
+            spans = [(start, end)]
+        else:
+            first, last = parse_months(months)
+            spans = []
+            for year in range(start.year - 1, end.year + 1):
+                opens = pd.Timestamp(year=year, month=first, day=1)
+                closes = pd.Timestamp(year=year + (last < first), month=last, day=1) + pd.offsets.MonthEnd(0)
+                spans.append((max(opens, start), min(closes, end)))
+
+        windows = []
+        for opens, closes in spans:
+            if opens <= closes:
+                windows.append(((opens - self.first_day).days, (closes - self.first_day).days + 1))
+        return windows
+
+    def _totals(self, variable, windows, sites):
+        if variable not in self.sums:
+            raise ValueError(f"variable must be among {', '.join(self.variables)}")
+        n = np.zeros(len(self.locations) if sites is None else len(sites), dtype=np.int64)
+        s = np.zeros(len(n))
+        q = np.zeros(len(n))
+        columns = slice(None) if sites is None else sites
+        for first, stop in windows:
+            n += self.counts[variable][stop, columns].astype(np.int64) - self.counts[variable][first, columns]
+            s += self.sums[variable][stop, columns] - self.sums[variable][first, columns]
+            q += self.squares[variable][stop, columns] - self.squares[variable][first, columns]
+        return n, s, q
+
+    def site_positions(self, locations):
+        """Column of each of ``locations`` in the grids."""
+        position = {name: i for i, name in enumerate(self.locations)}
+        unknown = [name for name in locations if name not in position]
+        if unknown:
+            raise ValueError(f"unknown location {', '.join(unknown)}")
+        return np.array([position[name] for name in locations], dtype=np.intp)
+
+    def stats(self, variable, windows, sites=None):
+        """``(count, mean, variance)`` per site over ``windows``; ``sites`` selects grid columns.
+
+        The variance is the sample variance (``ddof=1``, like pandas) and is
+        NaN for fewer than two days; the mean is NaN for none.
+        """
+        n, s, q = self._totals(variable, windows, sites)
+        shift = self.shift[variable] if sites is None else self.shift[variable][sites]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, shift + s / n, np.nan)
+            variance = np.where(n > 1, np.maximum(q - s * s / n, 0.0) / (n - 1), np.nan)
+        return n, mean, variance
+
+    def top(self, variable, k, windows, statistic="mean", largest=True, sites=None):
+        """Positions (into ``sites``, or all sites) of the ``k`` best sites by ``statistic``, best first.
+
+        Sites without data in the windows are never selected.
+        """
+        if statistic not in STATISTICS:
+            raise ValueError(f"statistic must be one of {', '.join(STATISTICS)}")
+        n, mean, variance = self.stats(variable, windows, sites)
+        score = {"mean": mean, "variance": variance, "count": n.astype(np.float64)}[statistic]
+        score = np.where(np.isnan(score), -np.inf, score if largest else -score)
+        valid = int(np.isfinite(score).sum())
+        k = min(k, valid)
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(score):
+            chosen = np.argpartition(-score, k - 1)[:k]
+        else:
+            chosen = np.arange(len(score))
+        return chosen[np.argsort(-score[chosen], kind="stable")][:k]
+
+
+def range_stats(index, variable, start=None, end=None, months=None, locations=None, top=None, by="mean",
+                order="desc"):
+    """Columnar payload of per-site statistics over a date window, optionally the ``top`` sites ``by`` a statistic."""
+    windows = index.windows(start, end, months)
+    sites = None if locations is None else index.site_positions(locations)
+    names = index.locations if sites is None else index.locations[sites]
+    if top is not None:
+        chosen = index.top(variable, top, windows, by, largest=order == "desc", sites=sites)
+        sites = chosen if sites is None else sites[chosen]
+        names = index.locations[sites]
+    count, mean, variance = index.stats(variable, windows, sites)
+    return {
+        "variable": variable,
+        "windows": [[str((index.first_day + pd.Timedelta(days=first)).date()),
+                     str((index.first_day + pd.Timedelta(days=stop - 1)).date())] for first, stop in windows],
+        "locations": names.tolist(),
+        "count": count.tolist(),
+        "mean": [None if np.isnan(v) else round(v, 4) for v in mean.tolist()],
+        "variance": [None if np.isnan(v) else round(v, 4) for v in variance.tolist()],
+    }
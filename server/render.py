@@ -0,0 +1,163 @@
+"""Headless batch renderer for the map and network figures.
+
+Loads the weather data once, builds every (year, metric) figure on a process
+pool and writes them as standalone HTML or Plotly JSON. A figure whose input
+hash matches the previous run is skipped. A figure that fails is reported
+and left stale; the ones that rendered are recorded either way.
+
+    python render.py --out ../figures --format html --workers 4
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Bump when a figure builder changes so existing outputs are re-rendered
+RENDER_VERSION = 2
+MANIFEST = "manifest.json"
+
+logger = logging.getLogger(__name__)
+
+
+def input_hash(kind, params, data):
+    digest = hashlib.sha1()
+    digest.update(json.dumps([RENDER_VERSION, kind, params], sort_keys=True).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def build_jobs(data, yearly_avg, years, metrics, points=None):
+    """Returns ``(name, kind, params, input)`` for every figure; ``input`` is the slice the figure depends on."""
+    jobs = [("weather", "weather", {} if points is None else {"points": points}, data)]
+    for year in years:
+        year_data = yearly_avg[yearly_avg["year"] == year]
+        jobs.append((f"map_{year}", "map", {"year": year}, year_data))
+        for metric in metrics:
+            jobs.append((f"betweenness_{metric}_{year}", "betweenness", {"year": year, "metric": metric}, year_data))
+    return jobs
+
+
+def render_figure(kind, params, data, path, fmt, betweenness=None):
+    """Builds one figure and writes it to ``path``; runs inside a worker process."""
+    import figures
+
+    started = time.perf_counter()
+    if kind == "weather":
+        fig = figures.weather_figure(data, points=params.get("points"))
+    elif kind == "map":
+        fig = figures.yearly_map_figure(data, params["year"])
+    else:
+        fig = figures.betweenness_map_figure(data, params["year"], params["metric"], betweenness=betweenness)
+
+    tmp = path + ".tmp"
+    if fmt == "html":
+        fig.write_html(tmp, include_plotlyjs="cdn", full_html=True)
+    else:
+        with open(tmp, "w") as f:
+            f.write(fig.to_json())
+    os.replace(tmp, path)
+    return time.perf_counter() - started, os.path.getsize(path)
+
+
+def render_all(data, out, fmt="html", years=None, metrics=None, workers=None, force=False, points=None):
+    """Renders every stale figure into ``out`` and returns ``[(name, status, seconds, bytes)]``.
+
+    ``status`` is skipped, rendered or failed; a failed figure is logged and
+    rendered again by the next run.
+    """
+    from aggregation import calculate_yearly_averages
+    from figures import BETWEENNESS_METRICS
+    from temporal import snapshot, temporal_betweenness
+
+    os.makedirs(out, exist_ok=True)
+    manifest_path = os.path.join(out, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    yearly_avg = calculate_yearly_averages(data)
+    years = sorted(yearly_avg["year"].unique().tolist()) if years is None else years
+    metrics = list(BETWEENNESS_METRICS) if metrics is None else metrics
+
+    results = []
+    jobs = []
+    for name, kind, params, job_input in build_jobs(data, yearly_avg, years, metrics, points):
+        path = os.path.join(out, f"{name}.{fmt}")
+        digest = input_hash(kind, params, job_input)
+        if manifest.get(name) == digest and os.path.exists(path):
+            results.append((name, "skipped", 0.0, os.path.getsize(path)))
+        else:
+            jobs.append((name, kind, params, job_input, path, digest))
+
+    # Betweenness of every stale (year, metric) snapshot in one pass
+    stale = [params for _, kind, params, _, _, _ in jobs if kind == "betweenness"]
+    table = None
+    if stale:
+        table = temporal_betweenness(yearly_avg, sorted({params["year"] for params in stale}),
+                                     sorted({params["metric"] for params in stale}), workers=workers)
+
+    pending = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for name, kind, params, job_input, path, digest in jobs:
+                betweenness = snapshot(table, params["year"], params["metric"]) if kind == "betweenness" else None
+                pending[name] = (digest, executor.submit(render_figure, kind, params, job_input, path, fmt,
+                                                         betweenness))
+
+            for name, (digest, future) in pending.items():
+                try:
+                    seconds, size = future.result()
+                except Exception:
+                    logger.exception("failed to render %s", name)
+                    results.append((name, "failed", 0.0, 0))
+                    continue
+                manifest[name] = digest
+                results.append((name, "rendered", seconds, size))
+    finally:
+        # Figures that finished are not rendered again, even if the run was cut short
+        tmp = manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, manifest_path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="../figures", help="output directory")
+    parser.add_argument("--format", choices=["html", "json"], default="html")
+    parser.add_argument("--years", type=int, nargs="*", help="years to render (default: all)")
+    parser.add_argument("--metrics", nargs="*", help="betweenness metrics (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render figures even if their input is unchanged")
+    parser.add_argument("--points", type=int, default=None, help="downsample each weather trace to this many points")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    from analysis import fetch_weather_data
+
+    started = time.perf_counter()
+    data = fetch_weather_data()
+    print(f"loaded {len(data)} rows in {time.perf_counter() - started:.2f}s")
+
+    results = render_all(data, args.out, args.format, args.years, args.metrics, args.workers, args.force,
+                         args.points)
+    for name, status, seconds, size in results:
+        print(f"{name:<48}{status:>10}{seconds:>9.2f}s{size / 1024:>10.0f} KiB")
+    rendered = sum(1 for _, status, _, _ in results if status == "rendered")
+    failed = sum(1 for _, status, _, _ in results if status == "failed")
+    print(f"{rendered} rendered, {failed} failed, {len(results) - rendered - failed} skipped "
+          f"in {time.perf_counter() - started:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
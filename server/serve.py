@@ -0,0 +1,153 @@
+"""Pre-fork production server: several worker processes serving one shared copy of the data.
+
+The master loads the daily table once, publishes it and its prefix-sum
+index with ``SharedTable`` (under ``/dev/shm`` by default), opens the
+listening socket and forks ``--workers`` processes. The app is imported
+with ``SHARED_TABLE`` set, so each worker's ``WeatherSnapshot`` maps the
+published files read-only instead of loading the table itself. A worker
+warms its snapshot, then serves the shared socket with werkzeug's threaded
+server.
+
+Every ``--interval`` seconds the master reloads the table and publishes it
+if it changed; workers pick up the new version within a few seconds, and
+requests in flight finish on the version they started with. A worker that
+dies is replaced. The network and statistics files written by
+``pipeline.py`` are small and are reloaded by each worker when they change.
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+
+from shared_table import SHARED_ROOT, SharedTable
+
+logger = logging.getLogger(__name__)
+
+
+def listen(host, port, backlog=128):
+    """A listening TCP socket the forked workers all accept on."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, ready=None):
+    """Warms the app's weather snapshot, writes a byte to the ``ready`` fd and serves ``sock`` forever."""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    snapshot = app.extensions["weather_snapshot"]
+    try:
+        snapshot.warm()
+    except Exception:  # the refresher keeps retrying; serve 503s until then
+        logger.exception("worker %d could not load the weather data", os.getpid())
+    snapshot.ensure_started()
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    if ready is not None:
+        os.write(ready, b"1")
+        os.close(ready)
+    server.serve_forever()
+
+
+def spawn_worker(app, sock, ready=None):
+    """Forks one worker; returns its pid."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, sock, ready)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def start_workers(app, sock, count):
+    """Forks ``count`` workers and returns their pids once all of them are serving."""
+    read, write = os.pipe()
+    pids = [spawn_worker(app, sock, write) for _ in range(count)]
+    os.close(write)
+    started = 0
+    while started < count:
+        chunk = os.read(read, count)
+        if not chunk:
+            raise RuntimeError("a worker exited before it was ready")
+        started += len(chunk)
+    os.close(read)
+    return pids
+
+
+def stop_workers(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in pids:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def publish(shared):
+    """Loads the daily table and publishes it if it changed; returns the current version."""
+    from analysis import fetch_weather_data
+    from weather_api import VARIABLES
+
+    return shared.publish(fetch_weather_data(), VARIABLES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--root", default=SHARED_ROOT, help="directory of the published data")
+    parser.add_argument("--interval", type=float, default=3600,
+                        help="seconds between reloads of the table (0: never)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    shared = SharedTable(args.root)
+    logger.info("published %s under %s", publish(shared), args.root)
+
+    # Imported only now: the app reads SHARED_TABLE when it is first imported
+    os.environ["SHARED_TABLE"] = args.root
+    from app import app
+
+    sock = listen(args.host, args.port)
+    pids = start_workers(app, sock, args.workers)
+    logger.info("%d workers serving http://%s:%d", len(pids), args.host, args.port)
+
+    def shutdown(signum, frame):
+        stop_workers(pids)
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    reloaded = time.monotonic()
+    while True:
+        time.sleep(1)
+        for k, pid in enumerate(pids):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                logger.warning("worker %d exited with status %d; starting another", pid, status)
+                pids[k] = spawn_worker(app, sock)
+        if args.interval and time.monotonic() - reloaded >= args.interval:
+            reloaded = time.monotonic()
+            try:
+                logger.info("current version %s", publish(shared))
+            except Exception:  # the workers keep the version they have
+                logger.exception("reloading the weather data failed")
+
+
+if __name__ == "__main__":
+    main()
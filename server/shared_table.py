@@ -0,0 +1,187 @@
+"""Daily table and prefix-sum index published once and mapped read-only by every server worker.
+
+The serving master (``serve.py``) loads the table and ``publish``es it: each
+column, and each grid of its ``PrefixIndex``, is written as a ``.npy`` file
+into a new version directory, and ``CURRENT`` is then atomically replaced
+to name that directory::
+
+    <root>/CURRENT                  # name of the current version directory
+    <root>/<version>/meta.json      # categories, variables, index locations
+    <root>/<version>/<column>.npy
+
+Workers ``attach`` by reading ``CURRENT`` and opening every file with
+``np.load(mmap_mode="r")``. The root defaults to a directory in ``/dev/shm``,
+so the files live in RAM and their pages are shared by all the workers
+that map them instead of being copied into each one. The DataFrame built
+over the maps does not copy them, and the maps are read-only.
+
+A version directory is never changed once ``CURRENT`` names it. Workers
+check ``CURRENT`` between requests and swap in the new version when it
+changes; publishing removes versions older than the previous one, whose
+pages are freed once the last worker has dropped them.
+
+    python shared_table.py --root /dev/shm/weather
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from daily_table import utc_dates
+from prefix_index import PrefixIndex
+from weather_store import local_day, table_version
+
+CURRENT = "CURRENT"
+META = "meta.json"
+SHARED_ROOT = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "weather_shared")
+
+
+def _save(directory, name, array):
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+
+class SharedTable:
+    """Publishes daily tables under ``root`` and attaches to the current one."""
+
+    def __init__(self, root=SHARED_ROOT, keep=2):
+        self.root = root
+        self.keep = keep
+        self._attached = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Version named by ``CURRENT``, or None before the first publish."""
+        try:
+            with open(os.path.join(self.root, CURRENT)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(self, frame, variables=None, version=None):
+        """Writes ``frame`` and its ``PrefixIndex`` over ``variables`` as a new version and makes it current.
+
+        Returns the version, ``table_version(frame)`` unless given. Publishing
+        the current version again does nothing. Raises ValueError if ``date``
+        is not a tz-aware datetime column (an empty store read has none).
+        """
+        if not isinstance(frame["date"].dtype, pd.DatetimeTZDtype):
+            raise ValueError(f"date must be a tz-aware datetime column, not {frame['date'].dtype}")
+        version = version or table_version(frame)
+        if version == self.current():
+            return version
+        variables = [c for c in frame.columns if c not in ("location", "date", "day")] \
+            if variables is None else list(variables)
+        os.makedirs(self.root, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix=f".{version}.", dir=self.root)
+
+        location = frame["location"]
+        if not isinstance(location.dtype, pd.CategoricalDtype):
+            location = location.astype("category")
+        day = frame["day"] if "day" in frame else local_day(frame["date"])
+        _save(directory, "location", location.cat.codes.to_numpy())
+        # attach reads the column back as seconds, whatever unit it was built in
+        _save(directory, "date", frame["date"].dt.tz_convert("UTC").dt.as_unit("s").array.asi8)
+        _save(directory, "day", day.to_numpy())
+        columns = [c for c in frame.columns if c not in ("location", "date", "day")]
+        for column in columns:
+            _save(directory, column, frame[column].to_numpy())
+
+        index = PrefixIndex(frame.assign(day=day), variables)
+        for name, array in index.arrays().items():
+            _save(directory, f"index.{name}", array)
+
+        meta = {
+            "version": version,
+            "rows": len(frame),
+            "categories": location.cat.categories.astype(str).tolist(),
+            "columns": columns,
+            "index": {"variables": index.variables, "locations": index.locations.tolist(),
+                      "first_day": str(index.first_day.date()), "days": index.days},
+        }
+        with open(os.path.join(directory, META), "w") as f:
+            json.dump(meta, f)
+
+        final = os.path.join(self.root, version)
+        if os.path.exists(final):  # left by a publish that died before swapping
+            shutil.rmtree(final)
+        os.rename(directory, final)
+        tmp = os.path.join(self.root, f".{CURRENT}.{os.getpid()}")
+        with open(tmp, "w") as f:
+            f.write(version)
+        previous = self.current()
+        os.replace(tmp, os.path.join(self.root, CURRENT))
+        self._prune({version, previous})
+        return version
+
+    def _prune(self, keep):
+        """Removes version directories besides ``keep`` and the newest ``self.keep``."""
+        entries = [e for e in os.scandir(self.root) if e.is_dir() and not e.name.startswith(".")]
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in entries[self.keep:]:
+            if entry.name not in keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def attach(self, version=None):
+        """``(version, frame, index)`` of ``version`` (default: the current one), memory-mapped read-only.
+
+        The last attached version is kept, so asking for it again returns the
+        same objects.
+        """
+        version = version or self.current()
+        if version is None:
+            raise FileNotFoundError(f"nothing published under {self.root}")
+        attached = self._attached
+        if attached is not None and attached[0] == version:
+            return attached
+
+        directory = os.path.join(self.root, version)
+        with open(os.path.join(directory, META)) as f:
+            meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        columns = {
+            "location": pd.Categorical.from_codes(load("location"), categories=meta["categories"]),
+            "date": utc_dates(load("date").view("datetime64[s]")),
+        }
+        columns.update((column, load(column)) for column in meta["columns"])
+        columns["day"] = load("day")
+        frame = pd.DataFrame(columns, copy=False)
+
+        spec = meta["index"]
+        index = PrefixIndex.from_arrays(
+            spec["variables"], spec["locations"], pd.Timestamp(spec["first_day"]), spec["days"],
+            {name: load(f"index.{name}") for name in PrefixIndex.array_names(spec["variables"])})
+
+        attached = (version, frame, index)
+        with self._lock:
+            self._attached = attached
+        return attached
+
+    def frame(self, version=None):
+        return self.attach(version)[1]
+
+    def index(self, version=None):
+        return self.attach(version)[2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=SHARED_ROOT)
+    args = parser.parse_args()
+
+    from analysis import fetch_weather_data
+    from weather_api import VARIABLES
+
+    version = SharedTable(args.root).publish(fetch_weather_data(), VARIABLES)
+    print(f"published {version} under {args.root}")
+
+
+if __name__ == "__main__":
+    main()
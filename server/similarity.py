@@ -0,0 +1,202 @@
+"""Site-by-site similarity of the daily weather series.
+
+The daily table is pivoted into a dense (sites x days) matrix, so the
+similarity of every pair of sites comes out of one matrix product. Both
+sides of it are bounded by the memory budget: the (sites x sites) result is
+computed in blocks of rows, each sparsified (top-k per site and/or a weight
+threshold) before the next one, and the day axis is read in chunks of
+columns that are accumulated into each block. The matrix can live in a file
+(``site_matrix(..., path=...)``) when it does not fit in RAM; it is then
+only ever paged in a chunk of days at a time.
+"""
+import numpy as np
+import pandas as pd
+
+from weather_store import local_day
+
+METRICS = ("pearson", "euclidean")
+# Size of the column chunks site_matrix fills missing days in
+FILL_CHUNK_BYTES = 64 * 2**20
+
+
+def _column_chunks(n_rows, n_columns, chunk_bytes):
+    """Slices of at most ``chunk_bytes`` of float64 columns, at least one column each."""
+    width = max(1, min(n_columns, chunk_bytes // max(1, 8 * n_rows)))
+    return [slice(start, min(n_columns, start + width)) for start in range(0, n_columns, width)]
+
+
+def site_matrix(data, variables, path=None):
+    """Pivots the daily table into ``(names, X)`` with one row per site and ``len(variables) * days`` columns.
+
+    With ``path``, ``X`` is a column-major ``.npy`` file mapped into memory
+    instead of an array in RAM, so ``similarity_edges`` can page it in one
+    chunk of days at a time.
+
+    Each variable is standardised over all sites so that no variable
+    dominates by its units. Days a site has no value for are filled with
+    that site's mean. This keeps the matrix dense, but it shrinks the
+    site's variance and pulls its correlations towards zero, more so the
+    more days are missing.
+    """
+    if isinstance(data["location"].dtype, pd.CategoricalDtype):
+        codes = data["location"].cat.codes.to_numpy()
+        names = data["location"].cat.categories.tolist()
+        used = np.unique(codes)
+        if len(used) < len(names):
+            codes = np.searchsorted(used, codes)
+            names = [names[code] for code in used]
+    else:
+        codes, names = pd.factorize(data["location"])
+        names = names.tolist()
+
+    day = local_day(data["date"]).to_numpy()
+    first = day.min()
+    day_index = ((day - first) // np.timedelta64(1, "D")).astype(np.intp)
+    n_days = int(day_index.max()) + 1
+
+    shape = (len(names), len(variables) * n_days)
+    if path is None:
+        X = np.full(shape, np.nan)
+    else:
+        X = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=shape, fortran_order=True)
+        X[:] = np.nan
+    for k, variable in enumerate(variables):
+        values = data[variable].to_numpy(dtype=np.float64)
+        scale = np.nanstd(values)
+        X[codes, k * n_days + day_index] = (values - np.nanmean(values)) / (scale if scale > 0 else 1.0)
+
+    chunks = _column_chunks(shape[0], shape[1], FILL_CHUNK_BYTES)
+    total, count = np.zeros(shape[0]), np.zeros(shape[0])
+    for chunk in chunks:
+        block = X[:, chunk]
+        total += np.nansum(block, axis=1)
+        count += np.count_nonzero(~np.isnan(block), axis=1)
+    row_mean = total / np.where(count > 0, count, 1)
+    row_mean[count == 0] = np.nan
+    for chunk in chunks:
+        block = np.array(X[:, chunk])
+        missing = np.isnan(block)
+        block[missing] = np.broadcast_to(row_mean[:, None], block.shape)[missing]
+        X[:, chunk] = block
+    return names, X
+
+
+def _prepare(X, metric):
+    """Returns ``(Y, norms)`` with ``similarity = f(Y @ Y.T)`` for ``metric``."""
+    if metric == "pearson":
+        Y = X - X.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(Y, axis=1)
+        Y /= np.where(norms > 0, norms, 1.0)[:, None]
+        return Y, None
+    if metric == "euclidean":
+        return X, np.einsum("ij,ij->i", X, X)
+    raise ValueError(f"unknown metric {metric!r}, expected one of {', '.join(METRICS)}")
+
+
+def similarity_matrix(X, metric="pearson"):
+    """Dense (sites x sites) similarity: Pearson correlation, or ``1 / (1 + distance)`` for ``euclidean``."""
+    Y, norms = _prepare(X, metric)
+    return _finish(Y @ Y.T, norms, norms, metric)
+
+
+def _finish(products, row_norms, col_norms, metric):
+    if metric == "pearson":
+        return np.clip(products, -1.0, 1.0)
+    squared = row_norms[:, None] + col_norms[None, :] - 2 * products
+    return 1 / (1 + np.sqrt(np.maximum(squared, 0)))
+
+
+def _row_stats(X, metric, chunks):
+    """``(center, scale, norms)`` of the rows of ``X``, read chunk by chunk; see ``_prepared``."""
+    n, d = X.shape
+    if metric == "pearson":
+        center = np.zeros(n)
+        for chunk in chunks:
+            center += np.asarray(X[:, chunk]).sum(axis=1)
+        center /= d
+        squares = np.zeros(n)
+        for chunk in chunks:
+            block = X[:, chunk] - center[:, None]
+            squares += np.einsum("ij,ij->i", block, block)
+        norms = np.sqrt(squares)
+        return center, np.where(norms > 0, norms, 1.0), None
+    if metric == "euclidean":
+        norms = np.zeros(n)
+        for chunk in chunks:
+            block = np.asarray(X[:, chunk], dtype=np.float64)
+            norms += np.einsum("ij,ij->i", block, block)
+        return None, None, norms
+    raise ValueError(f"unknown metric {metric!r}, expected one of {', '.join(METRICS)}")
+
+
+def _prepared(X, chunk, center, scale):
+    """Columns ``chunk`` of ``Y``, where ``similarity = f(Y @ Y.T)`` as in ``_prepare``."""
+    if center is None:
+        return np.asarray(X[:, chunk], dtype=np.float64)
+    return (X[:, chunk] - center[:, None]) / scale[:, None]
+
+
+def similarity_edges(X, metric="pearson", k=None, threshold=None, memory_limit=256 * 2**20):
+    """Sparse similarity graph as ``(i, j, weight)`` arrays with ``i < j``.
+
+    Each site keeps its ``k`` most similar sites (the union of both
+    directions, so degrees can exceed ``k``), and only pairs with a weight
+    of at least ``threshold`` are kept; with neither, every pair is kept.
+    Non-positive weights are always dropped since community detection and
+    PageRank need positive weights.
+
+    Working memory stays under ``memory_limit`` bytes. Half of it holds a
+    chunk of days of every site, normalised for ``metric``; ``X`` is read
+    one such chunk at a time and never copied whole, so it may be a
+    memory-mapped file (see ``site_matrix``). The rest holds a block of
+    result rows: the accumulated products, the similarities, the candidate
+    column indices and their masks. Only the kept edges are not counted;
+    a chunk is at least one day and a block at least one row.
+    """
+    if k is not None and k < 1:
+        raise ValueError("k must be at least 1")
+    n, d = X.shape
+    chunks = _column_chunks(n, d, memory_limit // 2)
+    center, scale, norms = _row_stats(X, metric, chunks)
+    # With a single chunk it is prepared once instead of once per block
+    whole = _prepared(X, chunks[0], center, scale) if len(chunks) == 1 else None
+    available = memory_limit - 8 * n * (chunks[0].stop - chunks[0].start)
+    # Bytes per block row: the float64 products and similarities, then either
+    # argpartition's int64 indices or the upper triangle's two int64 index
+    # arrays, the candidate values and two boolean masks
+    row_bytes = (16 + 8 + 2) * n if k is not None and k < n - 1 else (16 + 16 + 8 + 2) * n
+    rows_per_block = max(1, min(n, available // max(1, row_bytes)))
+
+    sources, targets, weights = [], [], []
+    for start in range(0, n, rows_per_block):
+        stop = min(n, start + rows_per_block)
+        products = np.zeros((stop - start, n))
+        for chunk in chunks:
+            Y = whole if whole is not None else _prepared(X, chunk, center, scale)
+            products += Y[start:stop] @ Y.T
+        block = _finish(products, None if norms is None else norms[start:stop], norms, metric)
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # no self loops
+
+        if k is not None and k < n - 1:
+            columns = np.argpartition(block, -k, axis=1)[:, -k:]
+            rows = np.repeat(np.arange(stop - start), k)
+            columns = columns.ravel()
+        else:
+            # Without top-k every pair is a candidate; the upper triangle covers each once
+            rows, columns = np.nonzero(np.arange(n)[None, :] > np.arange(start, stop)[:, None])
+        values = block[rows, columns]
+        keep = values > 0
+        if threshold is not None:
+            keep &= values >= threshold
+        sources.append(rows[keep] + start)
+        targets.append(columns[keep])
+        weights.append(values[keep])
+
+    i = np.concatenate(sources) if sources else np.empty(0, dtype=np.intp)
+    j = np.concatenate(targets) if targets else np.empty(0, dtype=np.intp)
+    w = np.concatenate(weights) if weights else np.empty(0)
+
+    # Similarity is symmetric, so (i, j) and (j, i) carry the same weight; keep one
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    _, first = np.unique(lo * n + hi, return_index=True)
+    return lo[first], hi[first], w[first]
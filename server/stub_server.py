@@ -0,0 +1,219 @@
+"""Local stand-ins for the Open-Meteo archive and OpenWeatherMap APIs, used by the benchmarks.
+
+The archive stub serves canned FlatBuffer responses with the same framing as
+the real service (little-endian length prefix per location) so that
+``openmeteo_sdk`` decodes them exactly like live data. The current-conditions
+stub answers ``/data/2.5/weather`` with OpenWeatherMap-shaped JSON.
+"""
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import flatbuffers
+import numpy as np
+import pandas as pd
+
+DAY = 86400
+
+
+def _split_param(query, name):
+    """Returns the values of a query parameter given as repeated keys or as a comma-separated list."""
+    values = []
+    for raw in query.get(name, []):
+        values.extend(v for v in raw.split(',') if v)
+    return values
+
+
+def synthetic_series(lat, lon, start_date, end_date, n_variables=3):
+    """Deterministic fake daily values for one coordinate pair.
+
+    Values depend only on the coordinates and the calendar day, so any
+    sub-range of dates returns the same numbers as the full range.
+    """
+    first = (pd.Timestamp(start_date) - pd.Timestamp("1970-01-01")).days
+    last = (pd.Timestamp(end_date) - pd.Timestamp("1970-01-01")).days
+    t = np.arange(first, last + 1, dtype=np.float64)
+    seed = (abs(lat) * 12.9898 + abs(lon) * 78.233) % 1000
+    season = np.sin(2 * np.pi * t / 365.25)
+    series = []
+    for i in range(n_variables):
+        noise = np.modf(np.abs(np.sin(t * 12.9898 + seed + i * 4.1414)) * 43758.5453)[0]
+        series.append((noise * 10 + season * (i + 1) * 5 + 20).astype(np.float32))
+    return series
+
+
+def encode_weather_response(lat, lon, start_date, values, interval=DAY, location_id=0, section='daily'):
+    """Builds one FlatBuffer ``WeatherApiResponse`` holding ``values`` as a ``daily`` or ``hourly`` block."""
+    builder = flatbuffers.Builder(1024 + sum(v.nbytes for v in values))
+
+    variable_offsets = []
+    for series in values:
+        vector = builder.CreateNumpyVector(np.asarray(series, dtype=np.float32))
+        builder.StartObject(13)
+        builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+        variable_offsets.append(builder.EndObject())
+
+    builder.StartVector(4, len(variable_offsets), 4)
+    for offset in reversed(variable_offsets):
+        builder.PrependUOffsetTRelative(offset)
+    variables = builder.EndVector()
+
+    start = int(pd.Timestamp(start_date, tz='UTC').timestamp())
+    builder.StartObject(4)
+    builder.PrependInt64Slot(0, start, 0)
+    builder.PrependInt64Slot(1, start + len(values[0]) * interval, 0)
+    builder.PrependInt32Slot(2, interval, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables, 0)
+    block = builder.EndObject()
+
+    builder.StartObject(15)
+    builder.PrependFloat32Slot(0, lat, 0.0)
+    builder.PrependFloat32Slot(1, lon, 0.0)
+    builder.PrependInt64Slot(4, location_id, 0)
+    builder.PrependUOffsetTRelativeSlot(10 if section == 'daily' else 11, block, 0)
+    builder.Finish(builder.EndObject())
+
+    payload = bytes(builder.Output())
+    return len(payload).to_bytes(4, byteorder='little') + payload
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Counts requests, adds latency and injects failures; subclasses implement ``respond``."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.request_count += 1
+            count = server.request_count
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            if server.fail_every and count % server.fail_every == 0:
+                self._send(503, b'{"error": true, "reason": "stub failure"}', 'application/json')
+                return
+            self.respond(count, parse_qs(urlparse(self.path).query))
+        finally:
+            with server.stats_lock:
+                server.in_flight -= 1
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ArchiveHandler(_StubHandler):
+
+    def respond(self, count, query):
+        lats = parse_qs(urlparse(self.path).query)
+        lats = [float(v) for v in _split_param(query, 'latitude')]
+        lons = [float(v) for v in _split_param(query, 'longitude')]
+        start_date = query['start_date'][0]
+        end_date = query['end_date'][0]
+        if 'hourly' in query:
+            section, interval = 'hourly', 3600
+            n_variables = len(_split_param(query, 'hourly'))
+        else:
+            section, interval = 'daily', DAY
+            n_variables = len(_split_param(query, 'daily'))
+
+        body = b''.join(
+            encode_weather_response(
+                lat, lon, start_date,
+                self._series(lat, lon, start_date, end_date, n_variables, interval),
+                interval=interval, location_id=i, section=section,
+            )
+            for i, (lat, lon) in enumerate(zip(lats, lons))
+        )
+        self._send(200, body, 'application/octet-stream')
+
+    def _series(self, lat, lon, start_date, end_date, n_variables, interval):
+        if interval != DAY:
+            # Hourly series are not cached: they are 24 times larger and
+            # would make the stub's memory grow with every site served
+            daily = synthetic_series(lat, lon, start_date, end_date, n_variables)
+            return [np.repeat(v, DAY // interval) for v in daily]
+        key = (lat, lon, start_date, end_date, n_variables)
+        cache = self.server.series_cache
+        if key not in cache:
+            cache[key] = synthetic_series(lat, lon, start_date, end_date, n_variables)
+        return cache[key]
+
+
+def current_conditions(lat, lon):
+    """Deterministic fake ``(wind_speed, clouds)`` for one coordinate pair."""
+    seed = abs(lat) * 12.9898 + abs(lon) * 78.233
+    noise = np.modf(np.abs(np.sin(seed)) * 43758.5453)[0]
+    return round(float(noise) * 12, 2), int(noise * 1000) % 101
+
+
+class _CurrentHandler(_StubHandler):
+
+    def respond(self, count, query):
+        server = self.server
+        if server.stall_every and count % server.stall_every == 0:
+            time.sleep(server.stall)
+        lat = float(query['lat'][0])
+        lon = float(query['lon'][0])
+        wind_speed, clouds = current_conditions(lat, lon)
+        data = {"coord": {"lat": lat, "lon": lon}, "wind": {"speed": wind_speed}}
+        if not (server.drop_clouds_every and count % server.drop_clouds_every == 0):
+            data["clouds"] = {"all": clouds}
+        self._send(200, json.dumps(data).encode(), 'application/json')
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close the socket before the stub answers
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _start(handler, port, **settings):
+    server = _StubServer(('127.0.0.1', port), handler)
+    for name, value in settings.items():
+        setattr(server, name, value)
+    server.stats_lock = threading.Lock()
+    server.request_count = 0
+    server.in_flight = 0
+    server.peak_in_flight = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_archive_server(latency=0.0, fail_every=0, port=0):
+    """Starts the stub archive API on a background thread and returns ``(server, base_url)``.
+
+    ``latency`` is added to every request in seconds and every ``fail_every``-th
+    request answers with HTTP 503 to exercise the retry path.
+    """
+    server = _start(_ArchiveHandler, port, latency=latency, fail_every=fail_every, series_cache={})
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/v1/archive"
+
+
+def start_current_server(latency=0.0, fail_every=0, drop_clouds_every=0, stall_every=0, stall=5.0, port=0):
+    """Starts the stub OpenWeatherMap current-weather API and returns ``(server, url)``.
+
+    Besides ``latency`` and ``fail_every`` (HTTP 503), every
+    ``drop_clouds_every``-th response omits the ``clouds`` block and every
+    ``stall_every``-th request sleeps ``stall`` seconds before answering, to
+    exercise the client timeout.
+    """
+    server = _start(_CurrentHandler, port, latency=latency, fail_every=fail_every,
+                    drop_clouds_every=drop_clouds_every, stall_every=stall_every, stall=stall)
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/data/2.5/weather"
@@ -0,0 +1,45 @@
+"""Deterministic synthetic inputs shared by the benchmarks and the test suite.
+
+Sites are spread over Romania's bounding box and daily values come from
+``stub_server.synthetic_series``, so the same arguments always give the same
+data without touching the network.
+"""
+import numpy as np
+import pandas as pd
+
+from daily_table import TableBuilder
+from fetcher import DAILY_VARIABLES
+from stub_server import synthetic_series
+
+
+def synthetic_locations(n):
+    """Spreads ``n`` candidate grid cells over Romania's bounding box."""
+    return [
+        {"name": f"cell-{i}", "lat": round(43.6 + (i * 0.37) % 4.6, 4), "lon": round(20.3 + (i * 0.53) % 9.4, 4)}
+        for i in range(n)
+    ]
+
+
+def synthetic_sites(n, seed=0):
+    """Current-conditions frame for ``n`` random sites, shaped like ``build_dataframe`` output."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "name": [f"site-{i}" for i in range(n)],
+        "lat": rng.uniform(43.6, 48.2, n),
+        "lon": rng.uniform(20.3, 29.7, n),
+        "wind_speed": rng.uniform(0, 10, n),
+        "clouds": rng.integers(0, 100, n),
+    })
+
+
+def synthetic_table(locations, start_date, end_date, missing=0.01, seed=0):
+    """Daily table of ``locations`` with a fraction of the values set to NaN."""
+    rng = np.random.default_rng(seed)
+    start = int(pd.Timestamp(start_date, tz="UTC").timestamp())
+    builder = TableBuilder(DAILY_VARIABLES)
+    for loc in locations:
+        series = synthetic_series(loc["lat"], loc["lon"], start_date, end_date)
+        for values in series:
+            values[rng.random(len(values)) < missing] = np.nan
+        builder.add(loc["name"], (start, 86400, len(series[0])), dict(zip(DAILY_VARIABLES, series)))
+    return builder.build()
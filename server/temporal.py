@@ -0,0 +1,213 @@
+"""Betweenness of the site-similarity graph for every (year, metric) snapshot.
+
+Each snapshot is the complete graph of the sites with a yearly average of
+``metric``, weighted by ``|a - b|`` between their averages, as drawn by
+``figures.betweenness_map_figure``. All weight matrices come out of one
+``(year, metric, site, site)`` NumPy tensor. Snapshots are then solved in
+batches, on a process pool when the work is large enough:
+
+- dense Floyd-Warshall gives all-pairs distances;
+- Brandes' path counting and dependency accumulation run with targets
+  visited in order of distance from every source at once.
+
+Both steps are O(n³) array operations per snapshot instead of a Dijkstra
+per source in Python.
+
+Paths whose lengths agree to a relative ``tolerance`` count as equally
+short. ``|a - b|`` weights make every site whose value lies between two
+others sit on one of their shortest paths, and ``nx.betweenness_centrality``
+decides those ties by exact float comparison, so its result depends on
+rounding. With integer-valued averages both agree exactly. Sites with
+equal averages (zero weights) are ordered by name; NetworkX can count such
+paths more than once and report betweenness above 1.
+
+The result is a tidy ``(year, metric, location, betweenness)`` table,
+memoised in the analysis result cache under a hash of the averages.
+
+    python temporal.py --metrics wind_speed_10m_max shortwave_radiation_sum
+"""
+import argparse
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+METRICS = ["shortwave_radiation_sum", "wind_speed_10m_max", "sunshine_duration"]
+TOLERANCE = 1e-9
+# Below this many n³ steps in total a process pool costs more than it saves
+PARALLEL_MIN_WORK = 2**27
+# Predecessor masks are kept between the two passes while they fit in this many bytes
+MASK_BYTES = 2**28
+
+
+def snapshot_weights(yearly_avg, years=None, metrics=METRICS):
+    """Returns ``(years, metrics, locations, weights)`` with ``weights[y, m]`` the ``|a - b|`` matrix.
+
+    A site without an average for a snapshot has infinite weights to every
+    other site, which leaves it out of that snapshot's graph.
+    """
+    years = sorted(yearly_avg["year"].unique().tolist()) if years is None else list(years)
+    metrics = list(metrics)
+    frame = yearly_avg[yearly_avg["year"].isin(years)]
+    locations = sorted(frame["location"].astype(str).unique().tolist())
+    table = frame.assign(location=frame["location"].astype(str)).pivot_table(
+        index="year", columns="location", values=metrics, aggfunc="first", dropna=False)
+    # values[y, m, site]
+    values = np.stack([
+        table[metric].reindex(index=years, columns=locations).to_numpy(dtype=float) for metric in metrics
+    ], axis=1)
+    weights = np.abs(values[..., :, None] - values[..., None, :])
+    weights[np.isnan(weights)] = np.inf
+    diagonal = np.arange(len(locations))
+    weights[..., diagonal, diagonal] = np.where(np.isnan(values), np.inf, 0.0)
+    return years, metrics, locations, weights
+
+
+def all_pairs_distances(weights):
+    """Dense Floyd-Warshall over a stack of ``(..., n, n)`` weight matrices."""
+    distances = weights.copy()
+    for k in range(distances.shape[-1]):
+        np.minimum(distances, distances[..., :, k, None] + distances[..., None, k, :], out=distances)
+    return distances
+
+
+def dense_betweenness(weights, tolerance=TOLERANCE):
+    """Normalised betweenness of a stack of ``(S, n, n)`` symmetric weight matrices.
+
+    Sites that are absent from a snapshot (infinite diagonal) get NaN, and
+    the normalisation of that snapshot uses only the sites present. Path
+    counts are floats: with ``|a - b|`` weights a pair has up to 2^(n-2)
+    shortest paths, which stays finite up to about 1000 sites.
+    """
+    S, n, _ = weights.shape
+    present = np.isfinite(weights[:, np.arange(n), np.arange(n)])
+    distances = all_pairs_distances(weights)
+    rows = np.arange(n)
+    batch = np.arange(S)[:, None]
+
+    # Visit every source's targets in order of distance, the source itself first
+    order_key = distances.copy()
+    order_key[:, rows, rows] = -1.0
+    order = np.argsort(order_key, axis=2, kind='stable')
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(n), axis=2)
+    reachable = np.isfinite(distances)
+
+    def predecessors(r):
+        """``(S, source, u)`` mask of the sites right before the rank-``r`` target on a shortest path."""
+        target = order[:, :, r]
+        to_target = np.take_along_axis(distances, target[:, :, None], axis=2)
+        step = weights[batch, target]  # weights[s, target[s, i], u]
+        with np.errstate(invalid='ignore'):
+            close = np.abs(distances + step - to_target) <= tolerance * to_target
+        return target, close & (rank < r) & reachable & np.isfinite(step)
+
+    sigma = np.zeros((S, n, n))
+    sigma[:, rows, rows] = present
+    keep = S * n ** 3 <= MASK_BYTES
+    masks = [None] * n
+    for r in range(1, n):
+        target, mask = predecessors(r)
+        if keep:
+            masks[r] = mask
+        counts = (mask * sigma).sum(axis=2)
+        np.put_along_axis(sigma, target[:, :, None], counts[:, :, None], axis=2)
+    if np.isinf(sigma).any():
+        raise ValueError("shortest path counts overflow; too many sites lie on one line")
+
+    delta = np.zeros((S, n, n))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for r in range(n - 1, 0, -1):
+            target = order[:, :, r]
+            mask = masks[r] if masks[r] is not None else predecessors(r)[1]
+            sigma_t = np.take_along_axis(sigma, target[:, :, None], axis=2)
+            delta_t = np.take_along_axis(delta, target[:, :, None], axis=2)
+            share = np.where(sigma_t > 0, (1 + delta_t) / sigma_t, 0.0)
+            delta += np.where(mask, sigma * share, 0.0)
+    delta[:, rows, rows] = 0
+    centrality = delta.sum(axis=1)
+
+    count = present.sum(axis=1)
+    with np.errstate(divide='ignore'):
+        scale = np.where(count > 2, 1 / ((count - 1) * (count - 2)), 1.0)
+    return np.where(present, centrality * scale[:, None], np.nan)
+
+
+def _solve(weights, tolerance):
+    return dense_betweenness(weights, tolerance)
+
+
+def snapshot_betweenness(weights, tolerance=TOLERANCE, workers=None):
+    """Betweenness for every snapshot of a ``(..., n, n)`` weight tensor, split over ``workers`` processes."""
+    shape = weights.shape
+    stack = weights.reshape(-1, shape[-2], shape[-1])
+    S, n = stack.shape[0], stack.shape[-1]
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1 or S < 2 or S * n ** 3 < PARALLEL_MIN_WORK:
+        result = dense_betweenness(stack, tolerance)
+    else:
+        chunks = np.array_split(stack, min(workers, S))
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            result = np.concatenate(list(executor.map(_solve, chunks, [tolerance] * len(chunks))))
+    return result.reshape(shape[:-1])
+
+
+def averages_key(yearly_avg, years, metrics):
+    digest = hashlib.sha1()
+    digest.update(repr((sorted(years) if years is not None else None, list(metrics))).encode())
+    digest.update(pd.util.hash_pandas_object(yearly_avg, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def temporal_betweenness(yearly_avg, years=None, metrics=METRICS, tolerance=TOLERANCE, workers=None, cache=None):
+    """Tidy ``year, metric, location, betweenness`` table for every (year, metric) snapshot.
+
+    The table is memoised in the analysis result cache (``cache``, or the
+    default one), so asking again for the same averages does not recompute.
+    """
+    import analysis_cache
+
+    def compute():
+        snapshot_years, snapshot_metrics, locations, weights = snapshot_weights(yearly_avg, years, metrics)
+        values = snapshot_betweenness(weights, tolerance, workers)
+        index = pd.MultiIndex.from_product([snapshot_years, snapshot_metrics, locations],
+                                           names=["year", "metric", "location"])
+        table = pd.DataFrame({"betweenness": values.ravel()}, index=index).dropna().reset_index()
+        return table.astype({"year": "int32", "metric": "category", "location": "category"})
+
+    cache = analysis_cache.default_cache if cache is None else cache
+    return cache.get_or_compute("temporal_betweenness", averages_key(yearly_avg, years, metrics),
+                                {"tolerance": tolerance}, compute).copy()
+
+
+def snapshot(table, year, metric):
+    """``{location: betweenness}`` of one snapshot of a ``temporal_betweenness`` table."""
+    rows = table[(table["year"] == year) & (table["metric"] == metric)]
+    return dict(zip(rows["location"].astype(str), rows["betweenness"].tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="*", help="years (default: all)")
+    parser.add_argument("--metrics", nargs="*", default=METRICS)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--out", help="write the tidy table to this CSV file")
+    args = parser.parse_args()
+
+    from aggregation import calculate_yearly_averages
+    from analysis import fetch_weather_data
+
+    table = temporal_betweenness(calculate_yearly_averages(fetch_weather_data()), args.years, args.metrics,
+                                 workers=args.workers)
+    if args.out:
+        table.to_csv(args.out, index=False)
+    for metric in args.metrics:
+        print(f"\n{metric}")
+        print(table[table["metric"] == metric].pivot(index="location", columns="year", values="betweenness")
+              .round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
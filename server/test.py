@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import networkx as nx
 from data_processing import create_network, build_dataframe, analyze_network
 
@@ -21,6 +20,8 @@ locations = [
 ]
 
 def plot_network(G):
+    import matplotlib.pyplot as plt
+
     pos = nx.spring_layout(G)
 
     # Get PageRank scores
@@ -43,7 +44,11 @@ def plot_network(G):
     plt.title("Network Graph of Renewable Sites with PageRank and Communities")
     plt.show()
 
-df = build_dataframe(locations)
-G = create_network(df)
+def main():
+    df = build_dataframe(locations)
+    G = create_network(df)
+
+    plot_network(G)
 
-plot_network(G)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Shared fixtures. The server modules use flat imports, so ``server/`` goes on the path."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import synthetic_locations, synthetic_sites, synthetic_table  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def daily_table():
+    """Two years of 12 sites, with about 1% of the values missing."""
+    return synthetic_table(synthetic_locations(12), "2020-11-01", "2022-10-31")
+
+
+@pytest.fixture(scope="session")
+def sites():
+    return synthetic_sites(150)
@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+from aggregation import VARIABLES, RollupCache, WeatherAggregates, cached_rollup
+from weather_api import WeatherSnapshot
+from weather_store import local_day
+
+
+def reference(data, period):
+    """Rollup the plain way: one groupby over the daily rows."""
+    day = local_day(data["date"])
+    keys = {"location": data["location"].astype(str), "year": day.dt.year}
+    if period == "month":
+        keys["month"] = day.dt.month
+    frame = data[VARIABLES].astype("float64").assign(**keys)
+    return frame.groupby(list(keys))[VARIABLES].mean().round(2).reset_index()
+
+
+@pytest.mark.parametrize("period", ["year", "month"])
+def test_rollup_matches_a_groupby(daily_table, period):
+    rollup = WeatherAggregates(daily_table).rollup(period)
+    expected = reference(daily_table, period)
+    # float32 sums may round the last digit differently
+    pd.testing.assert_frame_equal(rollup, expected, atol=0.011, check_dtype=False)
+
+
+def test_seasons_count_december_towards_the_next_winter(daily_table):
+    seasonal = WeatherAggregates(daily_table).rollup("season")
+    site = daily_table[daily_table["location"] == "cell-0"]
+    day = local_day(site["date"])
+    winter = site[((day.dt.year == 2021) & (day.dt.month <= 2)) | ((day.dt.year == 2020) & (day.dt.month == 12))]
+    row = seasonal[(seasonal["location"] == "cell-0") & (seasonal["year"] == 2021) & (seasonal["season"] == "DJF")]
+    assert row["wind_speed_10m_max"].item() == pytest.approx(winter["wind_speed_10m_max"].mean(), abs=0.011)
+
+
+def test_update_folds_in_only_new_days(daily_table):
+    day = local_day(daily_table["date"])
+    aggregates = WeatherAggregates(daily_table[day < "2021-07-01"])
+    assert aggregates.update(daily_table) == int((day >= "2021-07-01").sum())
+    assert aggregates.update(daily_table) == 0
+
+    full = WeatherAggregates(daily_table)
+    for period in ("year", "month", "season"):
+        pd.testing.assert_frame_equal(aggregates.rollup(period), full.rollup(period))
+
+
+def test_update_adds_new_locations(daily_table):
+    first = daily_table["location"].isin(["cell-0", "cell-1"])
+    aggregates = WeatherAggregates(daily_table[first])
+    assert aggregates.locations == {"cell-0", "cell-1"}
+    aggregates.update(daily_table)
+    assert len(aggregates.locations) == 12
+    pd.testing.assert_frame_equal(aggregates.rollup(), WeatherAggregates(daily_table).rollup())
+
+
+def test_rollups_are_copies(daily_table):
+    aggregates = WeatherAggregates(daily_table)
+    rollup = aggregates.rollup()
+    rollup.loc[0, "wind_speed_10m_max"] = -1.0
+    assert aggregates.rollup().loc[0, "wind_speed_10m_max"] != -1.0
+
+
+def test_cached_rollup_computes_once_per_content(daily_table):
+    cache = RollupCache()
+    first = cached_rollup(daily_table, cache=cache)
+    second = cached_rollup(daily_table.copy(), cache=cache)
+    cached_rollup(daily_table, "month", cache=cache)
+    assert cache.stats == {"hits": 1, "misses": 2}
+    pd.testing.assert_frame_equal(first, second)
+
+    changed = daily_table.copy()
+    changed.loc[0, "wind_speed_10m_max"] += 1
+    cached_rollup(changed, cache=cache)
+    assert cache.stats["misses"] == 3
+
+
+def test_rollup_cache_evicts_the_least_recently_used():
+    cache = RollupCache(max_items=2)
+    for key in ("a", "b", "a", "c"):
+        cache.get_or_compute(key, lambda: key)
+    assert cache.get_or_compute("a", lambda: "recomputed") == "a"
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+
+
+def test_snapshot_rollup_follows_new_versions(daily_table):
+    day = local_day(daily_table["date"])
+    tables = [daily_table[day < "2021-07-01"].reset_index(drop=True), daily_table,
+              daily_table[daily_table["location"] != "cell-3"].reset_index(drop=True)]
+    snapshot = WeatherSnapshot(lambda: tables[0])
+    assert snapshot.rollup() == (None, None)
+
+    for table in tables:
+        snapshot.loader = lambda table=table: table
+        snapshot.refresh()
+        version, rollup = snapshot.rollup()
+        assert version == snapshot.version
+        pd.testing.assert_frame_equal(rollup, WeatherAggregates(table).rollup())
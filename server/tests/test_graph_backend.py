@@ -0,0 +1,94 @@
+import networkx as nx
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import graph_backend
+from data_processing import create_network
+from pipeline import NetworkPipeline
+
+TOLERANCE = 1e-6
+MODULARITY_SLACK = 0.02
+
+
+@pytest.fixture(scope="module")
+def graph(sites):
+    return create_network(sites, radius=60, metric="haversine")
+
+
+def as_array(values, nodes):
+    return np.array([values[node] for node in nodes])
+
+
+def modularity(G, nodes, labels):
+    return nx.algorithms.community.modularity(
+        G, [set(np.asarray(nodes, dtype=object)[labels == c]) for c in np.unique(labels)])
+
+
+def test_pagerank_matches_networkx(graph):
+    nodes, A = graph_backend.to_csr(graph)
+    np.testing.assert_allclose(graph_backend.pagerank(A), as_array(nx.pagerank(graph), nodes), atol=TOLERANCE)
+
+
+def test_pagerank_warm_start_converges_to_the_same_scores(graph):
+    nodes, A = graph_backend.to_csr(graph)
+    cold = graph_backend.pagerank(A, tol=1e-10)
+    warm = graph_backend.pagerank(A, tol=1e-10, nstart=np.arange(1, len(nodes) + 1))
+    np.testing.assert_allclose(warm, cold, atol=1e-8)
+
+
+def test_louvain_is_as_good_as_greedy_modularity(graph):
+    nodes, A = graph_backend.to_csr(graph)
+    labels = graph_backend.louvain(A, seed=0)
+    greedy = nx.algorithms.community.greedy_modularity_communities(graph)
+    assert modularity(graph, nodes, labels) >= nx.algorithms.community.modularity(graph, greedy) - MODULARITY_SLACK
+    # Numbered by decreasing size
+    sizes = np.bincount(labels)
+    assert list(sizes) == sorted(sizes, reverse=True)
+    np.testing.assert_array_equal(graph_backend.louvain(A, seed=0), labels)
+
+
+def test_betweenness_matches_networkx(graph):
+    nodes, A = graph_backend.to_csr(graph)
+    expected = as_array(nx.betweenness_centrality(graph), nodes)
+    np.testing.assert_allclose(graph_backend.betweenness(A, batch_size=16), expected, atol=TOLERANCE)
+
+
+def test_closeness_matches_networkx(graph):
+    nodes, A = graph_backend.to_csr(graph)
+    expected = as_array(nx.closeness_centrality(graph), nodes)
+    np.testing.assert_allclose(graph_backend.closeness(A, batch_size=32), expected, atol=TOLERANCE)
+
+
+def test_empty_graph():
+    A = sp.csr_array((0, 0))
+    assert len(graph_backend.pagerank(A)) == 0
+    assert len(graph_backend.louvain(A)) == 0
+    assert len(graph_backend.betweenness(A)) == 0
+
+
+def edge_set(G):
+    return {(min(u, v), max(u, v), round(w, 12)) for u, v, w in G.edges(data="weight")}
+
+
+def test_pipeline_ticks_match_a_full_rebuild(sites, tmp_path):
+    rng = np.random.default_rng(1)
+    observations = sites.copy()
+    pipeline = NetworkPipeline(observations[["name", "lat", "lon"]].to_dict(orient="records"),
+                               assets_dir=str(tmp_path), radius=60, metric="haversine", backend="sparse")
+    pipeline.tick(observations)
+    for _ in range(3):
+        changed = rng.choice(len(observations), size=10, replace=False)
+        observations.loc[changed, "wind_speed"] = rng.uniform(0, 10, len(changed))
+        metrics = pipeline.tick(observations)
+        assert metrics["sites_changed"] > 0
+
+        G = create_network(observations, radius=60, metric="haversine")
+        assert edge_set(pipeline.graph) == edge_set(G)
+        nodes, A = graph_backend.to_csr(pipeline.graph)
+        cold = graph_backend.pagerank(A)
+        # Both stop within alpha / (1 - alpha) times the N * tol stopping threshold of the exact vector
+        assert np.abs(cold - as_array(pipeline.pagerank, nodes)).sum() < 2 * 0.85 / 0.15 * len(nodes) * TOLERANCE
+
+    metrics = pipeline.tick(observations)
+    assert metrics["sites_changed"] == 0 and "write" not in metrics["timings"]
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prefix_index import PrefixIndex, parse_months, range_stats
+from weather_api import VARIABLES
+from weather_store import local_day
+
+QUERIES = [
+    {},
+    {"start": "2021-06-01", "end": "2021-08-31"},
+    {"start": "2021-01-01", "end": "2022-12-31", "months": "3-9"},
+    {"months": "11-2"},
+    {"start": "2019-01-01", "end": "2020-11-01"},
+]
+
+
+@pytest.fixture(scope="module")
+def frame(daily_table):
+    return daily_table.assign(day=local_day(daily_table["date"]))
+
+
+@pytest.fixture(scope="module")
+def index(frame):
+    return PrefixIndex(frame, VARIABLES)
+
+
+def groupby_stats(frame, variable, start=None, end=None, months=None):
+    """The same statistics the slow way: filter the rows, then group by site."""
+    mask = pd.Series(True, index=frame.index)
+    if start:
+        mask &= frame["day"] >= pd.Timestamp(start)
+    if end:
+        mask &= frame["day"] <= pd.Timestamp(end)
+    if months:
+        first, last = parse_months(months)
+        month = frame["day"].dt.month
+        mask &= (month >= first) & (month <= last) if first <= last else (month >= first) | (month <= last)
+    values = frame.loc[mask, variable].astype("float64")
+    grouped = values.groupby(frame.loc[mask, "location"], observed=False)
+    return grouped.count(), grouped.mean(), grouped.var()
+
+
+@pytest.mark.parametrize("variable", VARIABLES)
+@pytest.mark.parametrize("query", QUERIES)
+def test_stats_match_a_groupby(frame, index, variable, query):
+    count, mean, var = groupby_stats(frame, variable, **query)
+    n, m, v = index.stats(variable, index.windows(**query))
+    np.testing.assert_array_equal(n, count.reindex(index.locations).to_numpy())
+    np.testing.assert_allclose(m, mean.reindex(index.locations).to_numpy(), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(v, var.reindex(index.locations).to_numpy(), rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize("query", QUERIES[1:4])
+def test_top_sites_match_a_sort(frame, index, query):
+    _, mean, _ = groupby_stats(frame, "wind_speed_10m_max", **query)
+    windows = index.windows(**query)
+    chosen = index.top("wind_speed_10m_max", 3, windows)
+    assert index.locations[chosen].tolist() == mean.sort_values(ascending=False).index[:3].tolist()
+    lowest = index.top("wind_speed_10m_max", 3, windows, largest=False)
+    assert index.locations[lowest].tolist() == mean.sort_values().index[:3].tolist()
+
+
+def test_range_stats_of_selected_locations(frame, index):
+    count, mean, _ = groupby_stats(frame, "sunshine_duration", "2021-06-01", "2021-06-30")
+    payload = range_stats(index, "sunshine_duration", "2021-06-01", "2021-06-30", locations=["cell-5", "cell-2"])
+    assert payload["locations"] == ["cell-5", "cell-2"]
+    assert payload["count"] == [count["cell-5"], count["cell-2"]]
+    assert payload["mean"] == [round(mean["cell-5"], 4), round(mean["cell-2"], 4)]
+    assert payload["windows"] == [["2021-06-01", "2021-06-30"]]
+
+    best = range_stats(index, "sunshine_duration", "2021-06-01", "2021-06-30", locations=["cell-5", "cell-2"],
+                       top=1, by="mean", order="asc")
+    assert best["locations"] == [mean[["cell-5", "cell-2"]].idxmin()]
+
+
+def test_arrays_round_trip(index):
+    copy = PrefixIndex.from_arrays(index.variables, index.locations, index.first_day, index.days, index.arrays())
+    windows = index.windows(months="6-8")
+    for variable in VARIABLES:
+        for expected, actual in zip(index.stats(variable, windows), copy.stats(variable, windows)):
+            np.testing.assert_array_equal(actual, expected)
+
+
+def test_rejects_bad_input(index):
+    with pytest.raises(ValueError):
+        index.windows(start="2021-01-01T00:00:00+02:00")
+    with pytest.raises(ValueError):
+        index.site_positions(["nowhere"])
+    with pytest.raises(ValueError):
+        index.stats("temperature", index.windows())
+    with pytest.raises(ValueError):
+        parse_months("13")
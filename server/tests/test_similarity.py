@@ -0,0 +1,87 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from community import create_similarity_network
+from fetcher import DAILY_VARIABLES
+from synthetic import synthetic_locations, synthetic_table
+from weather_store import local_day
+
+TOLERANCE = 1e-9
+
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic_table(synthetic_locations(40), "2021-01-01", "2022-12-31", missing=0.05)
+
+
+def pairwise_network(data, variables=DAILY_VARIABLES):
+    """Site correlations from a pandas pivot, loaded into the graph one edge at a time."""
+    frame = data.assign(location=data["location"].astype(str), day=local_day(data["date"]))
+    columns = []
+    for variable in variables:
+        values = frame[variable].astype(np.float64)
+        columns.append(frame.assign(**{variable: (values - values.mean()) / values.std(ddof=0)})
+                       .pivot_table(index="location", columns="day", values=variable, dropna=False))
+    pivot = pd.concat(columns, axis=1)
+    pivot = pivot.T.fillna(pivot.mean(axis=1)).T
+    correlation = pivot.T.corr()
+
+    G = nx.Graph()
+    G.add_nodes_from(correlation.index)
+    for loc1 in correlation.index:
+        for loc2 in correlation.columns:
+            if loc1 != loc2:
+                weight = correlation.loc[loc1, loc2]
+                if weight > 0:
+                    G.add_edge(loc1, loc2, weight=weight)
+    return G
+
+
+def top_k(G, k):
+    """The edges kept when every node keeps its ``k`` heaviest edges of ``G``."""
+    kept = nx.Graph()
+    kept.add_nodes_from(G)
+    for node in G:
+        heaviest = sorted(G[node].items(), key=lambda item: -item[1]["weight"])[:k]
+        kept.add_edges_from((node, other, data) for other, data in heaviest)
+    return kept
+
+
+def assert_same_graph(expected, actual):
+    assert set(expected) == set(actual)
+    assert sorted(map(sorted, expected.edges())) == sorted(map(sorted, actual.edges()))
+    for u, v, weight in expected.edges(data="weight"):
+        assert actual[u][v]["weight"] == pytest.approx(weight, abs=TOLERANCE)
+
+
+@pytest.fixture(scope="module")
+def dense(data):
+    return create_similarity_network(data, variables=DAILY_VARIABLES)
+
+
+def test_dense_build_matches_pairwise_correlations(data, dense):
+    assert dense.number_of_edges() > 0
+    assert_same_graph(pairwise_network(data), dense)
+
+
+def test_blocked_build_in_a_file_matches_the_dense_build(data, dense, tmp_path):
+    # Far below the matrix's size, so the days are read in chunks and the products in blocks of rows
+    blocked = create_similarity_network(data, variables=DAILY_VARIABLES, memory_limit=40 * 730 * 8 // 4,
+                                        matrix_path=str(tmp_path / "matrix.npy"))
+    assert_same_graph(dense, blocked)
+
+
+def test_top_k_keeps_each_sites_heaviest_edges(data, dense):
+    assert_same_graph(top_k(dense, 5), create_similarity_network(data, variables=DAILY_VARIABLES, k=5))
+    assert_same_graph(top_k(dense, 5), create_similarity_network(data, variables=DAILY_VARIABLES, k=5,
+                                                                 memory_limit=40 * 730 * 8 // 4))
+
+
+def test_threshold_drops_weaker_pairs(data, dense):
+    strong = create_similarity_network(data, variables=DAILY_VARIABLES, threshold=0.5)
+    expected = nx.Graph()
+    expected.add_nodes_from(dense)
+    expected.add_edges_from((u, v, d) for u, v, d in dense.edges(data=True) if d["weight"] >= 0.5)
+    assert_same_graph(expected, strong)
@@ -0,0 +1,129 @@
+import json
+import os
+
+import pytest
+
+from updates import NODE_FIELDS, DeltaFeed, diff, node_rows
+
+
+def network(version, nodes):
+    return {"version": version, "updated": None,
+            "nodes": [{"name": name, "lat": lat, "lon": lon, "pagerank": pagerank, "community": community}
+                      for name, (lat, lon, pagerank, community) in nodes.items()]}
+
+
+def statistics(version, average_wind):
+    return {"version": version, "updated": None, "average_wind": average_wind, "average_solar": 1.5}
+
+
+def apply_delta(rows, delta):
+    rows = {name: row for name, row in rows.items() if name not in delta["removed"]}
+    nodes = delta["nodes"]
+    for k, name in enumerate(nodes["name"]):
+        rows[name] = tuple(nodes[field][k] for field in NODE_FIELDS)
+    return rows
+
+
+FIRST = {"a": (45.1, 25.2, 0.5, 0), "b": (46.0, 26.0, 0.3, 1), "c": (44.5, 27.0, 0.2, 1)}
+SECOND = {"a": (45.1, 25.2, 0.4, 0), "b": (46.0, 26.0, 0.3, 1), "d": (47.0, 23.0, 0.3, 2)}
+
+
+def test_node_rows_round_like_deltas():
+    rows = node_rows(network(1, {"a": (45.1234567, 25.7654321, 0.123456789, 3)}))
+    assert rows == {"a": (45.12346, 25.76543, 0.123457, 3)}
+
+
+def test_diff_lists_changed_added_and_removed_nodes():
+    old, new = node_rows(network(1, FIRST)), node_rows(network(2, SECOND))
+    nodes, added, removed, changed = diff(old, new, statistics(1, 4.0), statistics(2, 4.5))
+    assert nodes["name"] == ["a", "d"]
+    assert added == ["d"]
+    assert removed == ["c"]
+    # The version stamps always change and are sent with the event itself
+    assert changed == {"average_wind": 4.5}
+    assert apply_delta(old, {"nodes": nodes, "removed": removed}) == new
+
+
+def test_diff_of_equal_documents_is_empty():
+    rows = node_rows(network(1, FIRST))
+    nodes, added, removed, changed = diff(rows, rows, statistics(1, 4.0), statistics(2, 4.0))
+    assert nodes["name"] == [] and added == [] and removed == [] and changed == {}
+
+
+class Files:
+    def __init__(self, directory):
+        self.network_path = os.path.join(directory, "network_data.json")
+        self.statistics_path = os.path.join(directory, "statistics.json")
+        self.version = 0
+
+    def publish(self, nodes, average_wind=4.0):
+        self.version += 1
+        for path, document in ((self.network_path, network(self.version, nodes)),
+                               (self.statistics_path, statistics(self.version, average_wind))):
+            with open(path, "w") as f:
+                json.dump(document, f)
+            # Each version gets its own mtime, however fast the test writes them
+            os.utime(path, ns=(self.version * 10**9, self.version * 10**9))
+        return str(self.version)
+
+
+def events(raw):
+    return [(block.split("\n")[1][len("event: "):], json.loads(block.split("\n")[2][len("data: "):]))
+            for block in b"".join(raw).decode().split("\n\n") if block]
+
+
+@pytest.fixture
+def files(tmp_path):
+    return Files(tmp_path)
+
+
+def test_feed_sends_missed_deltas_then_resets(files):
+    feed = DeltaFeed(files.network_path, files.statistics_path, history=2)
+    files.publish(FIRST)
+    assert feed.check() == "1"
+    assert feed.since("1") == ("1", [])
+
+    files.publish(SECOND)
+    assert feed.check() == "2"
+    version, raw = feed.since("1")
+    [(event, payload)] = events(raw)
+    assert (version, event, payload["base"], payload["added"], payload["removed"]) == ("2", "delta", "1", ["d"], ["c"])
+
+    files.publish(FIRST, average_wind=5.0)
+    feed.check()
+    assert [payload["version"] for _, payload in events(feed.since("1")[1])] == ["2", "3"]
+    assert [payload["version"] for _, payload in events(feed.since("2")[1])] == ["3"]
+
+    files.publish(SECOND)
+    feed.check()
+    # Only the last two deltas are kept, so a client at version 1 starts over
+    assert events(feed.since("1")[1]) == [("reset", {"version": "4"})]
+    assert feed.stats == {"deltas": 3, "sent": 0, "resets": 1}
+
+
+def test_feed_waits_for_both_files(files):
+    feed = DeltaFeed(files.network_path, files.statistics_path)
+    files.publish(FIRST)
+    feed.check()
+    with open(files.network_path, "w") as f:
+        json.dump(network(2, SECOND), f)
+    assert feed.check() == "1"
+
+
+def test_stream_yields_missed_deltas_then_waits(files):
+    feed = DeltaFeed(files.network_path, files.statistics_path, check_interval=0.01, heartbeat=0.05)
+    files.publish(FIRST)
+    feed.check()
+    files.publish(SECOND)
+    feed.check()
+
+    stream = feed.stream("1")
+    assert next(stream) == b"retry: 5000\n\n"
+    assert [payload["version"] for _, payload in events([next(stream)])] == ["2"]
+    assert next(stream) == b": keep-alive\n\n"
+
+    files.publish(FIRST)
+    # The watcher thread picks the new version up within a few heartbeats
+    chunk = next(chunk for chunk in stream if chunk != b": keep-alive\n\n")
+    assert [payload["version"] for _, payload in events([chunk])] == ["3"]
+    assert feed.stats["sent"] == 2
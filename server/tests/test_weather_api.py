@@ -0,0 +1,65 @@
+import time
+
+import pytest
+from flask import Flask
+
+from prefix_index import PrefixIndex, range_stats
+from weather_api import VARIABLES, WeatherSnapshot, weather_api
+from weather_store import table_version
+
+
+def client_for(snapshot):
+    app = Flask(__name__)
+    app.register_blueprint(weather_api)
+    snapshot.init_app(app)
+    return app.test_client()
+
+
+@pytest.fixture(scope="module")
+def client(daily_table):
+    snapshot = WeatherSnapshot(lambda: daily_table)
+    snapshot.refresh()
+    return client_for(snapshot)
+
+
+def test_stats_route_answers_from_the_index(client, daily_table):
+    response = client.get("/weather/stats?variable=wind_speed_10m_max&start=2021-01-01&end=2021-12-31&months=6-8"
+                          "&top=3")
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload.pop("version") == table_version(daily_table)
+    index = PrefixIndex(daily_table, VARIABLES)
+    assert payload == range_stats(index, "wind_speed_10m_max", "2021-01-01", "2021-12-31", (6, 8), top=3)
+
+
+@pytest.mark.parametrize("query", [
+    "/weather?start=2021-01-01T00:00:00%2B02:00",
+    "/weather?end=yesterday",
+    "/weather?variable=temperature",
+    "/weather?points=2",
+    "/weather/stats?variable=wind_speed_10m_max&location=nowhere",
+    "/weather/stats?variable=wind_speed_10m_max&start=2021-01-01T00:00:00Z",
+    "/weather/stats?variable=wind_speed_10m_max&months=0-3",
+])
+def test_bad_queries_are_400s(client, query):
+    response = client.get(query)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_failed_first_load_is_a_503_with_the_error():
+    def loader():
+        raise OSError("archive unreachable")
+
+    snapshot = WeatherSnapshot(loader, refresh_interval=3600)
+    client = client_for(snapshot)
+    response = client.get("/weather")
+    assert response.status_code == 503
+
+    deadline = time.monotonic() + 5
+    while snapshot.error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    response = client.get("/weather/stats?variable=wind_speed_10m_max")
+    assert response.status_code == 503
+    assert "archive unreachable" in response.get_json()["error"]
+    assert response.headers["Retry-After"] == "3600"
@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from daily_table import TableBuilder
+from weather_store import WeatherStore, merge_ranges, subtract_ranges
+
+DAY = 86400
+
+
+def table(start_date, values):
+    """Daily table from ``{location: {variable: values}}``, each location starting at ``start_date``."""
+    start = int(pd.Timestamp(start_date, tz="UTC").timestamp())
+    builder = TableBuilder()
+    for name, columns in values.items():
+        columns = {variable: np.asarray(series, dtype=np.float32) for variable, series in columns.items()}
+        builder.add(name, (start, DAY, len(next(iter(columns.values())))), columns)
+    return builder.build()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return WeatherStore(str(tmp_path / "store"))
+
+
+def test_merge_ranges_joins_overlapping_and_adjacent_ranges():
+    ranges = [["2020-01-10", "2020-01-20"], ["2020-01-01", "2020-01-05"], ["2020-01-06", "2020-01-08"],
+              ["2020-01-15", "2020-01-25"], ["2020-03-01", "2020-03-01"]]
+    assert merge_ranges(ranges) == [["2020-01-01", "2020-01-08"], ["2020-01-10", "2020-01-25"],
+                                    ["2020-03-01", "2020-03-01"]]
+    assert merge_ranges([]) == []
+
+
+def test_subtract_ranges_returns_the_gaps():
+    covered = [["2020-01-05", "2020-01-10"], ["2020-01-20", "2020-02-10"]]
+    assert subtract_ranges("2020-01-01", "2020-01-31", covered) == [["2020-01-01", "2020-01-04"],
+                                                                    ["2020-01-11", "2020-01-19"]]
+    assert subtract_ranges("2020-01-06", "2020-01-09", covered) == []
+    assert subtract_ranges("2020-01-01", "2020-01-03", []) == [["2020-01-01", "2020-01-03"]]
+
+
+def test_write_records_ranges_and_reads_back(store):
+    data = table("2020-12-30", {"a": {"wind": [1, 2, 3, 4]}, "b": {"wind": [5, 6, 7, 8]}})
+    store.write(data, "2020-12-30", "2021-01-02")
+
+    assert store.manifest() == {"a": {"wind": [["2020-12-30", "2021-01-02"]]},
+                                "b": {"wind": [["2020-12-30", "2021-01-02"]]}}
+    assert store.covers("a", ["wind"], "2020-12-31", "2021-01-01")
+    assert store.missing_ranges("a", ["wind", "sun"], "2020-12-29", "2021-01-03") == [["2020-12-29", "2021-01-03"]]
+    assert store.missing_ranges("a", ["wind"], "2020-12-29", "2021-01-03") == [["2020-12-29", "2020-12-29"],
+                                                                               ["2021-01-03", "2021-01-03"]]
+
+    back = store.read(["a", "b"], start_date="2020-12-31", end_date="2021-01-01")
+    assert back["location"].astype(str).tolist() == ["a", "a", "b", "b"]
+    assert back["wind"].tolist() == [2, 3, 6, 7]
+    assert str(back["date"].dtype) == "datetime64[s, UTC]"
+
+
+def test_write_merges_into_existing_partitions(store):
+    store.write(table("2021-01-01", {"a": {"wind": [1, 2, 3]}}), "2021-01-01", "2021-01-03")
+    store.write(table("2021-01-03", {"a": {"wind": [30, 4]}}), "2021-01-03", "2021-01-04")
+
+    assert store.manifest()["a"]["wind"] == [["2021-01-01", "2021-01-04"]]
+    assert store.read(["a"])["wind"].tolist() == [1, 2, 30, 4]
+
+
+def test_unpublished_days_are_not_recorded(store):
+    nan = np.nan
+    data = table("2021-01-01", {
+        "late": {"wind": [1, 2, nan, nan], "sun": [1, 2, 3, 4]},
+        "on-time": {"wind": [1, 2, 3, nan], "sun": [1, 2, 3, 4]},
+        "empty": {"wind": [nan, nan, nan, nan], "sun": [nan, nan, nan, nan]},
+    })
+    store.write(data, "2021-01-01", "2021-01-04")
+    manifest = store.manifest()
+
+    # A location's trailing NaNs are refetched later
+    assert manifest["late"]["wind"] == [["2021-01-01", "2021-01-02"]]
+    assert manifest["on-time"]["wind"] == [["2021-01-01", "2021-01-03"]]
+    # A location without any value is covered up to what the others have
+    assert manifest["empty"] == {"wind": [["2021-01-01", "2021-01-03"]], "sun": [["2021-01-01", "2021-01-04"]]}
+
+
+def test_variable_without_any_value_is_not_recorded(store):
+    store.write(table("2021-01-01", {"a": {"wind": [1, 2], "sun": [np.nan, np.nan]}}), "2021-01-01", "2021-01-02")
+    assert store.manifest() == {"a": {"wind": [["2021-01-01", "2021-01-02"]]}}
+    assert store.missing_ranges("a", ["wind", "sun"], "2021-01-01", "2021-01-02") == [["2021-01-01", "2021-01-02"]]
+
+
+def test_concurrent_writers_keep_each_others_ranges(store):
+    names = [f"site-{i}" for i in range(16)]
+    threads = [threading.Thread(target=store.write,
+                                args=(table("2021-01-01", {name: {"wind": [1, 2, 3]}}), "2021-01-01", "2021-01-03"))
+               for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(store.manifest()) == sorted(names)
@@ -0,0 +1,312 @@
+"""Multi-resolution tiles of the site map.
+
+Sites are binned on a Web Mercator quadtree: at zoom ``z`` the world is
+``2**z x 2**z`` tiles and every tile is split into ``2**CELL_BITS`` cells
+per side. Each non-empty cell aggregates its sites (count, centroid, summed
+and highest PageRank with the name of the highest site, most common
+community and mean yearly wind/solar averages), so a client only fetches
+the tiles in its viewport and draws at most a few hundred points per tile
+at any zoom. At the deepest zooms a cell usually holds a single site.
+
+The pyramid for every zoom level is built at once with sorts and segment
+reductions, saved under ``tiles_dir`` keyed by its inputs, so a restart
+loads it back instead of rebuilding, and tile bodies are serialised on
+first request and kept pre-compressed in an in-memory LRU. Every server
+worker shares ``tiles_dir``, so a worker only removes pyramids older than
+the newest few, never one another worker may be loading.
+"""
+import glob
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, current_app, jsonify
+
+from http_cache import CachedBody, make_etag
+from metrics import observe_size, stage, timed
+
+NETWORK_PATH = "../assets/network_data.json"
+TILES_DIR = ".tiles"
+MAX_ZOOM = 12
+CELL_BITS = 4
+# Bump when the aggregates change so pyramids saved by older code are rebuilt
+PYRAMID_FORMAT = 1
+MAX_LATITUDE = 85.05112878
+AVERAGE_COLUMNS = {"wind": "wind_speed_10m_max", "solar": "shortwave_radiation_sum"}
+FIELDS = ("lat", "lon", "count", "pagerank", "pagerank_max", "name", "community", "wind", "solar")
+DECIMALS = {"lat": 5, "lon": 5, "pagerank": 6, "pagerank_max": 6, "wind": 2, "solar": 2}
+
+tiles_api = Blueprint("tiles_api", __name__)
+
+
+def mercator(lat, lon):
+    """Web Mercator position of each site as ``(x, y)`` in ``[0, 1)``, with ``y`` growing southwards."""
+    sin = np.sin(np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)))
+    x = (np.asarray(lon, dtype=np.float64) + 180) / 360
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * np.pi)
+    below_one = np.nextafter(1.0, 0.0)
+    return np.clip(x, 0.0, below_one), np.clip(y, 0.0, below_one)
+
+
+def tile_range(bbox, zoom):
+    """Inclusive ``(x0, x1, y0, y1)`` tile indices covering ``bbox = (min_lon, min_lat, max_lon, max_lat)``."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    x, y = mercator([max_lat, min_lat], [min_lon, max_lon])
+    scale = 2 ** zoom
+    return int(x[0] * scale), int(x[1] * scale), int(y[0] * scale), int(y[1] * scale)
+
+
+def _mode(cell, values):
+    """Most common value per cell (the smallest on ties), in increasing cell order."""
+    order = np.lexsort((values, cell))
+    cell, values = cell[order], values[order]
+    runs = np.flatnonzero(np.r_[True, (cell[1:] != cell[:-1]) | (values[1:] != values[:-1])])
+    lengths = np.diff(np.r_[runs, len(cell)])
+    cell, values = cell[runs], values[runs]
+    best = np.lexsort((values, -lengths, cell))
+    first = np.r_[True, cell[best][1:] != cell[best][:-1]]
+    return values[best][first]
+
+
+def _segment_mean(values, starts):
+    present = ~np.isnan(values)
+    total = np.add.reduceat(np.where(present, values, 0.0), starts)
+    count = np.add.reduceat(present, starts, dtype=np.intp)
+    with np.errstate(invalid="ignore"):
+        return total / count
+
+
+@timed("tiles.build")
+def build_pyramid(sites, max_zoom=MAX_ZOOM, cell_bits=CELL_BITS):
+    """Aggregates ``sites`` at every zoom level into ``{zoom: {field: array}}``, rows sorted by tile.
+
+    ``sites`` has ``name``, ``lat``, ``lon``, ``pagerank`` and ``community``
+    columns, plus optional ``wind`` and ``solar`` yearly averages. Each
+    level also has a ``tile`` column (``x * 2**zoom + y``) to look tiles up.
+    """
+    n = len(sites)
+    if n == 0:
+        # An empty network has no columns; every tile is served empty
+        level = {"tile": np.empty(0, dtype=np.int64), "count": np.empty(0, dtype=np.int64),
+                 "name": np.empty(0, dtype=str), "community": np.empty(0, dtype=np.int64)}
+        level.update((field, np.empty(0)) for field in FIELDS if field not in level)
+        return {zoom: dict(level) for zoom in range(max_zoom + 1)}
+    lat = sites["lat"].to_numpy(dtype=np.float64)
+    lon = sites["lon"].to_numpy(dtype=np.float64)
+    pagerank = sites["pagerank"].to_numpy(dtype=np.float64)
+    community = sites["community"].to_numpy(dtype=np.int64)
+    names = sites["name"].to_numpy(dtype=str)
+    averages = {field: sites[field].to_numpy(dtype=np.float64) if field in sites else np.full(n, np.nan)
+                for field in AVERAGE_COLUMNS}
+    x, y = mercator(lat, lon)
+    mask = (1 << cell_bits) - 1
+
+    levels = {}
+    for zoom in range(max_zoom + 1):
+        side = 2 ** (zoom + cell_bits)
+        cx, cy = (x * side).astype(np.int64), (y * side).astype(np.int64)
+        tile = (cx >> cell_bits) * 2 ** zoom + (cy >> cell_bits)
+        # The tile is the high bits of the cell key, so sorting by cell groups the tiles too
+        cell = (tile << 2 * cell_bits) | ((cx & mask) << cell_bits) | (cy & mask)
+        # Highest PageRank first within each cell, so a cell's first row is its top site
+        order = np.lexsort((-pagerank, cell))
+        sorted_cell = cell[order]
+        starts = np.flatnonzero(np.r_[True, sorted_cell[1:] != sorted_cell[:-1]])
+        count = np.diff(np.r_[starts, n])
+
+        level = {
+            "tile": tile[order][starts],
+            "lat": np.add.reduceat(lat[order], starts) / count,
+            "lon": np.add.reduceat(lon[order], starts) / count,
+            "count": count,
+            "pagerank": np.add.reduceat(pagerank[order], starts),
+            "pagerank_max": pagerank[order][starts],
+            "name": names[order][starts],
+            "community": _mode(cell, community),
+        }
+        for field, values in averages.items():
+            level[field] = _segment_mean(values[order], starts)
+        levels[zoom] = level
+    return levels
+
+
+def save_pyramid(path, levels):
+    arrays = {f"z{zoom}_{field}": values for zoom, level in levels.items() for field, values in level.items()}
+    # Workers building the same version at once each write their own file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_pyramid(path):
+    levels = {}
+    with np.load(path) as archive:
+        for key in archive.files:
+            zoom, field = key[1:].split("_", 1)
+            levels.setdefault(int(zoom), {})[field] = archive[key]
+    return levels
+
+
+def tile_document(levels, zoom, x, y):
+    """Columnar cells of one tile; an empty tile has empty columns."""
+    level = levels[zoom]
+    key = x * 2 ** zoom + y
+    start, stop = np.searchsorted(level["tile"], [key, key + 1])
+    cells = {}
+    for field in FIELDS:
+        values = level[field][start:stop]
+        if field in DECIMALS:
+            values = np.round(values, DECIMALS[field])
+            cells[field] = [None if math.isnan(v) else v for v in values.tolist()]
+        else:
+            cells[field] = values.tolist()
+    return {"z": zoom, "x": x, "y": y, "cells": cells}
+
+
+def site_averages(yearly):
+    """Mean of the yearly wind and solar averages of each location in a yearly rollup."""
+    means = yearly.groupby("location")[list(AVERAGE_COLUMNS.values())].mean()
+    return means.rename(columns={column: field for field, column in AVERAGE_COLUMNS.items()})
+
+
+class TileCache:
+    """Tile pyramid of the current network file, persisted in ``tiles_dir`` and served from memory.
+
+    ``averages`` is an optional callable returning ``(version, yearly rollup)``
+    of the daily table (both ``None`` while it loads), such as
+    ``WeatherSnapshot.rollup``; the pyramid is rebuilt when the network file
+    or that version changes.
+    """
+
+    def __init__(self, network_path=NETWORK_PATH, tiles_dir=TILES_DIR, averages=None, max_zoom=MAX_ZOOM,
+                 cell_bits=CELL_BITS, cache_size=1024, check_interval=1.0, keep=3):
+        self.network_path = network_path
+        self.tiles_dir = tiles_dir
+        self.averages = averages
+        self.max_zoom = max_zoom
+        self.cell_bits = cell_bits
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self.keep = keep
+        self.version = None
+        self.levels = None
+        self.bbox = None
+        self.stats = {"built": 0, "loaded": 0, "hits": 0, "misses": 0}
+        self._signature = None
+        self._checked = None
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions["tile_cache"] = self
+        return self
+
+    def _inputs(self):
+        stat = os.stat(self.network_path)
+        averages_version, yearly = self.averages() if self.averages is not None else (None, None)
+        return (stat.st_mtime_ns, stat.st_size, averages_version), yearly
+
+    def refresh(self):
+        """Loads or builds the pyramid for the current inputs; returns its version."""
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return self.version
+        with self._lock:
+            signature, yearly = self._inputs()
+            self._checked = now
+            if signature == self._signature:
+                return self.version
+
+            with open(self.network_path, "rb") as f:
+                raw = f.read()
+            version = make_etag(PYRAMID_FORMAT, self.max_zoom, self.cell_bits, raw, signature[2])
+            if version != self.version:
+                sites = pd.DataFrame(json.loads(raw)["nodes"])
+                if yearly is not None and len(sites):
+                    sites = sites.join(site_averages(yearly), on="name")
+                path = os.path.join(self.tiles_dir, f"pyramid-{version}.npz")
+                levels = None
+                if os.path.exists(path):
+                    try:
+                        levels = load_pyramid(path)
+                        self.stats["loaded"] += 1
+                    except (OSError, ValueError):  # pruned or replaced by another worker meanwhile
+                        pass
+                if levels is None:
+                    levels = build_pyramid(sites, self.max_zoom, self.cell_bits)
+                    os.makedirs(self.tiles_dir, exist_ok=True)
+                    save_pyramid(path, levels)
+                    self._prune({path, os.path.join(self.tiles_dir, f"pyramid-{self.version}.npz")})
+                    self.stats["built"] += 1
+                self.levels, self.version = levels, version
+                self.bbox = ([sites["lon"].min(), sites["lat"].min(), sites["lon"].max(), sites["lat"].max()]
+                             if len(sites) else None)
+                self._bodies.clear()
+            self._signature = signature
+            return self.version
+
+    def _prune(self, keep):
+        """Removes saved pyramids besides ``keep`` and the newest ``self.keep``."""
+        paths = []
+        for path in glob.glob(os.path.join(self.tiles_dir, "pyramid-*.npz")):
+            try:
+                paths.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+        for _, path in sorted(paths, reverse=True)[self.keep:]:
+            if path not in keep:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def body(self, zoom, x, y):
+        """Returns the cached body of one tile, building it on a miss."""
+        version = self.refresh()
+        key = (version, zoom, x, y)
+        with self._lock:
+            if key in self._bodies:
+                self._bodies.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._bodies[key]
+            levels = self.levels
+
+        with stage("tiles.serialise"):
+            document = tile_document(levels, zoom, x, y)
+            document["version"] = version
+            encoded = json.dumps(document, separators=(",", ":")).encode()
+        observe_size("tile", len(encoded))
+        body = CachedBody(encoded, etag=make_etag(*key))
+
+        with self._lock:
+            self.stats["misses"] += 1
+            if version == self.version:
+                self._bodies[key] = body
+                while len(self._bodies) > self.cache_size:
+                    self._bodies.popitem(last=False)
+        return body
+
+
+@tiles_api.route("/tiles", methods=["GET"])
+def tiles_index():
+    """Version, zoom range, cells per tile side and the bounding box of the sites."""
+    cache = current_app.extensions["tile_cache"]
+    version = cache.refresh()
+    return jsonify(version=version, max_zoom=cache.max_zoom, cells=2 ** cache.cell_bits, bbox=cache.bbox)
+
+
+@tiles_api.route("/tiles/<int:z>/<int:x>/<int:y>.json", methods=["GET"])
+def tile(z, x, y):
+    """Aggregated sites of one ``z/x/y`` Web Mercator tile."""
+    cache = current_app.extensions["tile_cache"]
+    if not (0 <= z <= cache.max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        response = jsonify(error=f"no tile {z}/{x}/{y}; zoom ranges from 0 to {cache.max_zoom}")
+        response.status_code = 404
+        return response
+    return cache.body(z, x, y).response()
@@ -0,0 +1,192 @@
+"""Server-sent events with versioned deltas of the network and statistics files.
+
+``DeltaFeed`` checks both asset files every ``check_interval`` seconds on a
+background thread. When the network file's ``version`` moves, it diffs the
+new nodes against the previous ones by name, and the new statistics against
+the previous statistics. A delta holds only the sites that were added or whose
+position, PageRank or community changed (rounded as the tiles round them,
+so float noise between PageRank runs is not sent), which of them are new,
+the names of removed sites, and the statistics keys whose value changed.
+Each delta is encoded once and sent as is to every connected client, so
+bandwidth scales with how much changed, not with the number of sites.
+
+The event ``id`` is the version. The last ``history`` deltas are kept, so
+a client that reconnects with ``Last-Event-ID`` (or opens the stream with
+``since``, the version of the ``/stat`` document it loaded) is sent only
+what it missed. A client too far behind is sent a ``reset`` and reloads.
+
+    GET /updates?since=<version>      text/event-stream
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+
+from http_cache import make_etag
+from metrics import observe_size
+
+NETWORK_PATH = "../assets/network_data.json"
+STATISTICS_PATH = "../assets/statistics.json"
+NODE_FIELDS = ("lat", "lon", "pagerank", "community")
+DECIMALS = {"lat": 5, "lon": 5, "pagerank": 6}
+# Written by the pipeline next to the payload, not part of it
+STAMP_KEYS = ("version", "updated")
+
+updates_api = Blueprint("updates_api", __name__)
+
+
+def node_rows(document):
+    """``{name: (lat, lon, pagerank, community)}`` of a network document, rounded as deltas send them."""
+    rows = {}
+    for node in document.get("nodes", []):
+        rows[node["name"]] = tuple(
+            round(node[field], DECIMALS[field]) if field in DECIMALS and node.get(field) is not None
+            else node.get(field)
+            for field in NODE_FIELDS)
+    return rows
+
+
+def diff(old_rows, new_rows, old_statistics, new_statistics):
+    """Columnar ``nodes`` that were added or changed, the ``added`` and ``removed`` names and changed ``statistics``."""
+    changed = [name for name, row in new_rows.items() if old_rows.get(name) != row]
+    nodes = {"name": changed}
+    for k, field in enumerate(NODE_FIELDS):
+        nodes[field] = [new_rows[name][k] for name in changed]
+    added = [name for name in changed if name not in old_rows]
+    removed = [name for name in old_rows if name not in new_rows]
+    statistics = {key: value for key, value in new_statistics.items()
+                  if key not in STAMP_KEYS and old_statistics.get(key) != value}
+    return nodes, added, removed, statistics
+
+
+def encode_event(event, version, payload):
+    data = json.dumps(payload, separators=(",", ":"))
+    return f"id: {version}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+class DeltaFeed:
+    """Latest network and statistics documents, and the deltas between their recent versions."""
+
+    def __init__(self, network_path=NETWORK_PATH, statistics_path=STATISTICS_PATH, check_interval=1.0,
+                 history=64, heartbeat=15.0):
+        self.network_path = network_path
+        self.statistics_path = statistics_path
+        self.check_interval = check_interval
+        self.heartbeat = heartbeat
+        self.version = None
+        self.stats = {"deltas": 0, "sent": 0, "resets": 0}
+        self._rows = {}
+        self._statistics = {}
+        self._signature = None
+        self._deltas = deque(maxlen=history)  # (base, version, encoded event)
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def init_app(self, app):
+        app.extensions["delta_feed"] = self
+        return self
+
+    def ensure_started(self):
+        """Starts the file watcher on first use so importing the app does no I/O."""
+        if self._thread is None:
+            with self._changed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="delta-feed", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except (OSError, ValueError):  # a file is missing or mid-write; try again next time
+                pass
+            time.sleep(self.check_interval)
+
+    def _signatures(self):
+        return tuple((stat.st_mtime_ns, stat.st_size)
+                     for stat in (os.stat(self.network_path), os.stat(self.statistics_path)))
+
+    def check(self):
+        """Reloads both files if either changed and records the delta; returns the current version."""
+        signature = self._signatures()
+        if signature == self._signature:
+            return self.version
+        with open(self.network_path, "rb") as f:
+            raw_network = f.read()
+        with open(self.statistics_path, "rb") as f:
+            raw_statistics = f.read()
+        network, statistics = json.loads(raw_network), json.loads(raw_statistics)
+        version = network.get("version")
+        if version is not None and statistics.get("version") not in (None, version):
+            return self.version  # the pipeline has written one file but not yet the other
+        # Files written without a version are told apart by their content
+        version = str(version) if version is not None else make_etag(raw_network, raw_statistics)
+
+        with self._changed:
+            self._signature = signature
+            if version == self.version:
+                return version
+            rows = node_rows(network)
+            if self.version is not None:
+                nodes, added, removed, changed = diff(self._rows, rows, self._statistics, statistics)
+                event = encode_event("delta", version, {"version": version, "base": self.version, "nodes": nodes,
+                                                        "added": added, "removed": removed, "statistics": changed})
+                observe_size("delta", len(event))
+                self._deltas.append((self.version, version, event))
+                self.stats["deltas"] += 1
+            self._rows, self._statistics, self.version = rows, statistics, version
+            self._changed.notify_all()
+        return version
+
+    def since(self, version):
+        """``(current version, encoded events)`` that bring a client at ``version`` up to date.
+
+        The events are the missed deltas, or a ``reset`` when they are no
+        longer all kept.
+        """
+        with self._changed:
+            if self.version is None or version == self.version:
+                return version, []
+            for k, (base, _, _) in enumerate(self._deltas):
+                if base == version:
+                    return self.version, [event for _, _, event in list(self._deltas)[k:]]
+            self.stats["resets"] += 1
+            return self.version, [encode_event("reset", self.version, {"version": self.version})]
+
+    def stream(self, version):
+        """Yields the events after ``version`` as they happen, with a comment line as a heartbeat."""
+        self.ensure_started()
+        yield b"retry: 5000\n\n"
+        while True:
+            version, events = self.since(version)
+            if events:
+                self.stats["sent"] += len(events)
+                yield b"".join(events)
+                continue
+            with self._changed:
+                changed = self._changed.wait_for(lambda: self.version not in (None, version), self.heartbeat)
+            if not changed:
+                yield b": keep-alive\n\n"
+
+
+@updates_api.route("/updates", methods=["GET"])
+def updates():
+    """Server-sent events with the deltas of the network and statistics files after ``since``.
+
+    ``Last-Event-ID``, sent by a reconnecting ``EventSource``, takes
+    precedence over ``since``. Without either the stream starts at the
+    current version.
+    """
+    feed = current_app.extensions["delta_feed"]
+    feed.ensure_started()
+    version = request.headers.get("Last-Event-ID") or request.args.get("since")
+    if version is None:
+        try:
+            version = feed.check()
+        except (OSError, ValueError):  # nothing to stream yet; the first version arrives as a reset
+            pass
+    return Response(stream_with_context(feed.stream(version)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,375 @@
+"""The ``/weather`` endpoint, served from a background-refreshed snapshot.
+
+The daily table is loaded off the request path by a refresher thread. Each
+query is answered from the current snapshot in a columnar layout (one shared
+``dates`` array and one value array per location and variable), serialised
+once per snapshot version and kept pre-compressed in a small LRU.
+``/weather/stats`` answers per-site statistics over date windows from a
+``PrefixIndex`` built once per snapshot version. Yearly and seasonal
+rollups come from one ``WeatherAggregates`` kept across versions, which only
+folds in the days each new version adds.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, current_app, jsonify, request
+
+from aggregation import WeatherAggregates
+from downsample import METHODS, MIN_POINTS, downsample_indices
+from http_cache import CachedBody, make_etag
+from metrics import observe_size, stage
+from prefix_index import STATISTICS, PrefixIndex, parse_months, range_stats
+from weather_store import local_day, table_version
+
+VARIABLES = ["sunshine_duration", "wind_speed_10m_max", "shortwave_radiation_sum"]
+RESOLUTIONS = {"day": None, "week": "W-MON", "month": "MS", "year": "YS"}
+
+weather_api = Blueprint("weather_api", __name__)
+
+
+class WeatherSnapshot:
+    """Holds the latest daily table and refreshes it on a background thread.
+
+    By default each refresh calls ``loader()`` and versions the table by a
+    hash of its content. ``current_version`` is a cheap callable returning
+    the version that is current at the source (``None`` while there is
+    none); a refresh then only calls ``loader(version)`` when it changed.
+    ``index_loader(version)`` returns a prebuilt ``PrefixIndex`` to use
+    instead of building one.
+    """
+
+    def __init__(self, loader, refresh_interval=3600, cache_size=256, current_version=None, index_loader=None):
+        self.loader = loader
+        self.current_version = current_version
+        self.index_loader = index_loader
+        self.refresh_interval = refresh_interval
+        self.cache_size = cache_size
+        self.version = None
+        self.frame = None
+        self.error = None
+        self.stats = {"hits": 0, "misses": 0}
+        self._index = None
+        self._aggregates = None
+        self._aggregated = None
+        self._aggregate_lock = threading.Lock()
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        app.extensions["weather_snapshot"] = self
+        return self
+
+    def ensure_started(self):
+        """Starts the refresher on first use so importing the app does no I/O."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="weather-refresh", daemon=True)
+                    self._thread.start()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        # A snapshot warmed before the first request was loaded just now
+        if self._ready.is_set():
+            time.sleep(self.refresh_interval)
+        while True:
+            try:
+                self.warm()
+            except Exception as e:  # keep serving the previous snapshot
+                self.error = e
+            time.sleep(self.refresh_interval)
+
+    def warm(self):
+        """Refreshes the table and builds its prefix index, so the first /weather/stats request does not wait."""
+        self.refresh()
+        if self.version is not None:
+            self.prefix_index(self.version, self.frame)
+
+    def refresh(self):
+        """Loads a new table and swaps it in if its content changed."""
+        if self.current_version is not None:
+            version = self.current_version()
+            if version is None:  # nothing to load yet
+                return
+            if version != self.version:
+                with stage("weather.load"):
+                    frame = self.loader(version)
+        else:
+            with stage("weather.load"):
+                frame = self.loader()
+            version = table_version(frame)
+        with self._lock:
+            if version != self.version:
+                self.frame = frame if "day" in frame else frame.assign(day=local_day(frame["date"]))
+                self.version = version
+                self._index = None
+                self._responses.clear()
+            self.error = None
+        self._ready.set()
+
+    def prefix_index(self, version, frame):
+        """The ``PrefixIndex`` of snapshot ``version``, built (or loaded by ``index_loader``) on first use."""
+        index = self._index
+        if index is None or index[0] != version:
+            if self.index_loader is not None:
+                index = (version, self.index_loader(version))
+            else:
+                with stage("stats.index"):
+                    index = (version, PrefixIndex(frame, VARIABLES))
+            with self._lock:
+                if version == self.version:
+                    self._index = index
+        return index[1]
+
+    def rollup(self, period="year"):
+        """``(version, rollup)`` of the current table, or ``(None, None)`` before the first load.
+
+        The store only appends days, so a new version is folded into the
+        existing aggregates; they are rebuilt if a location was dropped.
+        """
+        with self._lock:
+            version, frame = self.version, self.frame
+        if version is None:
+            return None, None
+        with self._aggregate_lock:
+            if self._aggregated != version:
+                if self._aggregates is None or self._aggregates.locations - set(frame["location"].unique()):
+                    self._aggregates = WeatherAggregates()
+                with stage("weather.aggregate"):
+                    self._aggregates.update(frame)
+                self._aggregated = version
+            return version, self._aggregates.rollup(period)
+
+    def body(self, params, kind="weather"):
+        """Returns the cached body for a normalised ``weather`` or ``stats`` query, building it on a miss."""
+        with self._lock:
+            version, frame = self.version, self.frame
+            key = (version, kind, params)
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._responses[key]
+
+        if kind == "stats":
+            index = self.prefix_index(version, frame)
+            with stage("stats.query"):
+                payload = range_stats(index, **dict(params))
+        else:
+            with stage("weather.query"):
+                payload = query(frame, **dict(params))
+        payload["version"] = version
+        with stage(f"{kind}.serialise"):
+            encoded = json.dumps(payload, separators=(",", ":")).encode()
+        observe_size(kind, len(encoded))
+        body = CachedBody(encoded, etag=make_etag(version, kind, params))
+
+        with self._lock:
+            self.stats["misses"] += 1
+            if version == self.version:
+                self._responses[key] = body
+                while len(self._responses) > self.cache_size:
+                    self._responses.popitem(last=False)
+        return body
+
+
+def query(frame, locations=None, variables=None, start=None, end=None, resolution="day", offset=0, limit=None,
+          points=None, method="lttb"):
+    """Selects and downsamples the daily table into a columnar payload.
+
+    With ``points`` each series is reduced to at most that many points
+    (see ``downsample``) after resampling and paging. The kept points
+    differ between series, so each one becomes ``{"index", "values"}``
+    with ``index`` pointing into ``dates``.
+    """
+    variables = list(variables or VARIABLES)
+    if locations:
+        frame = frame[frame["location"].isin(locations)]
+    if start:
+        frame = frame[frame["day"] >= pd.Timestamp(start)]
+    if end:
+        frame = frame[frame["day"] <= pd.Timestamp(end)]
+
+    table = frame.set_index(["day", "location"])[variables].unstack("location").sort_index()
+    rule = RESOLUTIONS[resolution]
+    if rule is not None:
+        table = table.resample(rule, closed="left", label="left").mean()
+
+    total = len(table)
+    table = table.iloc[offset:None if limit is None else offset + limit]
+
+    columns = np.round(table.to_numpy(dtype=np.float64).T, 2)
+    payload = {"resolution": resolution, "total": total, "offset": offset}
+    kept = None
+    if points is not None and len(table) > points:
+        # Any unit works for x: the selection only depends on the relative spacing
+        kept = downsample_indices(table.index.asi8, columns, points, method)
+        payload.update(points=points, method=method)
+    payload["dates"] = table.index.strftime("%Y-%m-%d").tolist()
+
+    series = {}
+    for k, (variable, location) in enumerate(table.columns):
+        if kept is None:
+            values = _json_values(columns[k])
+        else:
+            index = np.unique(kept[k])  # minmax repeats an index when a bucket's min and max coincide
+            values = {"index": index.tolist(), "values": _json_values(columns[k][index])}
+        series.setdefault(location, {})[variable] = values
+
+    payload["series"] = series
+    return payload
+
+
+def _json_values(values):
+    return [None if np.isnan(v) else v for v in values.tolist()]
+
+
+def _parse_date(value, name):
+    """``value`` as a ``YYYY-MM-DD`` string, or None; a time or a timezone is a ValueError."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)") from None
+
+
+def _parse_params(args):
+    def split(name):
+        value = args.get(name)
+        return tuple(sorted(v for v in value.split(",") if v)) if value else None
+
+    resolution = args.get("resolution", "day")
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    variables = split("variable")
+    if variables and not set(variables) <= set(VARIABLES):
+        raise ValueError(f"variable must be among {', '.join(VARIABLES)}")
+    start, end = _parse_date(args.get("start"), "start"), _parse_date(args.get("end"), "end")
+    offset = int(args.get("offset", 0))
+    limit = args.get("limit")
+    limit = int(limit) if limit else None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must be non-negative")
+    points = args.get("points")
+    points = int(points) if points else None
+    if points is not None and points < MIN_POINTS:
+        raise ValueError(f"points must be at least {MIN_POINTS}")
+    method = args.get("method", "lttb")
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+
+    return (
+        ("locations", split("location")),
+        ("variables", variables),
+        ("start", start),
+        ("end", end),
+        ("resolution", resolution),
+        ("offset", offset),
+        ("limit", limit),
+        ("points", points),
+        ("method", method if points is not None else None),
+    )
+
+
+def _not_loaded(snapshot):
+    """503 for a snapshot with no table yet: still loading, or the last load's error until the next attempt."""
+    if snapshot.error is not None:
+        response = jsonify(error=f"weather data failed to load: {snapshot.error}")
+        retry = snapshot.refresh_interval
+    else:
+        response = jsonify(error="weather data is still loading")
+        retry = 5
+    response.status_code = 503
+    response.headers["Retry-After"] = str(max(1, round(retry)))
+    return response
+
+
+@weather_api.route("/weather", methods=["GET"])
+def weather_data():
+    """Columnar daily weather data.
+
+    Query parameters: ``location`` and ``variable`` (comma-separated),
+    ``start``/``end`` (YYYY-MM-DD), ``resolution`` (day, week, month, year),
+    ``offset``/``limit`` to page over dates, and ``points`` (with
+    ``method`` lttb or minmax) to downsample each series to a point budget;
+    ``points`` of twice the chart's pixel width with ``minmax`` draws the
+    same line as the full series.
+    """
+    snapshot = current_app.extensions["weather_snapshot"]
+    snapshot.ensure_started()
+    if snapshot.version is None:
+        return _not_loaded(snapshot)
+
+    try:
+        params = _parse_params(request.args)
+    except ValueError as e:
+        response = jsonify(error=str(e))
+        response.status_code = 400
+        return response
+
+    return snapshot.body(params).response()
+
+
+def _parse_stats_params(args):
+    variable = args.get("variable")
+    if variable not in VARIABLES:
+        raise ValueError(f"variable must be one of {', '.join(VARIABLES)}")
+    start, end = _parse_date(args.get("start"), "start"), _parse_date(args.get("end"), "end")
+    months = args.get("months")
+    if months:
+        months = parse_months(months)
+    location = args.get("location")
+    locations = tuple(sorted(v for v in location.split(",") if v)) if location else None
+    top = args.get("top")
+    top = int(top) if top else None
+    if top is not None and top < 1:
+        raise ValueError("top must be positive")
+    by = args.get("by", "mean")
+    if by not in STATISTICS:
+        raise ValueError(f"by must be one of {', '.join(STATISTICS)}")
+    order = args.get("order", "desc")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+
+    return (
+        ("variable", variable),
+        ("start", start or None),
+        ("end", end or None),
+        ("months", months or None),
+        ("locations", locations),
+        ("top", top),
+        ("by", by if top is not None else "mean"),
+        ("order", order if top is not None else "desc"),
+    )
+
+
+@weather_api.route("/weather/stats", methods=["GET"])
+def weather_stats():
+    """Count, mean and variance of one variable per site over a date window, from the prefix-sum index.
+
+    Query parameters: ``variable``, ``start``/``end`` (YYYY-MM-DD),
+    ``months`` (``3-9``; ``11-2`` wraps over the new year) to keep only
+    those months of every year, ``location`` (comma-separated) and ``top``
+    to return only the best ``top`` sites ``by`` mean, variance or count in
+    ``order`` desc or asc.
+    """
+    snapshot = current_app.extensions["weather_snapshot"]
+    snapshot.ensure_started()
+    if snapshot.version is None:
+        return _not_loaded(snapshot)
+
+    try:
+        return snapshot.body(_parse_stats_params(request.args), kind="stats").response()
+    except ValueError as e:  # also an unknown location, found while answering
+        response = jsonify(error=str(e))
+        response.status_code = 400
+        return response
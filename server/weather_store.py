@@ -0,0 +1,253 @@
+"""Local columnar store for the daily archive data.
+
+Each location/year pair lives in its own Arrow IPC file::
+
+    <root>/<location>/<year>.arrow
+    <root>/manifest.json            # stored date ranges per location and variable
+
+Files are written uncompressed so reads can memory-map them: selecting one
+location, a few columns and a date window only maps the matching partitions
+and never faults in the pages of the columns that were not asked for.
+Writes hold an exclusive lock on ``<root>/.lock``, so the server's refresher
+and a CLI or pipeline run writing the same store do not lose each other's
+partitions or manifest ranges.
+"""
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from daily_table import TableBuilder
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; writes from one process at a time are still safe
+    fcntl = None
+
+MANIFEST = "manifest.json"
+LOCK = ".lock"
+ONE_DAY = pd.Timedelta(days=1)
+HALF_DAY_SECONDS = 12 * 3600
+
+
+def _pyarrow():
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401 - registers pa.ipc
+    return pa
+
+
+def local_day(dates):
+    """Calendar day of each timestamp in the site's own timezone.
+
+    The API returns local midnights expressed in UTC (e.g. 22:00 the previous
+    day for Romania), so shifting by half a day before flooring recovers the
+    local date for any UTC offset below 12 hours.
+    """
+    return (dates + pd.Timedelta(hours=12)).dt.floor("D").dt.tz_localize(None)
+
+
+def table_version(frame):
+    """Content hash of a daily table; the snapshot, the shared table and the rollup cache version tables by it."""
+    return hashlib.sha1(pd.util.hash_pandas_object(frame, index=False).values.tobytes()).hexdigest()[:20]
+
+
+def _epoch_seconds(day):
+    return int(pd.Timestamp(day).timestamp())
+
+
+def _format(day):
+    return day.strftime("%Y-%m-%d")
+
+
+def merge_ranges(ranges):
+    """Merges overlapping or adjacent inclusive ``[start, end]`` date ranges."""
+    merged = []
+    for start, end in sorted((pd.Timestamp(s), pd.Timestamp(e)) for s, e in ranges):
+        if merged and start <= merged[-1][1] + ONE_DAY:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [[_format(start), _format(end)] for start, end in merged]
+
+
+def subtract_ranges(start_date, end_date, ranges):
+    """Returns the parts of ``[start_date, end_date]`` not covered by ``ranges``."""
+    gaps = []
+    cursor = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    for covered_start, covered_end in merge_ranges(ranges):
+        covered_start, covered_end = pd.Timestamp(covered_start), pd.Timestamp(covered_end)
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append([_format(cursor), _format(covered_start - ONE_DAY)])
+        cursor = covered_end + ONE_DAY
+    if cursor <= end:
+        gaps.append([_format(cursor), _format(end)])
+    return gaps
+
+
+class WeatherStore:
+    """Arrow IPC files partitioned by location and year."""
+
+    def __init__(self, root=".weather_store"):
+        self.root = root
+        self._manifest_path = os.path.join(root, MANIFEST)
+
+    def _partition_dir(self, name):
+        return os.path.join(self.root, quote(name, safe=""))
+
+    def _partition_path(self, name, year):
+        return os.path.join(self._partition_dir(name), f"{year}.arrow")
+
+    def manifest(self):
+        """Stored ranges as ``{location: {variable: [[start, end], ...]}}``."""
+        if not os.path.exists(self._manifest_path):
+            return {}
+        with open(self._manifest_path) as f:
+            return json.load(f)
+
+    @contextmanager
+    def _locked(self):
+        """Holds an exclusive lock on the store against writers in other processes and threads."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self._manifest_path)
+
+    def missing_ranges(self, name, variables, start_date, end_date):
+        """Date ranges within ``[start_date, end_date]`` where any of ``variables`` is not stored for ``name``."""
+        stored = self.manifest().get(name, {})
+        gaps = []
+        for variable in variables:
+            gaps.extend(subtract_ranges(start_date, end_date, stored.get(variable, [])))
+        return merge_ranges(gaps)
+
+    def covers(self, name, variables, start_date, end_date):
+        """True if every variable for ``name`` is stored over ``[start_date, end_date]``."""
+        return not self.missing_ranges(name, variables, start_date, end_date)
+
+    def _read_partition(self, path, columns=None):
+        pa = _pyarrow()
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table
+
+    def _write_partition(self, path, table):
+        pa = _pyarrow()
+        tmp = path + ".tmp"
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+
+    @timed("store.write")
+    def write(self, data, start_date, end_date):
+        """Stores a combined daily frame, merging it into any existing partitions.
+
+        Rows already stored for the same date are replaced. ``[start_date,
+        end_date]`` is recorded as covered for every variable column in
+        ``data``, minus any trailing days the API has not published yet: the
+        days after a location's last value, or, for a location with no value
+        at all, after the last value any location has.
+        """
+        with self._locked():
+            self._write(data, start_date, end_date)
+
+    def _write(self, data, start_date, end_date):
+        pa = _pyarrow()
+        # Read under the lock, so ranges another writer just saved are kept
+        manifest = self.manifest()
+        days = local_day(data["date"])
+
+        for (name, year), part in data.groupby([data["location"], days.dt.year], sort=False, observed=True):
+            os.makedirs(self._partition_dir(name), exist_ok=True)
+            path = self._partition_path(name, year)
+            part = part.drop(columns="location")
+            # Partitions are kept sorted by date, which read() relies on;
+            # combine_first already returns the union of dates in order
+            if os.path.exists(path):
+                existing = self._read_partition(path).to_pandas()
+                columns = list(existing.columns) + [c for c in part.columns if c not in existing.columns]
+                part = (part.set_index("date")
+                        .combine_first(existing.set_index("date"))
+                        .reset_index()[columns])
+            else:
+                part = part.sort_values("date", kind="stable")
+            self._write_partition(path, pa.Table.from_pandas(part, preserve_index=False))
+
+        variables = [c for c in data.columns if c not in ("location", "date")]
+        published = {variable: days[data[variable].notna()].max() for variable in variables}
+        for name, part in data.groupby("location", sort=False, observed=True):
+            ranges = manifest.setdefault(name, {})
+            part_days = days[part.index]
+            for variable in variables:
+                valid = part_days[part[variable].notna()]
+                last = published[variable] if valid.empty else valid.max()
+                if pd.isna(last):  # no location has a value yet; fetch the range again next time
+                    continue
+                covered_end = min(pd.Timestamp(end_date), last)
+                ranges[variable] = merge_ranges(ranges.get(variable, []) + [[start_date, _format(covered_end)]])
+        self._save_manifest(manifest)
+
+    @timed("store.read")
+    def read(self, names, columns=None, start_date=None, end_date=None):
+        """Reads the given locations back as one combined frame in the compact ``daily_table`` layout.
+
+        Only the partitions overlapping ``[start_date, end_date]`` are opened
+        and only ``columns`` (plus ``date``) are materialised. Partitions are
+        sorted by date, so the date window is cut with a binary search and
+        each partition's arrays are copied once, into the combined table.
+        """
+        projection = None if columns is None else ["date"] + [c for c in columns if c != "date"]
+        first_year = None if start_date is None else pd.Timestamp(start_date).year
+        last_year = None if end_date is None else pd.Timestamp(end_date).year
+        # local_day(t) >= start  <=>  t + 12h >= start, and local_day(t) <= end  <=>  t + 12h < end + 1 day
+        low = None if start_date is None else _epoch_seconds(start_date) - HALF_DAY_SECONDS
+        high = None if end_date is None else _epoch_seconds(end_date) + HALF_DAY_SECONDS
+
+        builder = TableBuilder(None if projection is None else projection[1:])
+        for name in names:
+            directory = self._partition_dir(name)
+            if not os.path.isdir(directory):
+                continue
+            years = sorted(int(f[:-len(".arrow")]) for f in os.listdir(directory) if f.endswith(".arrow"))
+            for year in years:
+                if (first_year is not None and year < first_year) or (last_year is not None and year > last_year):
+                    continue
+                table = self._read_partition(self._partition_path(name, year), projection)
+                seconds = table.column("date").to_numpy().astype("datetime64[s]").view(np.int64)
+                lo = 0 if low is None else np.searchsorted(seconds, low, side="left")
+                hi = len(seconds) if high is None else np.searchsorted(seconds, high, side="left")
+                if hi <= lo:
+                    continue
+                values = {
+                    column: table.column(column).to_numpy()[lo:hi]
+                    for column in table.column_names if column != "date"
+                }
+                builder.add(name, seconds[lo:hi].view("datetime64[s]"), values)
+
+        if not len(builder):
+            return pd.DataFrame(columns=["location"] + (projection or ["date"]))
+        return builder.build()